@@ -21,7 +21,7 @@ hidden = (
     collect_submodules('webdriver_manager')
     + collect_submodules('selenium')
     + collect_submodules('waitress')
-    + ['openpyxl', 'pandas']
+    + ['openpyxl', 'pandas', 'pyarrow', 'pyarrow.parquet', 'psutil']
 )
 
 datas = [
@@ -1,25 +1,46 @@
 import os
 import sys
 import time
-import urllib.parse
 import pandas as pd
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, flash
 from werkzeug.utils import secure_filename
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.chrome.service import Service as ChromeService
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 import threading
+import queue
 import json
-import sqlite3
+import csv
+import io
+import contextlib
 from datetime import datetime
 import uuid
 import glob
 import webbrowser
 
+from send_drivers import FakeSendDriver, WHATSAPP_WEB_URL, OUTCOME_SENT, OUTCOME_NO_WHATSAPP, SEND_MODE_RELOAD, SEND_MODES
+from sessions import SessionPool, load_session_configs, CHROME_MODE_FULL, CHROME_MODES
+from session_monitor import SessionMonitor, HEALTH_INTERVAL
+from campaign_state import CampaignState
+from db import Database, ExclusionFilter
+from validity import ValidityCache, ttl_from_env, DEFAULT_VALID_TTL_DAYS, DEFAULT_INVALID_TTL_DAYS
+from validation_jobs import (
+    ValidationJob, ValidationStore, EXPORT_COLUMNS, PROGRESS_EVERY, RESUMABLE_STATUSES, RESULT_STATUSES,
+    JOB_DONE, JOB_ERROR, RESULT_VALID, RESULT_INVALID, RESULT_UNKNOWN,
+)
+from campaign_queue import (
+    CampaignStore, CAMPAIGN_QUEUED, CAMPAIGN_RUNNING, CAMPAIGN_STOPPED, CAMPAIGN_DONE, CAMPAIGN_ERROR,
+    CAMPAIGN_CANCELLED, ITEM_FAILED, OUTCOME_ERROR,
+)
+from scheduler import CampaignScheduler
+from links import LINK_COLUMNS, LINK_BATCH_ROWS, link_frame
+from message_templates import compile_template
+from rate_control import RateController, DEFAULT_JITTER, RESULT_OK, RESULT_FAILED, RESULT_TIMEOUT
+from contacts import (
+    Contact, ContactReader, ContactFileError, CONTACT_FILE_EXTENSIONS, build_contact_index, is_contact_index,
+)
+from phones import phone_key
+from events import EventBroker
+from stage_timer import StageTimer
+from pipeline import Pipeline
+
 
 # ---------------------------------------------------------------------------
 # Path helpers — make the app work both as `python app.py` and as a frozen exe.
@@ -57,73 +78,135 @@ app.secret_key = 'your-secret-key-here'  # Change this to a random secret key
 # Configuration
 UPLOAD_FOLDER = os.path.join(user_data_dir(), 'uploads')
 DB_PATH = os.path.join(user_data_dir(), 'whatsapp_tracker.db')
-ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
+ALLOWED_EXTENSIONS = CONTACT_FILE_EXTENSIONS
 CHROME_USER_DATA_DIR = os.path.join(os.path.expanduser("~"), "AppData", "Local", "Google", "Chrome", "User Data", "BotProfile")
 CHROME_PROFILE = "Default"
+# Point the browser at a local stand-in (see whatsapp_standin.py) instead of
+# the real WhatsApp Web, e.g. WBM_WHATSAPP_URL=http://127.0.0.1:8799
+WHATSAPP_URL = os.environ.get('WBM_WHATSAPP_URL', WHATSAPP_WEB_URL).rstrip('/')
+
+SESSIONS_CONFIG_PATH = os.path.join(user_data_dir(), 'sessions.json')
+# Links per page of /generate_whatsapp_links (downloads aren't paged)
+LINK_PAGE_SIZE = 1000
+MAX_LINK_PAGE_SIZE = 10000
+# Country code given to national numbers (leading 0) in contact files,
+# e.g. WBM_DEFAULT_COUNTRY_CODE=92 turns 03001234567 into 923001234567
+DEFAULT_COUNTRY_CODE = os.environ.get('WBM_DEFAULT_COUNTRY_CODE', '').strip().lstrip('+')
+# How much each wait between messages is randomly stretched or shortened
+# (a fraction), unless a campaign sets its own jitter
+try:
+    RATE_JITTER = min(1.0, max(0.0, float(os.environ.get('WBM_RATE_JITTER', DEFAULT_JITTER))))
+except ValueError:
+    RATE_JITTER = DEFAULT_JITTER
+# Chunks a pipeline stage may run ahead of the next one (see pipeline.py)
+PIPELINE_DEPTH = 2
+# Browser sessions launched at startup and kept healthy (default: all
+# configured), and seconds between their health checks
+try:
+    WARM_SESSIONS = int(os.environ['WBM_WARM_SESSIONS']) if os.environ.get('WBM_WARM_SESSIONS') else None
+except ValueError:
+    WARM_SESSIONS = None
+try:
+    HEALTH_CHECK_INTERVAL = max(1.0, float(os.environ.get('WBM_HEALTH_INTERVAL', HEALTH_INTERVAL)))
+except ValueError:
+    HEALTH_CHECK_INTERVAL = HEALTH_INTERVAL
+# How Chrome is launched: full (maximized, everything loaded), lean (small
+# window, media and fonts blocked, background services off) or headless
+CHROME_MODE = os.environ.get('WBM_CHROME_MODE', CHROME_MODE_FULL).strip().lower()
+if CHROME_MODE not in CHROME_MODES:
+    print(f"Unknown WBM_CHROME_MODE {CHROME_MODE!r}, using {CHROME_MODE_FULL}")
+    CHROME_MODE = CHROME_MODE_FULL
 
 # Global variables for WhatsApp automation
-driver = None
-sending_status = {
-    'is_sending': False,
-    'is_paused': False,
-    'current_contact': '',
-    'total_contacts': 0,
-    'sent_count': 0,
-    'failed_count': 0,
-    'no_whatsapp_count': 0,
-    'errors': [],
-    'no_whatsapp_numbers': [],
-    'current_campaign_id': None,
-    'current_excel_file': None,
-    'current_message': None,
-    'current_target_limit': 0,
-    'processed_contacts': 0
-}
-
-# Database setup for tracking sent numbers and invalid numbers
+# Every configured Chrome profile (see sessions.py); sessions[0] is the
+# primary one. A campaign fans out across all of them.
+session_pool = SessionPool(
+    load_session_configs(SESSIONS_CONFIG_PATH, CHROME_USER_DATA_DIR, CHROME_PROFILE),
+    WHATSAPP_URL,
+    CHROME_MODE,
+)
+# Launches the sessions in the background and replaces dead ones (see
+# session_monitor.py); started by start_session_monitor()
+session_monitor = SessionMonitor(session_pool, WARM_SESSIONS, HEALTH_CHECK_INTERVAL)
+# Counters and pause/stop flags for the running campaign, shared between
+# the sender threads and the request handlers (see campaign_state.py)
+campaign_state = CampaignState()
+# Live progress pushed to the page over /events (see events.py)
+events = EventBroker()
+# Wall time per campaign stage (read_contacts, exclusion_filter, send_loop,
+# record) for the current campaign — read by benchmarks/bench_campaign.py.
+stage_timer = StageTimer()
+
+# Database for tracking sent numbers and invalid numbers: one connection
+# per thread, outcome rows group-committed in the background (see db.py)
+db = Database(DB_PATH)
+# Rows that can't be saved are kept and retried; say so on the status panel
+db.on_write_error = lambda message: campaign_error(f"[DB] {message}")
+
 def init_database():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Table for sent numbers
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sent_numbers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            phone TEXT UNIQUE,
-            name TEXT,
-            sent_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            campaign_id TEXT
-        )
-    ''')
-    
-    # Table for invalid WhatsApp numbers
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS invalid_numbers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            phone TEXT UNIQUE,
-            name TEXT,
-            invalid_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            campaign_id TEXT,
-            reason TEXT
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    db.init_schema(DEFAULT_COUNTRY_CODE)
 
 # Initialize database
 init_database()
 
+# Recent WhatsApp account checks, positive and negative (see validity.py)
+validity_cache = ValidityCache(
+    db,
+    valid_ttl=ttl_from_env('WBM_VALID_TTL_DAYS', DEFAULT_VALID_TTL_DAYS),
+    invalid_ttl=ttl_from_env('WBM_INVALID_TTL_DAYS', DEFAULT_INVALID_TTL_DAYS),
+)
+
+# Campaigns and their per-contact work items (see campaign_queue.py).
+# Campaigns cut off by the last exit are marked interrupted here and
+# queued again by start_campaign_scheduler() once the server is up.
+campaign_store = CampaignStore(db)
+campaign_store.mark_interrupted()
+# Runs queued campaigns one after another (see scheduler.py); its
+# dispatcher thread is started by start_campaign_scheduler()
+scheduler = CampaignScheduler(campaign_store, lambda stored: start_stored_campaign(stored),
+                              lambda: campaign_state.is_busy)
+
+# Validation-only jobs (see validation_jobs.py). Jobs cut off by the last
+# exit are marked interrupted and can be resumed where they stopped.
+validation_store = ValidationStore(db)
+validation_store.mark_interrupted()
+# The job being run, if any: one at a time, and never during a campaign
+# since both drive the same browser sessions
+current_validation = None
+validation_lock = threading.Lock()
+
+# Stages and queue depths of the current (or last) campaign, for /status
+campaign_pipeline = None
+
+def record_sent_number(phone, name, campaign_id):
+    """Store a successfully messaged number"""
+    with stage_timer.stage('record'):
+        db.write('''
+            INSERT OR IGNORE INTO sent_numbers (phone, name, campaign_id, phone_key)
+            VALUES (?, ?, ?, ?)
+        ''', (phone, name, campaign_id, phone_key(phone, DEFAULT_COUNTRY_CODE)))
+
+def record_invalid_number(phone, name, campaign_id, reason):
+    """Store a number that has no WhatsApp account"""
+    with stage_timer.stage('record'):
+        db.write('''
+            INSERT OR IGNORE INTO invalid_numbers (phone, name, campaign_id, reason, phone_key)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (phone, name, campaign_id, reason, phone_key(phone, DEFAULT_COUNTRY_CODE)))
+
 # Ensure upload directory exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 def cleanup_old_files():
     """Clean up old uploaded files"""
     try:
-        # Remove files older than 1 hour
+        # Remove files older than 1 hour, except those unfinished campaigns
+        # and validation jobs will need to resume
         current_time = time.time()
+        keep = validation_store.unfinished_files()
+        keep.update(os.path.basename(path) for path in campaign_store.unfinished_files())
         for file_path in glob.glob(os.path.join(UPLOAD_FOLDER, "*")):
-            if os.path.isfile(file_path):
+            if os.path.isfile(file_path) and os.path.basename(file_path) not in keep:
                 file_age = current_time - os.path.getmtime(file_path)
                 if file_age > 3600:  # 1 hour
                     try:
@@ -136,454 +219,694 @@ def cleanup_old_files():
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def setup_chrome_driver():
+def contact_index_path(filename):
+    """Where the contact index a request names lives, or None unless it is
+    one /upload wrote (build_contact_index()) and it is still there"""
+    if not is_contact_index(filename):
+        return None
+    file_path = os.path.join(UPLOAD_FOLDER, filename)
+    return file_path if os.path.isfile(file_path) else None
+
+def install_send_driver(send_driver):
+    """Route the send loop through `send_driver` (None restores Selenium)."""
+    session_pool.install_send_driver(send_driver)
+
+
+def get_send_driver(session=None):
+    """The SendDriver `session` (default: primary) should use, or None if no browser is up."""
+    return (session or session_pool.primary).get_send_driver()
+
+
+def apply_send_mode(mode):
+    """Use `mode` for every session's current and recreated send drivers"""
+    session_pool.set_send_mode(mode)
+
+
+# Offline mode: WBM_SEND_DRIVER=fake runs campaigns without any browser.
+if os.environ.get('WBM_SEND_DRIVER', '').lower() == 'fake':
+    install_send_driver(FakeSendDriver())
+
+
+def setup_chrome_driver(session=None):
     """Setup Chrome driver with WhatsApp Web"""
-    global driver
-    try:
-        # If driver already exists and is working, don't create a new one
-        if driver:
-            try:
-                # Test if driver is still working
-                driver.current_url
-                print("Using existing Chrome driver")
-                return True
-            except Exception as e:
-                print(f"Existing driver is not working: {str(e)}")
-                print("Creating new driver...")
-                try:
-                    driver.quit()
-                except:
-                    pass
-                driver = None
-        
-        options = webdriver.ChromeOptions()
-        options.add_argument(f"--user-data-dir={CHROME_USER_DATA_DIR}")
-        options.add_argument(f"--profile-directory={CHROME_PROFILE}")
-        options.add_argument("--remote-debugging-port=9222")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--disable-blink-features=AutomationControlled")
-        options.add_argument("--start-maximized")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--disable-extensions")
-        options.add_argument("--disable-plugins")
-        options.add_argument("--disable-web-security")
-        options.add_argument("--allow-running-insecure-content")
-        options.add_argument("--disable-background-timer-throttling")
-        options.add_argument("--disable-backgrounding-occluded-windows")
-        options.add_argument("--disable-renderer-backgrounding")
-        
-        # Try to use system Chrome first
-        try:
-            driver = webdriver.Chrome(options=options)
-        except Exception as e:
-            print(f"System Chrome failed: {e}")
-            # Fallback to ChromeDriverManager
-            driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=options)
-        
-        driver.get("https://web.whatsapp.com")
-        time.sleep(15)  # Wait for WhatsApp Web to load
-        print("Chrome driver setup completed successfully")
-        return True
-        
-    except Exception as e:
-        print(f"Chrome driver setup failed: {e}")
-        return False
+    return (session or session_pool.primary).start()
 
-def recover_driver_session():
+def recover_driver_session(session=None):
     """Attempt to recover or recreate the driver session"""
-    global driver
+    return (session or session_pool.primary).recover()
+
+def send_driver_wait_total(session=None):
+    """Seconds the session's send driver has spent waiting on page conditions"""
+    send_driver = get_send_driver(session)
+    return send_driver.wait_seconds if send_driver else 0.0
+
+def check_whatsapp_account(phone, session=None, source='campaign'):
+    """True/False if the number has a WhatsApp account, None if it couldn't
+    be checked. A recent cached answer skips the browser."""
+    key = phone_key(phone, DEFAULT_COUNTRY_CODE)
+    cached = validity_cache.lookup(key)
+    if cached is not None:
+        return cached
     try:
-        if driver:
-            try:
-                # Test if driver is still working
-                driver.current_url
-                return True
-            except Exception as e:
-                print(f"Driver session invalid: {str(e)}")
-                try:
-                    driver.quit()
-                except:
-                    pass
-                driver = None
-        
-        # Try to setup a new driver
-        return setup_chrome_driver()
+        if not get_send_driver(session):
+            return None  # No browser to check with
+        exists = with_session_recovery(phone, lambda send_driver: send_driver.check_exists(phone), session)
     except Exception as e:
-        print(f"Failed to recover driver session: {str(e)}")
-        return False
+        print(f"Error checking WhatsApp for {phone}: {str(e)}")
+        return None
+    validity_cache.record(key, exists, source)
+    return exists
 
-def check_whatsapp_exists(phone):
+def check_whatsapp_exists(phone, session=None):
     """Check if WhatsApp account exists for the phone number"""
+    exists = check_whatsapp_account(phone, session)
+    return True if exists is None else exists  # Assume valid if it can't be checked
+
+def publish_progress(event, with_sessions=False, **data):
+    """Push a progress event, with the current counters, to /events listeners"""
+    if not events.subscriber_count:
+        return  # nobody listening - skip building the payload
+    data['counters'] = campaign_state.counters()
+    if with_sessions:
+        data['sessions'] = session_pool.snapshot()
+    events.publish(event, data)
+
+def campaign_error(message):
+    """Add a line to the campaign's status messages"""
+    campaign_state.add_error(message)
+    publish_progress('campaign_error', message=message)
+
+def mark_no_whatsapp(phone, sr_no, campaign_id, session=None):
+    """Count and store a number that has no WhatsApp account"""
+    # Counted and listed in one step, with its status message for real-time display
+    number = f"SR#{sr_no} ({phone})"
+    status_message = f"[NO WHATSAPP] SR#{sr_no} ({phone}) - No WhatsApp account"
+    campaign_state.add_no_whatsapp(number, status_message)
+    publish_progress('invalid', number=number, message=status_message)
+    if session:
+        session.count('no_whatsapp')
+    
+    # Store invalid number in database
+    display_name = f"SR#{sr_no}"
+    record_invalid_number(phone, display_name, campaign_id, "No WhatsApp account")
+    
+    print(f"[NO WHATSAPP] No WhatsApp account: SR#{sr_no} ({phone})")
+    return False, f"[NO WHATSAPP] No WhatsApp account: SR#{sr_no} ({phone})"
+
+def with_session_recovery(phone, action, session=None):
+    """Run action(send_driver), recreating the browser once on a dead session"""
     try:
-        if not driver:
-            return True  # Skip validation if driver is not available
-        
-        link = f"https://web.whatsapp.com/send?phone={phone}&text=test&app_absent=0"
-        driver.get(link)
-        time.sleep(5)  # Increased wait time
-        
-        # Check if we're redirected to an error page or if the URL changed
-        current_url = driver.current_url
-        page_title = driver.title.lower()
-        
-        print(f"[DEBUG] Current URL: {current_url}")
-        print(f"[DEBUG] Page title: {page_title}")
-        
-        # Check for error indicators in URL or title
-        if "error" in current_url or "error" in page_title or "not found" in page_title:
-            print(f"[NO WHATSAPP] Error page detected for {phone}")
-            return False
-        
-        # Check if we're still on WhatsApp Web (not redirected away)
-        if "web.whatsapp.com" not in current_url:
-            print(f"[NO WHATSAPP] Redirected away from WhatsApp Web for {phone}")
-            return False
-        
-        # Check for various indicators that WhatsApp account exists
-        try:
-            # Wait for page to load and check for multiple possible indicators
-            print(f"[DEBUG] Waiting for WhatsApp elements for {phone}")
-            WebDriverWait(driver, 15).until(
-                EC.any_of(
-                    # Input box exists (most reliable indicator)
-                    EC.presence_of_element_located((By.XPATH, "//div[@contenteditable='true'][@data-tab='10']")),
-                    # Alternative input box selectors
-                    EC.presence_of_element_located((By.XPATH, "//div[@contenteditable='true'][@role='textbox']")),
-                    EC.presence_of_element_located((By.XPATH, "//div[@contenteditable='true']")),
-                    # Chat header exists
-                    EC.presence_of_element_located((By.XPATH, "//header[@data-testid='chat-header']")),
-                    # Message input area
-                    EC.presence_of_element_located((By.XPATH, "//div[@data-testid='conversation-compose-box-input']")),
-                    # Error messages that indicate no WhatsApp
-                    EC.presence_of_element_located((By.XPATH, "//div[contains(text(), 'not on WhatsApp')]")),
-                    EC.presence_of_element_located((By.XPATH, "//div[contains(text(), 'Phone number shared via WhatsApp')]"))
-                )
-            )
-            
-            # Additional check: Look for clear "not on WhatsApp" messages
-            try:
-                # Check for various indicators that the number is not on WhatsApp
-                no_whatsapp_patterns = [
-                    "not on WhatsApp",
-                    "Phone number shared via WhatsApp",
-                    "This phone number is not on WhatsApp",
-                    "The phone number is not on WhatsApp",
-                    "This number is not on WhatsApp",
-                    "Phone number shared via",
-                    "not available on WhatsApp",
-                    "This phone number is not available",
-                    "The phone number is not available"
-                ]
-                
-                print(f"[DEBUG] Checking for invalid WhatsApp indicators for {phone}")
-                
-                for pattern in no_whatsapp_patterns:
-                    try:
-                        no_whatsapp_indicators = driver.find_elements(By.XPATH, f"//div[contains(text(), '{pattern}')]")
-                        if no_whatsapp_indicators:
-                            for indicator in no_whatsapp_indicators:
-                                print(f"[NO WHATSAPP] Found indicator: '{indicator.text}' for {phone}")
-                                return False
-                    except Exception as e:
-                        print(f"[DEBUG] Error checking pattern '{pattern}': {str(e)}")
-                        continue
-                
-                # Also check for specific error messages in the page source
-                page_source = driver.page_source.lower()
-                for pattern in no_whatsapp_patterns:
-                    if pattern.lower() in page_source:
-                        print(f"[NO WHATSAPP] Found invalid indicator '{pattern}' in page source for {phone}")
-                        return False
-                    
-            except Exception as e:
-                print(f"Error checking for invalid WhatsApp indicators: {str(e)}")
-                pass
-            
-            # Check if input box exists (means WhatsApp account exists)
-            input_box = driver.find_elements(By.XPATH, "//div[@contenteditable='true'][@data-tab='10']")
-            if not input_box:
-                # Try alternative selectors
-                input_box = driver.find_elements(By.XPATH, "//div[@contenteditable='true'][@role='textbox']")
-            if not input_box:
-                input_box = driver.find_elements(By.XPATH, "//div[@contenteditable='true']")
-            
-            if input_box:
-                print(f"[DEBUG] Input box found for {phone} - WhatsApp account exists")
-                return True
-            else:
-                print(f"[NO WHATSAPP] No input box found for {phone} - likely no WhatsApp account")
-                return False
-        except Exception as e:
-            print(f"Timeout or error checking WhatsApp for {phone}: {str(e)}")
-            # If we can't determine, assume it's valid to avoid false negatives
-            return True
+        return action(get_send_driver(session))
     except Exception as e:
-        print(f"Error checking WhatsApp for {phone}: {str(e)}")
-        return True  # Assume valid if check fails
+        if "invalid session id" in str(e).lower():
+            print(f"[SESSION ERROR] Invalid session detected for {phone}, attempting recovery...")
+            if recover_driver_session(session):
+                try:
+                    return action(get_send_driver(session))
+                except Exception as retry_e:
+                    raise Exception(f"Failed to recover session: {str(retry_e)}")
+            else:
+                raise Exception("Session recovery failed")
+        else:
+            raise e
 
-def send_message_to_contact(phone, sr_no, message_template, campaign_id, customer_name=""):
-    """Send WhatsApp message to a single contact"""
+def send_message_to_contact(phone, sr_no, message, campaign_id, customer_name="", validate_first=False, session=None):
+    """Send WhatsApp message to a single contact through `session` (default: primary).
+    
+    `message` is the contact's rendered message (MessageTemplate.render).
+    
+    By default the chat is loaded once: the page is classified (valid / not
+    on WhatsApp) and the message sent from it. validate_first=True keeps the
+    old pre-flight flow - a separate validation load before the send load.
+    """
     try:
-        if not driver:
+        if not get_send_driver(session):
             # Try to recover driver session
-            if not recover_driver_session():
+            if not recover_driver_session(session):
                 # If driver recovery fails, just record as sent (for testing)
                 display_name = f"SR#{sr_no}"
-                conn = sqlite3.connect(DB_PATH)
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT OR IGNORE INTO sent_numbers (phone, name, campaign_id)
-                    VALUES (?, ?, ?)
-                ''', (phone, display_name, campaign_id))
-                conn.commit()
-                conn.close()
+                record_sent_number(phone, display_name, campaign_id)
                 
-                sending_status['sent_count'] += 1
+                campaign_state.incr('sent_count')
+                publish_progress('sent', phone=phone, name=display_name)
                 return True, f"[SUCCESS] Recorded {display_name} ({phone}) - Chrome driver not available"
         
-        # First check if WhatsApp account exists (with fallback for testing)
-        try:
-            print(f"[DEBUG] Checking WhatsApp for {phone}...")
-            if not check_whatsapp_exists(phone):
-                sending_status['no_whatsapp_count'] += 1
-                sending_status['no_whatsapp_numbers'].append(f"SR#{sr_no} ({phone})")
-                
-                # Store invalid number in database
-                display_name = f"SR#{sr_no}"
-                conn = sqlite3.connect(DB_PATH)
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT OR IGNORE INTO invalid_numbers (phone, name, campaign_id, reason)
-                    VALUES (?, ?, ?, ?)
-                ''', (phone, display_name, campaign_id, "No WhatsApp account"))
-                conn.commit()
-                conn.close()
-                
-                print(f"[NO WHATSAPP] No WhatsApp account: SR#{sr_no} ({phone})")
-                # Add to status messages for real-time display
-                sending_status['errors'].append(f"[NO WHATSAPP] SR#{sr_no} ({phone}) - No WhatsApp account")
-                return False, f"[NO WHATSAPP] No WhatsApp account: SR#{sr_no} ({phone})"
-            else:
-                print(f"[DEBUG] WhatsApp account exists for {phone}")
-        except Exception as e:
-            print(f"Warning: Could not validate WhatsApp for {phone}: {str(e)}")
-            # Continue with sending if validation fails
+        if validate_first:
+            # Pre-flight: check if WhatsApp account exists before loading the chat to send
+            try:
+                print(f"[DEBUG] Checking WhatsApp for {phone}...")
+                if not check_whatsapp_exists(phone, session):
+                    return mark_no_whatsapp(phone, sr_no, campaign_id, session)
+                else:
+                    print(f"[DEBUG] WhatsApp account exists for {phone}")
+            except Exception as e:
+                print(f"Warning: Could not validate WhatsApp for {phone}: {str(e)}")
+                # Continue with sending if validation fails
         
         # Use phone number as name if no name is provided
         display_name = customer_name if customer_name else f"SR#{sr_no}"
-        message = message_template.replace("{Name}", "{name}").format(name=display_name)
-        encoded_message = urllib.parse.quote(message)
-        link = f"https://web.whatsapp.com/send?phone={phone}&text={encoded_message}&app_absent=0"
-        
-        try:
-            driver.get(link)
-        except Exception as e:
-            if "invalid session id" in str(e).lower():
-                print(f"[SESSION ERROR] Invalid session detected for {phone}, attempting recovery...")
-                if recover_driver_session():
-                    try:
-                        driver.get(link)
-                    except Exception as retry_e:
-                        raise Exception(f"Failed to recover session: {str(retry_e)}")
-                else:
-                    raise Exception("Session recovery failed")
-            else:
-                raise e
         
-        # Wait for chat box to load
-        try:
-            WebDriverWait(driver, 40).until(
-                EC.presence_of_element_located((By.XPATH, "//div[@contenteditable='true'][@data-tab='10']"))
-            )
-            time.sleep(2)
-            input_box = driver.find_element(By.XPATH, "//div[@contenteditable='true'][@data-tab='10']")
-            try:
-                driver.execute_script("arguments[0].click();", input_box)
-                time.sleep(1)
-                input_box.send_keys(Keys.ENTER)
-            except Exception:
-                try:
-                    send_button = driver.find_element(By.XPATH, "//button[@data-testid='compose-btn-send']")
-                    send_button.click()
-                except Exception:
-                    input_box.send_keys(Keys.ENTER)
-        except Exception as e:
-            if "invalid session id" in str(e).lower():
-                print(f"[SESSION ERROR] Invalid session during message sending for {phone}")
-                raise Exception(f"Session lost during message sending: {str(e)}")
-            else:
-                raise e
+        key = phone_key(phone, DEFAULT_COUNTRY_CODE)
+        if validate_first:
+            with_session_recovery(phone, lambda send_driver: send_driver.send(phone, message), session)
+        else:
+            if validity_cache.lookup(key) is False:
+                # Recently found to have no account - don't load the chat
+                return mark_no_whatsapp(phone, sr_no, campaign_id, session)
+            outcome = with_session_recovery(phone, lambda send_driver: send_driver.deliver(phone, message), session)
+            if outcome == OUTCOME_NO_WHATSAPP:
+                validity_cache.record(key, False)
+                return mark_no_whatsapp(phone, sr_no, campaign_id, session)
+        validity_cache.record(key, True)
         
         # Record successful send in database
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR IGNORE INTO sent_numbers (phone, name, campaign_id)
-            VALUES (?, ?, ?)
-        ''', (phone, display_name, campaign_id))
-        conn.commit()
-        conn.close()
+        record_sent_number(phone, display_name, campaign_id)
         
-        sending_status['sent_count'] += 1
+        campaign_state.incr('sent_count')
+        if session:
+            session.count('sent')
+        publish_progress('sent', phone=phone, name=display_name)
         return True, f"[SUCCESS] Sent to {display_name} ({phone})"
     except Exception as e:
-        sending_status['failed_count'] += 1
+        campaign_state.incr('failed_count')
+        if session:
+            session.count('failed')
         error_msg = f"[ERROR] Failed for {phone}: {str(e)}"
-        sending_status['errors'].append(error_msg)
+        campaign_state.add_error(error_msg)
+        publish_progress('failed', phone=phone, message=error_msg)
         return False, error_msg
 
-def send_messages_thread(excel_file_path, message_template, target_limit, campaign_id, message_delay=5):
-    """Thread function to send messages with pause/resume support"""
-    global sending_status
+def item_outcome(success, message):
+    """What a send_message_to_contact() result means for the work item"""
+    if success:
+        return OUTCOME_SENT
+    if message.startswith('[NO WHATSAPP]'):
+        return OUTCOME_NO_WHATSAPP
+    return OUTCOME_ERROR
+
+def rate_result(outcome, message):
+    """What a contact's outcome tells the rate controller (a number without
+    WhatsApp is not pushback)"""
+    if outcome != OUTCOME_ERROR:
+        return RESULT_OK
+    lowered = message.lower()
+    return RESULT_TIMEOUT if 'timeout' in lowered or 'timed out' in lowered else RESULT_FAILED
+
+def campaign_rate(message_delay, rate_per_hour=0, burst=1, jitter=None):
+    """One session's pacing: rate_per_hour messages/hour if set, otherwise
+    one message per message_delay seconds"""
+    options = {'burst': burst or 1, 'jitter': RATE_JITTER if jitter is None else jitter}
+    if rate_per_hour and rate_per_hour > 0:
+        return RateController(rate_per_hour, **options)
+    return RateController.from_delay(message_delay, **options)
+
+def session_worker(session, work_queue, campaign_id, validate_first):
+    """Drain the shared work queue of (contact, rendered message) pairs
+    through one browser session, paced by the session's rate controller"""
+    # A session that isn't logged in (the fallback when none came up) must
+    # not look warm afterwards
+    resting_state = 'ready' if session.is_up else session.state
+    session.state = 'sending'
+    while True:
+        item = work_queue.get()
+        if item is None:
+            break
+        contact, text = item
+        # Once stopped, keep draining (without sending) until the sentinel;
+        # those items stay pending for a resume
+        if not campaign_state.wait_if_paused():
+            continue
+        # Time spent on the previous send already counts towards this wait
+        if session.rate and not session.rate.acquire(campaign_state.sleep):
+            continue
+        outcome, message = OUTCOME_ERROR, ''
+        try:
+            session.throttle()
+            phone = contact.phone
+            sr_no = contact.sr_no or contact.row  # Use row number as fallback
+            label = f"SR#{sr_no} ({phone})"
+            session.current_contact = label
+            if campaign_state.start_contact(label) == 1:
+                stage_timer.mark('first_contact')
+            publish_progress('contact', with_sessions=True, contact=label, session=session.name)
+            session.count('processed')
+            campaign_store.start_item(campaign_id, contact.row)
+            
+            print(f"[{session.name}] Processing contact {contact.row}: {label}")
+            wait_mark = send_driver_wait_total(session)
+            success, message = send_message_to_contact(
+                phone, sr_no, text, campaign_id, contact.name, validate_first, session
+            )
+            outcome = item_outcome(success, message)
+            print(message)
+            
+            # Per-contact time spent waiting on the page (readiness waits)
+            contact_wait = max(0.0, send_driver_wait_total(session) - wait_mark)
+            campaign_state.record_wait(contact_wait)
+        except Exception as e:
+            message = str(e)
+            print(f"[{session.name}] Error processing row {contact.row}: {str(e)}")
+            campaign_error(f"Error processing row {contact.row}: {str(e)}")
+        campaign_store.finish_item(campaign_id, contact.row, outcome)
+        if session.rate:
+            session.rate.record(rate_result(outcome, message))
+    session.current_contact = ''
+    session.state = resting_state
+
+def enqueue_contact(work_queue, contact, is_active=None):
+    """Put a contact on the work queue unless the campaign (or whatever
+    `is_active` reports on) is stopped first"""
+    is_active = is_active or (lambda: campaign_state.is_sending)
+    while is_active():
+        try:
+            work_queue.put(contact, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def read_stage(reader, output):
+    """Pipeline stage: raw row batches out of the contact file"""
+    batches = reader.iter_batches()
+    while True:
+        with stage_timer.stage('read_contacts', rows=0) as span:
+            batch = next(batches, None)
+            span['rows'] = batch[1] if batch else 0
+        if batch is None or not output.put(batch):
+            return
+
+def normalize_stage(reader, batches, output, campaign_id, stored, target_limit, resume, progress):
+    """Pipeline stage: a resumed campaign's pending items, then the file's
+    rows normalized, filtered, cut to the target and stored as campaign
+    items, a chunk at a time. progress['queued'] counts what was stored,
+    progress['complete'] is set once nothing more is left to read."""
+    if resume:
+        # Stored items that were never sent, straight from the table
+        for batch in campaign_store.iter_pending(campaign_id):
+            if not output.put([Contact(*item) for item in batch]):
+                return
+    if reader is None:
+        progress['complete'] = True
+        return
     
+    queued = progress['queued']
+    with stage_timer.stage('exclusion_filter', rows=0):
+        # Already sent, invalid and repeated numbers are dropped chunk by
+        # chunk inside SQLite (see db.ExclusionFilter); the filter's
+        # connection belongs to this thread
+        exclusions = ExclusionFilter(db, validity_cache.invalid_cutoff(), campaign_id if resume else None)
+    try:
+        for batch in batches:
+            with stage_timer.stage('normalize') as span:
+                contacts = reader.normalize(batch)
+                span['rows'] = len(contacts)
+            for start in range(0, len(contacts), reader.chunk_size):
+                # Rows a resumed campaign already read
+                chunk = [contact for contact in contacts[start:start + reader.chunk_size]
+                         if contact.row > stored['read_row']]
+                if not chunk:
+                    continue
+                
+                # Filter out already sent, invalid and duplicate numbers
+                with stage_timer.stage('exclusion_filter', rows=len(chunk)):
+                    fresh = exclusions.filter(chunk)
+                
+                # Apply target limit
+                if target_limit and target_limit > 0:
+                    fresh = fresh[:target_limit - queued]
+                # Stored before they are queued, so a crash can't lose them
+                campaign_store.add_items(campaign_id, fresh, chunk[-1].row)
+                queued += len(fresh)
+                progress['queued'] = queued
+                if fresh and not output.put(fresh):
+                    return
+                if target_limit and 0 < target_limit <= queued:
+                    break
+            if target_limit and 0 < target_limit <= queued:
+                # Nothing more to read; let the read stage stop
+                batches.close()
+                break
+        else:
+            if not campaign_state.is_sending:
+                return  # stopped while waiting on the read stage
+        # Everything left to send is stored; a resume won't need the file
+        campaign_store.mark_materialized(campaign_id)
+        progress['complete'] = True
+    finally:
+        exclusions.close()
+        print(f"Queued {queued} contacts ({exclusions.already_sent} already sent, "
+              f"{exclusions.invalid} invalid, {exclusions.duplicates} duplicates in the file)")
+
+def render_stage(template, chunks, work_queue):
+    """Pipeline stage: each chunk's messages, then (contact, message) pairs
+    onto the send queue"""
+    for contacts in chunks:
+        with stage_timer.stage('render', rows=len(contacts)):
+            messages = template.render(contacts)
+        for pair in zip(contacts, messages):
+            if not work_queue.put(pair):
+                chunks.close()
+                return
+
+def send_messages_thread(excel_file_path, message_template, target_limit, campaign_id, message_delay=5, validate_first=False, mode=SEND_MODE_RELOAD, max_sessions=0, resume=False, rate_per_hour=0, burst=1, jitter=None):
+    """Thread function to send messages with pause/resume support.
+    
+    Contacts go through a staged pipeline (pipeline.py): rows are read,
+    normalized, filtered and stored as campaign work items
+    (campaign_queue.py), rendered, and fed into a bounded work queue, each
+    step in its own thread; one worker thread per browser session (up to
+    max_sessions, 0 = all configured) takes contacts off it, so the
+    browsers only ever wait on the page and throughput scales with sessions.
+    
+    resume=True runs a stored campaign (queued, stopped or cut off): its
+    pending items are sent first, then the part of the file it never got
+    to is read.
+    
+    Each session is paced by its own rate controller (rate_control.py):
+    rate_per_hour messages/hour if given, else one per message_delay
+    seconds, with up to `burst` back to back and `jitter` on every wait.
+    
+    The message is parsed once (message_templates.py) and each chunk's
+    messages are rendered before its contacts are queued.
+    """
+    global campaign_pipeline
+    status = CAMPAIGN_ERROR
+    pipeline = work_queue = None
+    workers = []
     try:
         # Store campaign details for resume functionality
-        sending_status['current_campaign_id'] = campaign_id
-        sending_status['current_excel_file'] = excel_file_path
-        sending_status['current_message'] = message_template
-        sending_status['current_target_limit'] = target_limit
-        sending_status['processed_contacts'] = 0
+        campaign_state.set(
+            current_campaign_id=campaign_id,
+            current_excel_file=excel_file_path,
+            current_message=message_template,
+            current_target_limit=target_limit,
+            processed_contacts=0,
+        )
+        if resume:
+            settled, requeued = campaign_store.reconcile(campaign_id)
+            campaign_store.set_status(campaign_id, CAMPAIGN_RUNNING)
+            print(f"[CAMPAIGN] Starting {campaign_id} ({settled} found already sent, {requeued} in flight requeued)")
+        else:
+            campaign_store.create(campaign_id, excel_file_path, message_template, target_limit,
+                                  message_delay, validate_first, mode, max_sessions,
+                                  rate_per_hour=rate_per_hour, burst=burst, jitter=jitter)
+        stored = campaign_store.get(campaign_id)
         
-        # Setup Chrome driver
-        if not setup_chrome_driver():
-            sending_status['errors'].append("Chrome driver setup failed. Using alternative method - opening WhatsApp links in browser.")
+        # Setup Chrome drivers (all sessions start in parallel)
+        sessions = session_pool.start(max_sessions or None)
+        if not sessions:
+            campaign_error("Chrome driver setup failed. Using alternative method - opening WhatsApp links in browser.")
             # Continue with alternative method
+            sessions = [session_pool.primary]
+        apply_send_mode(mode)
+        for session in sessions:
+            session.rate = campaign_rate(message_delay, rate_per_hour, burst, jitter)
+        campaign_state.set(active_sessions=len(sessions))
         
-        # Load Excel file
+        # Open the contact file, unless everything to send is already stored;
+        # rows are streamed from it as the queue drains, so the first message
+        # goes out before the whole file has been read
+        stage_timer.reset()
+        reader = None
         try:
-            data = pd.read_excel(excel_file_path)
-            print(f"Excel file loaded successfully. Columns: {list(data.columns)}")
-            print(f"Total rows: {len(data)}")
-        except Exception as e:
-            sending_status['errors'].append(f"Error loading Excel file: {str(e)}")
+            template = compile_template(message_template)
+        except ValueError as e:
+            campaign_error(str(e))
             return
+        if not stored['materialized']:
+            try:
+                reader = ContactReader(excel_file_path, default_country_code=DEFAULT_COUNTRY_CODE,
+                                       fields=template.columns)
+                template.validate(reader.columns)
+            except (ContactFileError, ValueError) as e:
+                if reader:
+                    reader.close()
+                campaign_error(str(e))
+                return
         
-        # Check if required columns exist (case-insensitive)
-        phone_column = None
-        for col in data.columns:
-            if col.lower() == 'phone':
-                phone_column = col
-                break
-        
-        if phone_column is None:
-            sending_status['errors'].append("Excel file must have a 'phone' column")
-            return
-        
-        # Get already sent numbers and invalid numbers from database
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Get sent numbers
-        cursor.execute('SELECT phone FROM sent_numbers')
-        sent_phones = set(row[0] for row in cursor.fetchall())
-        
-        # Get invalid numbers
-        cursor.execute('SELECT phone FROM invalid_numbers')
-        invalid_phones = set(row[0] for row in cursor.fetchall())
-        
-        # Combine both sets
-        excluded_phones = sent_phones.union(invalid_phones)
-        
-        conn.close()
+        with reader or contextlib.nullcontext(), stage_timer.stage('send_loop', rows=0) as loop_span:
+            # The exact count is only known once the file has been read; start
+            # from the sheet's row count so the progress bar has a scale
+            if reader:
+                estimated_total = stored['total'] + max(0, (reader.estimated_rows or 0) - stored['read_row'])
+                if target_limit and target_limit > 0:
+                    estimated_total = min(estimated_total, target_limit) if estimated_total else target_limit
+            else:
+                estimated_total = stored['total']
+            campaign_state.reset_counters(estimated_total)
+            session_pool.reset_counters()
+            if resume:
+                counts = campaign_store.counts(campaign_id)
+                campaign_state.set(
+                    sent_count=counts[OUTCOME_SENT],
+                    no_whatsapp_count=counts[OUTCOME_NO_WHATSAPP],
+                    failed_count=counts[ITEM_FAILED],
+                    processed_contacts=counts[OUTCOME_SENT] + counts[OUTCOME_NO_WHATSAPP] + counts[ITEM_FAILED],
+                )
+            publish_progress('counters')
+            
+            # read -> normalize -> render -> send -> record, each stage in
+            # its own thread (see pipeline.py)
+            pipeline = campaign_pipeline = Pipeline(lambda: campaign_state.is_sending)
+            raw_batches = pipeline.queue('normalize', PIPELINE_DEPTH) if reader else None
+            chunks = pipeline.queue('render', PIPELINE_DEPTH)
+            work_queue = pipeline.queue('send', len(sessions) * 4)
+            pipeline.watch('record', lambda: db.pending_writes)
+            workers = [
+                threading.Thread(
+                    target=session_worker,
+                    args=(session, work_queue, campaign_id, validate_first),
+                    daemon=True,
+                    name=f"worker-{session.name}",
+                )
+                for session in sessions
+            ]
+            for worker in workers:
+                worker.start()
+            
+            progress = {'queued': stored['total'], 'complete': False}
+            if reader:
+                pipeline.start('read', read_stage, reader, raw_batches, output=raw_batches)
+            pipeline.start('normalize', normalize_stage, reader, raw_batches, chunks, campaign_id, stored,
+                           target_limit, resume, progress, input=raw_batches, output=chunks)
+            pipeline.start('render', render_stage, template, chunks, work_queue, input=chunks)
+            pipeline.join()
+            
+            stage_failed = pipeline.error is not None
+            if pipeline.failed_stage == 'read':
+                campaign_error(f"Error loading Excel file: {str(pipeline.error)}")
+            elif stage_failed:
+                campaign_error(f"Error in the {pipeline.failed_stage} stage: {str(pipeline.error)}")
+            elif campaign_state.is_sending and progress['complete']:
+                # Whole file read (or target reached): the exact count is known
+                campaign_state.set(total_contacts=progress['queued'])
+            
+            # One end marker per worker, then wait for the queue to drain
+            work_queue.finish(consumers=len(workers))
+            for worker in workers:
+                worker.join()
+            loop_span['rows'] = campaign_state.get('processed_contacts')
         
-        # Filter out already sent and invalid numbers
+        if stage_failed:
+            status = CAMPAIGN_ERROR
+        elif campaign_state.is_sending:
+            status = CAMPAIGN_DONE
+        else:
+            status = CAMPAIGN_STOPPED
+        # Commit the last partial batch of outcomes before reporting done
+        with stage_timer.stage('record', rows=0):
+            db.flush()
+        # Don't quit the driver - keep browser open for WhatsApp to stay online
+            
+    except Exception as e:
+        campaign_error(f"Critical error: {str(e)}")
+        # Wind the stages and workers down before the sender is released,
+        # so none of them carries on into the next campaign
+        campaign_state.stop()
+        if pipeline is not None:
+            pipeline.join()
+        if work_queue is not None:
+            work_queue.finish(consumers=len(workers))
+        for worker in workers:
+            worker.join()
+    finally:
+        # Also on the early returns (unreadable file, no phone column), which
+        # used to leave the UI showing a campaign in progress. A stop already
+        # marked it stopped (and a resume may have queued it again since)
+        campaign_store.set_status(campaign_id, status, only_from=CAMPAIGN_RUNNING)
+        campaign_state.finish()
+        publish_progress('done')
+        scheduler.dispatch()  # next queued campaign, back to back
+
+def start_stored_campaign(stored):
+    """Start sending a stored (queued) campaign in the background; the
+    scheduler's way in. False if the sender or the sessions are busy."""
+    # Same lock as /validate_numbers, so a validation job can't start
+    # between the check and begin() and share the sessions with the campaign
+    with validation_lock:
+        if validation_active():
+            return False
+        if not campaign_state.begin():
+            return False
+    campaign_store.set_status(stored['id'], CAMPAIGN_RUNNING)
+    events.publish('status', full_status())
+    
+    thread = threading.Thread(
+        target=send_messages_thread,
+        args=(stored['file_path'], stored['message'], stored['target_limit'], stored['id'],
+              stored['message_delay'], bool(stored['validate_first']),
+              stored['send_mode'] or SEND_MODE_RELOAD, stored['max_sessions']),
+        kwargs={'resume': True, 'rate_per_hour': stored['rate_per_hour'], 'burst': stored['burst'],
+                'jitter': stored['jitter']},
+    )
+    thread.daemon = True
+    thread.start()
+    return True
+
+def stop_campaign():
+    """Stop the running campaign. It is marked stopped right away, so it
+    can be resumed (queued) while its thread is still winding down"""
+    campaign_id = campaign_state.get('current_campaign_id')
+    campaign_state.stop()
+    if campaign_id:
+        campaign_store.set_status(campaign_id, CAMPAIGN_STOPPED, only_from=CAMPAIGN_RUNNING)
+    publish_progress('counters')
+
+def resume_campaign(campaign_id):
+    """Put a campaign that was stopped or cut off back on the queue; it
+    continues where it was. Returns (ok, message)."""
+    stored = campaign_store.get(campaign_id)
+    if not stored:
+        return False, 'Campaign not found'
+    if not campaign_store.enqueue(campaign_id):
+        return False, f"Campaign is {stored['status']} and can't be resumed"
+    if scheduler.dispatch() == campaign_id:
+        return True, 'Campaign resumed'
+    scheduler.wake()
+    return True, 'Campaign queued to resume'
+
+def start_session_monitor():
+    """Startup hook: launch the browser sessions in the background and keep
+    them healthy, so campaigns don't wait for Chrome"""
+    session_monitor.start()
+
+def start_campaign_scheduler():
+    """Startup hook: queue the campaigns the last exit cut off (unless
+    WBM_RESUME_CAMPAIGNS=0) and start dispatching the queue"""
+    if os.environ.get('WBM_RESUME_CAMPAIGNS', '1').strip() != '0':
+        requeued = campaign_store.requeue_interrupted()
+        if requeued:
+            print(f"[CAMPAIGN] Queued {requeued} interrupted campaign(s) to resume")
+    scheduler.start()
+
+# ---------------------------------------------------------------------------
+# Validation-only jobs: check numbers for WhatsApp accounts without sending.
+# ---------------------------------------------------------------------------
+def validation_active():
+    job = current_validation
+    return job is not None and job.is_active
+
+def publish_validation(job):
+    """Push a validation job's progress to /events listeners"""
+    if events.subscriber_count:
+        events.publish('validation', job.snapshot())
+
+def validation_worker(session, work_queue, job, check_delay):
+    """Check contacts off the shared queue through one browser session"""
+    resting_state = 'ready' if session.is_up else session.state
+    session.state = 'validating'
+    while True:
+        contact = work_queue.get()
+        if contact is None:
+            break
+        # Once stopped, keep draining (without checking) until the sentinel
+        if not job.wait_if_paused():
+            continue
         try:
-            data = data[~data[phone_column].astype(str).isin(excluded_phones)]
-            print(f"After filtering sent and invalid numbers: {len(data)} contacts remaining")
-            print(f"Excluded {len(sent_phones)} sent numbers and {len(invalid_phones)} invalid numbers")
+            session.throttle()
+            label = f"SR#{contact.sr_no or contact.row} ({contact.phone})"
+            session.current_contact = label
+            job.current_contact = label
+            exists = check_whatsapp_account(contact.phone, session, source='validation')
+            if exists is None:
+                result = RESULT_UNKNOWN
+            else:
+                result = RESULT_VALID if exists else RESULT_INVALID
+            validation_store.record_result(job.id, contact, result)
+            processed = job.count(result)
+            if processed % PROGRESS_EVERY == 0:
+                validation_store.save_progress(job)
+            print(f"[{session.name}] Validated row {contact.row}: {label} -> {result}")
+            publish_validation(job)
+            job.sleep(check_delay)
         except Exception as e:
-            sending_status['errors'].append(f"Error filtering numbers: {str(e)}")
+            print(f"[{session.name}] Error validating row {contact.row}: {str(e)}")
+    session.current_contact = ''
+    session.state = resting_state
+
+def validate_numbers_thread(job, file_path, check_delay=1, max_sessions=0):
+    """Run a validation job over a contact file, skipping rows that already
+    have a result (so a stopped or interrupted job picks up where it was)"""
+    try:
+        sessions = session_pool.start(max_sessions or None)
+        if not sessions:
+            job.finish(JOB_ERROR, "Chrome driver setup failed - can't check numbers without a browser")
             return
         
-        # Apply target limit
-        if target_limit and target_limit > 0:
-            data = data.head(target_limit)
-        
-        sending_status['total_contacts'] = len(data)
-        sending_status['sent_count'] = 0
-        sending_status['failed_count'] = 0
-        sending_status['no_whatsapp_count'] = 0
-        sending_status['errors'] = []
-        sending_status['no_whatsapp_numbers'] = []
-        
-        # Send messages with pause/resume support
-        for index, row in data.iterrows():
+        with ContactReader(file_path, default_country_code=DEFAULT_COUNTRY_CODE) as reader:
+            job.total = reader.estimated_rows or 0
+            publish_validation(job)
+            
+            work_queue = queue.Queue(maxsize=len(sessions) * 4)
+            workers = [
+                threading.Thread(
+                    target=validation_worker,
+                    args=(session, work_queue, job, check_delay),
+                    daemon=True,
+                    name=f"validate-{session.name}",
+                )
+                for session in sessions
+            ]
+            for worker in workers:
+                worker.start()
+            
+            seen = 0
             try:
-                # Check if user stopped or paused
-                if not sending_status['is_sending']:
-                    break
-                    
-                # Check if paused
-                while sending_status['is_paused'] and sending_status['is_sending']:
-                    time.sleep(1)  # Wait while paused
-                    if not sending_status['is_sending']:  # Check if stopped while paused
+                for chunk in reader.iter_chunks():
+                    if not job.is_active:
                         break
-                        
-                if not sending_status['is_sending']:
-                    break
-                    
-                # Process phone number with better error handling
-                try:
-                    phone = str(row[phone_column]).strip()
-                    if not phone or phone == 'nan' or phone == 'None':
-                        print(f"Skipping row {index + 1}: Invalid phone number")
-                        continue
-                except Exception as e:
-                    print(f"Error processing phone number in row {index + 1}: {str(e)}")
-                    continue
-                
-                # Handle serial number (flexible column names)
-                try:
-                    sr_no = None
-                    # Try different possible column names for serial number
-                    for col in data.columns:
-                        if col.lower() in ['sr.no', 'sr_no', 'sr no', 'se.no', 'se_no', 'se no', 'serial', 's.no', 's_no', 's no']:
-                            sr_no = row.get(col, '')
+                    seen += len(chunk)
+                    # The checkpoint: rows with a stored result are done
+                    db.flush()
+                    done = validation_store.done_rows(job.id, chunk[0].row, chunk[-1].row)
+                    for contact in chunk:
+                        if contact.row in done:
+                            continue
+                        if not enqueue_contact(work_queue, contact, lambda: job.is_active):
                             break
-                    
-                    if sr_no is None or pd.isna(sr_no):
-                        sr_no = index + 1  # Use row index as fallback
-                    else:
-                        sr_no = str(sr_no).strip()
-                except:
-                    sr_no = index + 1  # Use row index as fallback
-                
-                sending_status['current_contact'] = f"SR#{sr_no} ({phone})"
-                sending_status['processed_contacts'] = index + 1
-                
-                # Get customer name (case-insensitive)
-                customer_name = ""
-                for col in data.columns:
-                    if col.lower() == 'name':
-                        customer_name = str(row[col]).strip()
-                        if customer_name in ('nan', 'None', ''):
-                            customer_name = ""
+                    if not job.is_active:
                         break
-
-                print(f"Processing contact {index + 1}: SR#{sr_no} ({phone})")
-                success, message = send_message_to_contact(phone, sr_no, message_template, campaign_id, customer_name)
-                print(message)
-                time.sleep(message_delay)  # Wait between messages using user-defined delay
-                
-            except Exception as e:
-                print(f"Error processing row {index + 1}: {str(e)}")
-                sending_status['errors'].append(f"Error processing row {index + 1}: {str(e)}")
-                continue
-        
-        sending_status['is_sending'] = False
-        sending_status['is_paused'] = False
-        # Don't quit the driver - keep browser open for WhatsApp to stay online
-        # if driver:
-        #     driver.quit()
-            
+                if job.is_active:
+                    job.total = seen  # exact once the whole file has been read
+            finally:
+                for _ in workers:
+                    work_queue.put(None)
+                for worker in workers:
+                    worker.join()
+        job.finish(JOB_DONE)
+    except ContactFileError as e:
+        job.finish(JOB_ERROR, str(e))
     except Exception as e:
-        sending_status['is_sending'] = False
-        sending_status['is_paused'] = False
-        sending_status['errors'].append(f"Critical error: {str(e)}")
-        # Don't quit the driver - keep browser open for WhatsApp to stay online
-        # if driver:
-        #     driver.quit()
+        job.finish(JOB_ERROR, f"Critical error: {str(e)}")
+    finally:
+        db.flush()
+        validation_store.save_progress(job)
+        snapshot = job.snapshot()
+        validation_store.set_status(job.id, snapshot['status'], snapshot['message'])
+        print(f"[VALIDATION] Job {job.id} {snapshot['status']}: {snapshot['valid_count']} valid, "
+              f"{snapshot['invalid_count']} invalid, {snapshot['unknown_count']} unknown")
+        publish_validation(job)
+        scheduler.dispatch()  # campaigns queued behind the job
 
 @app.route('/')
 def index():
@@ -612,37 +935,112 @@ def upload_file():
         
         try:
             file.save(file_path)
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': f'Error saving file: {str(e)}'
+            })
+        
+        # Parse once into a cached contact index (keyed by content hash);
+        # campaigns and link generation read the index, not the upload
+        try:
+            index_name, rows, cache_hit = build_contact_index(file_path, UPLOAD_FOLDER, DEFAULT_COUNTRY_CODE)
+        except ContactFileError as e:
             return jsonify({
-                'success': True,
-                'message': 'File uploaded successfully',
-                'filename': unique_filename
+                'success': False,
+                'message': str(e)
             })
         except Exception as e:
             return jsonify({
                 'success': False,
-                'message': f'Error saving file: {str(e)}'
+                'message': f'Error reading file: {str(e)}'
             })
+        finally:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+        
+        return jsonify({
+            'success': True,
+            'message': 'File already uploaded - using cached contacts' if cache_hit else 'File uploaded successfully',
+            'filename': index_name,
+            'contacts': rows
+        })
     else:
         return jsonify({
             'success': False,
-            'message': 'Invalid file type. Please upload Excel files only.'
+            'message': 'Invalid file type. Please upload Excel, CSV or Parquet files only.'
         })
 
+def template_error(message, file_path):
+    """Why `message` can't be rendered for the contacts in file_path, or None"""
+    try:
+        template = compile_template(message)
+        if template.columns:
+            with ContactReader(file_path, default_country_code=DEFAULT_COUNTRY_CODE) as reader:
+                template.validate(reader.columns)
+    except (ContactFileError, ValueError) as e:
+        return str(e)
+    return None
+
+def parse_start_at(value):
+    """Epoch seconds from a start-at given as a timestamp or an ISO 8601
+    date/time (local time unless it has an offset); None if not given"""
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid start_at: {value!r}")
+
+def parse_pacing(data):
+    """rate_per_hour / burst / jitter given in a request, validated"""
+    pacing = {}
+    try:
+        if data.get('rate_per_hour') not in (None, ''):
+            pacing['rate_per_hour'] = max(0.0, float(data['rate_per_hour']))
+        if data.get('burst') not in (None, ''):
+            pacing['burst'] = max(1, int(data['burst']))
+        if data.get('jitter') not in (None, ''):
+            pacing['jitter'] = min(1.0, max(0.0, float(data['jitter'])))
+    except (TypeError, ValueError):
+        raise ValueError('rate_per_hour, burst and jitter must be numbers')
+    return pacing
+
 @app.route('/send_messages', methods=['POST'])
 def send_messages():
-    global sending_status
-    
-    if sending_status['is_sending']:
-        return jsonify({
-            'success': False,
-            'message': 'Messages are already being sent. Please wait.'
-        })
-    
+    """Queue a campaign; it starts right away if nothing else is being sent"""
     data = request.get_json()
     message = data.get('message', '')
     filename = data.get('filename', '')
     target_limit = data.get('target_limit', 0)
     message_delay = data.get('message_delay', 5)
+    validate_first = bool(data.get('validate_first', False))
+    mode = data.get('send_mode', SEND_MODE_RELOAD)
+    try:
+        max_sessions = max(0, int(data.get('sessions', 0) or 0))
+    except (TypeError, ValueError):
+        max_sessions = 0
+    try:
+        priority = int(data.get('priority', 0) or 0)
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'message': 'Priority must be a whole number'
+        })
+    try:
+        start_at = parse_start_at(data.get('start_at'))
+        pacing = parse_pacing(data)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        })
     
     if not message or not filename:
         return jsonify({
@@ -650,45 +1048,106 @@ def send_messages():
             'message': 'Message and file are required'
         })
     
-    file_path = os.path.join(UPLOAD_FOLDER, filename)
-    if not os.path.exists(file_path):
+    if mode not in SEND_MODES:
+        return jsonify({
+            'success': False,
+            'message': f'Unknown send mode: {mode}'
+        })
+    
+    file_path = contact_index_path(filename)
+    if not file_path:
         return jsonify({
             'success': False,
             'message': 'File not found'
         })
     
-    # Generate campaign ID
-    campaign_id = f"campaign_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    # Placeholders are checked now, not when the campaign comes up
+    error = template_error(message, file_path)
+    if error:
+        return jsonify({
+            'success': False,
+            'message': error
+        })
     
-    # Reset status
-    sending_status['is_sending'] = True
-    sending_status['current_contact'] = ''
-    sending_status['total_contacts'] = 0
-    sending_status['sent_count'] = 0
-    sending_status['failed_count'] = 0
-    sending_status['no_whatsapp_count'] = 0
-    sending_status['errors'] = []
-    sending_status['no_whatsapp_numbers'] = []
+    # Generate campaign ID (unique even for two submitted in the same second)
+    campaign_id = f"campaign_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
     
-    # Start sending in a separate thread
-    thread = threading.Thread(target=send_messages_thread, args=(file_path, message, target_limit, campaign_id, message_delay))
-    thread.daemon = True
-    thread.start()
+    # Queued first, then started by the scheduler if the sender is free
+    # (atomically, so two requests can't both start a campaign)
+    campaign_store.create(campaign_id, file_path, message, target_limit, message_delay, validate_first,
+                          mode, max_sessions, status=CAMPAIGN_QUEUED, priority=priority, start_at=start_at,
+                          **pacing)
+    if scheduler.dispatch() == campaign_id:
+        return jsonify({
+            'success': True,
+            'message': 'Message sending started',
+            'campaign_id': campaign_id,
+            'queued': False
+        })
+    scheduler.wake()
     
+    position = next((index for index, queued in enumerate(campaign_store.queued(), 1)
+                     if queued['id'] == campaign_id), None)
+    if position is None:
+        # The scheduler thread got to it first (or it was cancelled already)
+        if campaign_store.get(campaign_id)['status'] == CAMPAIGN_CANCELLED:
+            return jsonify({
+                'success': False,
+                'message': 'Campaign was cancelled before it started',
+                'campaign_id': campaign_id
+            })
+        return jsonify({
+            'success': True,
+            'message': 'Message sending started',
+            'campaign_id': campaign_id,
+            'queued': False
+        })
+    when = f" to start at {datetime.fromtimestamp(start_at).strftime('%Y-%m-%d %H:%M')}" if start_at else ''
     return jsonify({
         'success': True,
-        'message': 'Message sending started'
+        'message': f'Campaign queued{when} (position {position})',
+        'campaign_id': campaign_id,
+        'queued': True,
+        'position': position
     })
 
 @app.route('/status')
 def get_status():
-    return jsonify(sending_status)
+    return jsonify(full_status())
+
+def full_status():
+    """The whole campaign state plus per-session counters"""
+    status = dict(campaign_state.snapshot())
+    status['sessions'] = session_pool.snapshot()
+    status['pipeline'] = campaign_pipeline.snapshot() if campaign_pipeline else None
+    status['db_write_error'] = db.write_error
+    return status
+
+@app.route('/events')
+def campaign_events():
+    """Server-Sent Events stream of campaign progress.
+    
+    Starts with a full 'status' event, then pushes contact / sent / invalid /
+    failed / campaign_error / counters / done events as they happen.
+    """
+    return Response(
+        events.stream(initial=[('status', full_status())]),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/sessions')
+def get_sessions():
+    """Configured browser sessions and their per-campaign counters"""
+    return jsonify({
+        'success': True,
+        'sessions': session_pool.snapshot(),
+        'monitor': session_monitor.snapshot()
+    })
 
 @app.route('/stop_sending', methods=['POST'])
 def stop_sending():
-    global sending_status
-    sending_status['is_sending'] = False
-    sending_status['is_paused'] = False
+    stop_campaign()
     return jsonify({
         'success': True,
         'message': 'Stopping message sending...'
@@ -697,9 +1156,8 @@ def stop_sending():
 @app.route('/pause_sending', methods=['POST'])
 def pause_sending():
     """Pause the current sending process"""
-    global sending_status
-    if sending_status['is_sending'] and not sending_status['is_paused']:
-        sending_status['is_paused'] = True
+    if campaign_state.pause():
+        publish_progress('counters')
         return jsonify({
             'success': True,
             'message': 'Message sending paused. You can resume anytime.'
@@ -713,9 +1171,8 @@ def pause_sending():
 @app.route('/resume_sending', methods=['POST'])
 def resume_sending():
     """Resume the paused sending process"""
-    global sending_status
-    if sending_status['is_sending'] and sending_status['is_paused']:
-        sending_status['is_paused'] = False
+    if campaign_state.resume():
+        publish_progress('counters')
         return jsonify({
             'success': True,
             'message': 'Message sending resumed.'
@@ -726,14 +1183,136 @@ def resume_sending():
             'message': 'No paused sending process to resume.'
         })
 
+def campaign_json(stored, queue_ids=()):
+    """A stored campaign for the /campaigns API, with its item counts"""
+    campaign = {key: value for key, value in stored.items() if key != 'message'}
+    campaign['filename'] = os.path.basename(stored['file_path'])
+    campaign['validate_first'] = bool(stored['validate_first'])
+    campaign['materialized'] = bool(stored['materialized'])
+    campaign['start_at'] = (datetime.fromtimestamp(stored['start_at']).isoformat(timespec='seconds')
+                            if stored['start_at'] else None)
+    campaign['queue_position'] = queue_ids.index(stored['id']) + 1 if stored['id'] in queue_ids else None
+    campaign['counts'] = campaign_store.counts(stored['id'])
+    return campaign
+
+@app.route('/campaigns')
+def list_campaigns():
+    """The queue, in the order it will run, followed by recent campaigns"""
+    try:
+        limit = max(1, min(int(request.args.get('limit', 50)), 500))
+    except ValueError:
+        limit = 50
+    queued = campaign_store.queued()
+    queue_ids = [stored['id'] for stored in queued]
+    recent = [stored for stored in campaign_store.recent(limit) if stored['id'] not in queue_ids]
+    return jsonify({
+        'success': True,
+        'current_campaign_id': campaign_state.get('current_campaign_id') if campaign_state.is_sending else None,
+        'queue': [campaign_json(stored, queue_ids) for stored in queued],
+        'campaigns': [campaign_json(stored) for stored in recent]
+    })
+
+@app.route('/campaigns/reorder', methods=['POST'])
+def reorder_campaigns():
+    """Run queued campaigns in the given order (within the same priority)"""
+    data = request.get_json(silent=True) or {}
+    order = data.get('order')
+    if not isinstance(order, list) or not order:
+        return jsonify({
+            'success': False,
+            'message': 'order must be a list of campaign ids'
+        })
+    ordered = campaign_store.reorder([str(campaign_id) for campaign_id in order])
+    scheduler.wake()
+    return jsonify({
+        'success': True,
+        'message': f'Reordered {len(ordered)} queued campaign(s)',
+        'queue': [stored['id'] for stored in campaign_store.queued()]
+    })
+
+@app.route('/campaigns/<campaign_id>', methods=['GET', 'POST'])
+def campaign_detail(campaign_id):
+    """One campaign; POST changes a queued campaign's priority, start_at,
+    message_delay or pacing (rate_per_hour, burst, jitter)"""
+    stored = campaign_store.get(campaign_id)
+    if not stored:
+        return jsonify({
+            'success': False,
+            'message': 'Campaign not found'
+        }), 404
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        settings = {}
+        try:
+            if 'priority' in data:
+                settings['priority'] = int(data['priority'] or 0)
+            if 'message_delay' in data:
+                settings['message_delay'] = max(0.0, float(data['message_delay']))
+            if 'start_at' in data:
+                settings['start_at'] = parse_start_at(data['start_at'])
+            settings.update(parse_pacing(data))
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                'success': False,
+                'message': f'Invalid setting: {str(e)}'
+            })
+        if not campaign_store.update_queued(campaign_id, **settings):
+            return jsonify({
+                'success': False,
+                'message': f"Only queued campaigns can be changed (this one is {stored['status']})"
+            })
+        scheduler.wake()
+        stored = campaign_store.get(campaign_id)
+    queue_ids = [queued['id'] for queued in campaign_store.queued()]
+    return jsonify({
+        'success': True,
+        'campaign': campaign_json(stored, queue_ids)
+    })
+
+@app.route('/campaigns/<campaign_id>/<action>', methods=['POST'])
+def control_campaign(campaign_id, action):
+    """cancel a queued (or stop the running) campaign, or resume a stopped one"""
+    if action not in ('cancel', 'resume'):
+        return jsonify({
+            'success': False,
+            'message': f'Unknown action: {action}'
+        }), 404
+    stored = campaign_store.get(campaign_id)
+    if not stored:
+        return jsonify({
+            'success': False,
+            'message': 'Campaign not found'
+        }), 404
+    if action == 'resume':
+        ok, message = resume_campaign(campaign_id)
+        return jsonify({
+            'success': ok,
+            'message': message
+        })
+    if campaign_store.cancel(campaign_id):
+        scheduler.wake()
+        return jsonify({
+            'success': True,
+            'message': 'Campaign removed from the queue'
+        })
+    if stored['status'] == CAMPAIGN_RUNNING and campaign_state.get('current_campaign_id') == campaign_id:
+        stop_campaign()
+        return jsonify({
+            'success': True,
+            'message': 'Stopping the running campaign...'
+        })
+    return jsonify({
+        'success': False,
+        'message': f"Campaign is {stored['status']} and can't be cancelled"
+    })
+
 @app.route('/close_browser', methods=['POST'])
 def close_browser():
     """Manually close the browser when needed"""
-    global driver
     try:
-        if driver:
-            driver.quit()
-            driver = None
+        # Closed on purpose: don't relaunch until Restart Browser
+        session_monitor.suspend()
+        session_pool.quit_all()
         return jsonify({
             'success': True,
             'message': 'Browser closed successfully'
@@ -746,28 +1325,14 @@ def close_browser():
 
 @app.route('/restart_browser', methods=['POST'])
 def restart_browser():
-    """Restart the browser session to fix session issues"""
-    global driver
+    """Restart the browser sessions to fix session issues. Returns right
+    away; the sessions are relaunched in the background (see /sessions)"""
     try:
-        # Close existing driver if it exists
-        if driver:
-            try:
-                driver.quit()
-            except:
-                pass
-            driver = None
-        
-        # Setup new driver
-        if setup_chrome_driver():
-            return jsonify({
-                'success': True,
-                'message': 'Browser session restarted successfully'
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'message': 'Failed to restart browser session'
-            })
+        session_monitor.restart()
+        return jsonify({
+            'success': True,
+            'message': 'Browser session restarting...'
+        })
     except Exception as e:
         return jsonify({
             'success': False,
@@ -778,45 +1343,63 @@ def restart_browser():
 def get_no_whatsapp_numbers():
     return jsonify({
         'success': True,
-        'numbers': sending_status.get('no_whatsapp_numbers', [])
+        'numbers': campaign_state.no_whatsapp_numbers()
     })
 
-@app.route('/get_invalid_numbers')
-def get_invalid_numbers():
-    """Get all invalid numbers from database"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('SELECT phone, name, invalid_date, campaign_id, reason FROM invalid_numbers ORDER BY invalid_date DESC')
-    invalid_numbers = cursor.fetchall()
-    conn.close()
+def history_response(table, row_to_json):
+    """Keyset-paginated history query from the request's query string.
+    
+    ?limit=100&cursor=<next_cursor>&after_id=<id>&q=<phone or campaign>&campaign=<id>
+    
+    'total' is only counted for a first page; with cursor or after_id it is null.
+    """
+    args = request.args
+    try:
+        after_id = args.get('after_id', type=int)
+        rows, next_cursor, total = db.history_page(
+            table,
+            limit=args.get('limit', 100, type=int),
+            cursor=args.get('cursor') or None,
+            after_id=after_id,
+            search=args.get('q', '').strip() or None,
+            campaign=args.get('campaign') or None,
+        )
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     
     return jsonify({
         'success': True,
-        'numbers': [{'phone': row[0], 'name': row[1], 'date': row[2], 'campaign': row[3], 'reason': row[4]} for row in invalid_numbers]
+        'numbers': [row_to_json(row) for row in rows],
+        'next_cursor': next_cursor,
+        'last_id': max((row['id'] for row in rows), default=after_id),
+        'total': total
+    })
+
+@app.route('/get_invalid_numbers')
+def get_invalid_numbers():
+    """Page through invalid numbers from database, newest first"""
+    return history_response('invalid_numbers', lambda row: {
+        'id': row['id'], 'phone': row['phone'], 'name': row['name'], 'date': row['invalid_date'],
+        'campaign': row['campaign_id'], 'reason': row['reason']
     })
 
 @app.route('/get_sent_numbers')
 def get_sent_numbers():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('SELECT phone, name, sent_date, campaign_id FROM sent_numbers ORDER BY sent_date DESC')
-    sent_numbers = cursor.fetchall()
-    conn.close()
-    
-    return jsonify({
-        'success': True,
-        'numbers': [{'phone': row[0], 'name': row[1], 'date': row[2], 'campaign': row[3]} for row in sent_numbers]
+    """Page through sent numbers from database, newest first"""
+    return history_response('sent_numbers', lambda row: {
+        'id': row['id'], 'phone': row['phone'], 'name': row['name'], 'date': row['sent_date'],
+        'campaign': row['campaign_id']
     })
 
 @app.route('/delete_sent_numbers', methods=['POST'])
 def delete_sent_numbers():
     """Delete all sent numbers from database"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM sent_numbers')
-        conn.commit()
-        conn.close()
+        db.flush()  # so queued rows don't reappear after the delete
+        db.execute('DELETE FROM sent_numbers')
         
         return jsonify({
             'success': True,
@@ -832,11 +1415,8 @@ def delete_sent_numbers():
 def delete_invalid_numbers():
     """Delete all invalid numbers from database"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM invalid_numbers')
-        conn.commit()
-        conn.close()
+        db.flush()  # so queued rows don't reappear after the delete
+        db.execute('DELETE FROM invalid_numbers')
         
         return jsonify({
             'success': True,
@@ -848,75 +1428,119 @@ def delete_invalid_numbers():
             'message': f'Error deleting invalid numbers: {str(e)}'
         })
 
-@app.route('/generate_whatsapp_links', methods=['POST'])
+def iter_link_frames(file_path, template, target_limit=0):
+    """Links for a contact file a chunk at a time (DataFrames with
+    LINK_COLUMNS), after the same exclusions as a campaign, up to target_limit"""
+    produced = 0
+    with ContactReader(file_path, LINK_BATCH_ROWS, DEFAULT_COUNTRY_CODE, template.columns) as reader, \
+            ExclusionFilter(db, validity_cache.invalid_cutoff()) as exclusions:
+        template.validate(reader.columns)
+        for chunk in reader.iter_chunks():
+            # Filter out already sent, invalid and duplicate numbers
+            fresh = exclusions.filter(chunk)
+            # Apply target limit
+            if target_limit and target_limit > 0:
+                fresh = fresh[:target_limit - produced]
+            if fresh:
+                produced += len(fresh)
+                yield link_frame(fresh, template)
+            if target_limit and 0 < target_limit <= produced:
+                break
+
+@app.route('/generate_whatsapp_links', methods=['GET', 'POST'])
 def generate_whatsapp_links():
-    """Generate WhatsApp links for manual sending"""
-    data = request.get_json()
+    """Generate WhatsApp links for manual sending.
+    
+    format=json (default) returns one page of links: up to page_size after
+    the file row given as cursor, plus next_cursor for the page after.
+    format=ndjson or csv streams every link as a download. Parameters come
+    as JSON (POST) or a query string (GET, e.g. a download link).
+    """
+    data = request.get_json(silent=True) or request.args
     message = data.get('message', '')
     filename = data.get('filename', '')
-    target_limit = data.get('target_limit', 0)
+    output = data.get('format', 'json')
+    try:
+        target_limit = int(data.get('target_limit', 0) or 0)
+        page_size = max(1, min(int(data.get('page_size', LINK_PAGE_SIZE)), MAX_LINK_PAGE_SIZE))
+        cursor = int(data.get('cursor', 0) or 0)
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'message': 'target_limit, page_size and cursor must be whole numbers'
+        })
     
     if not message or not filename:
         return jsonify({
             'success': False,
             'message': 'Message and file are required'
         })
+    if output not in ('json', 'ndjson', 'csv'):
+        return jsonify({
+            'success': False,
+            'message': f'Unknown format: {output}'
+        })
     
-    file_path = os.path.join(UPLOAD_FOLDER, filename)
-    if not os.path.exists(file_path):
+    file_path = contact_index_path(filename)
+    if not file_path:
         return jsonify({
             'success': False,
             'message': 'File not found'
         })
     
-    try:
-        # Load Excel file
-        df = pd.read_excel(file_path)
-        
-        # Get already sent numbers and invalid numbers from database
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Get sent numbers
-        cursor.execute('SELECT phone FROM sent_numbers')
-        sent_phones = set(row[0] for row in cursor.fetchall())
-        
-        # Get invalid numbers
-        cursor.execute('SELECT phone FROM invalid_numbers')
-        invalid_phones = set(row[0] for row in cursor.fetchall())
-        
-        # Combine both sets
-        excluded_phones = sent_phones.union(invalid_phones)
-        
-        conn.close()
-        
-        # Filter out already sent and invalid numbers
-        df = df[~df['phone'].astype(str).isin(excluded_phones)]
-        
-        # Apply target limit
-        if target_limit and target_limit > 0:
-            df = df.head(target_limit)
+    error = template_error(message, file_path)
+    if error:
+        return jsonify({
+            'success': False,
+            'message': error
+        })
+    template = compile_template(message)
+    
+    if output != 'json':
+        # The whole file, streamed a chunk at a time
+        def generate():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            if output == 'csv':
+                writer.writerow(LINK_COLUMNS)
+            try:
+                for frame in iter_link_frames(file_path, template, target_limit):
+                    if output == 'csv':
+                        writer.writerows(frame.itertuples(index=False, name=None))
+                    else:
+                        buffer.write(frame.to_json(orient='records', lines=True, force_ascii=False).rstrip('\n') + '\n')
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            except Exception as e:
+                print(f"[LINKS] Stopped streaming links for {filename}: {str(e)}")
+                if output == 'ndjson':
+                    yield json.dumps({'error': f'Error generating links: {str(e)}'}) + '\n'
         
-        # Generate links
-        links = []
-        for _, row in df.iterrows():
-            phone = str(row['phone'])
-            sr_no = row.get('sr.no', row.get('se.no', ''))
-            display_name = f"SR#{sr_no}"
-            formatted_message = message.format(name=display_name)
-            encoded_message = urllib.parse.quote(formatted_message)
-            link = f"https://web.whatsapp.com/send?phone={phone}&text={encoded_message}&app_absent=0"
-            links.append({
-                'phone': phone,
-                'sr_no': sr_no,
-                'message': formatted_message,
-                'link': link
-            })
+        download_name = f"{os.path.splitext(filename)[0]}_links.{output}"
+        return Response(
+            generate(),
+            mimetype='text/csv' if output == 'csv' else 'application/x-ndjson',
+            headers={'Content-Disposition': f'attachment; filename="{download_name}"'}
+        )
+    
+    try:
+        # One page: rows after the cursor, and whether any come after it
+        links, has_more = [], False
+        for frame in iter_link_frames(file_path, template, target_limit):
+            frame = frame[frame['row'] > cursor]
+            room = page_size - len(links)
+            if len(frame) > room:
+                links.extend(frame.head(room).to_dict('records'))
+                has_more = True
+                break
+            links.extend(frame.to_dict('records'))
         
         return jsonify({
             'success': True,
             'links': links,
-            'total': len(links)
+            'total': len(links),
+            'next_cursor': links[-1]['row'] if has_more else None
         })
         
     except Exception as e:
@@ -925,6 +1549,177 @@ def generate_whatsapp_links():
             'message': f'Error generating links: {str(e)}'
         })
 
+@app.route('/validate_numbers', methods=['POST'])
+def validate_numbers():
+    """Start a validation-only job on an uploaded file, or resume one
+    (pass its job_id) that was stopped or cut off by a restart"""
+    global current_validation
+    data = request.get_json() or {}
+    filename = data.get('filename', '')
+    job_id = data.get('job_id')
+    try:
+        check_delay = max(0.0, float(data.get('check_delay', 1)))
+        max_sessions = max(0, int(data.get('sessions', 0) or 0))
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'message': 'check_delay and sessions must be numbers'
+        })
+    
+    with validation_lock:
+        if validation_active():
+            return jsonify({
+                'success': False,
+                'message': 'A validation job is already running.'
+            })
+        if campaign_state.is_busy:
+            return jsonify({
+                'success': False,
+                'message': 'Messages are being sent. Wait for the campaign to finish before validating.'
+            })
+        
+        if job_id:
+            stored = validation_store.get(job_id)
+            if not stored:
+                return jsonify({
+                    'success': False,
+                    'message': 'Validation job not found'
+                })
+            if stored['status'] not in RESUMABLE_STATUSES:
+                return jsonify({
+                    'success': False,
+                    'message': f"Job is {stored['status']} and can't be resumed"
+                })
+            filename = stored['filename']
+        elif not filename:
+            return jsonify({
+                'success': False,
+                'message': 'File is required'
+            })
+        
+        file_path = contact_index_path(filename)
+        if not file_path:
+            return jsonify({
+                'success': False,
+                'message': 'File not found - upload it again to continue'
+            })
+        
+        if job_id:
+            job = ValidationJob(job_id, filename, counts=validation_store.counts(job_id))
+            validation_store.set_status(job_id, job.status)
+        else:
+            job_id = f"validation_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:4]}"
+            job = ValidationJob(job_id, filename)
+            validation_store.create(job_id, filename)
+        current_validation = job
+    
+    thread = threading.Thread(target=validate_numbers_thread, args=(job, file_path, check_delay, max_sessions))
+    thread.daemon = True
+    thread.start()
+    
+    return jsonify({
+        'success': True,
+        'message': 'Validation resumed' if data.get('job_id') else 'Validation started',
+        'job': job.snapshot()
+    })
+
+def validation_job_status(job_id):
+    """A job's live state if it's the current one, else what's stored"""
+    job = current_validation
+    if job is not None and job.id == job_id:
+        return job.snapshot()
+    return validation_store.get(job_id)
+
+@app.route('/validation_jobs')
+def list_validation_jobs():
+    jobs = validation_store.recent()
+    current = current_validation
+    if current is not None:
+        jobs = [current.snapshot() if job['id'] == current.id else job for job in jobs]
+    return jsonify({
+        'success': True,
+        'jobs': jobs
+    })
+
+@app.route('/validation_jobs/<job_id>')
+def get_validation_job(job_id):
+    status = validation_job_status(job_id)
+    if not status:
+        return jsonify({
+            'success': False,
+            'message': 'Validation job not found'
+        })
+    return jsonify({
+        'success': True,
+        'job': status
+    })
+
+@app.route('/validation_jobs/<job_id>/<action>', methods=['POST'])
+def control_validation_job(job_id, action):
+    """pause / resume / stop the running job"""
+    job = current_validation
+    if action not in ('pause', 'resume', 'stop'):
+        return jsonify({
+            'success': False,
+            'message': f'Unknown action: {action}'
+        })
+    if job is None or job.id != job_id or not job.is_active:
+        return jsonify({
+            'success': False,
+            'message': 'This validation job is not running.'
+        })
+    if not getattr(job, action)():
+        return jsonify({
+            'success': False,
+            'message': f'Validation job is {job.status}; cannot {action}.'
+        })
+    validation_store.set_status(job.id, job.status)
+    publish_validation(job)
+    return jsonify({
+        'success': True,
+        'message': f'Validation job {job.status}.',
+        'job': job.snapshot()
+    })
+
+@app.route('/validation_jobs/<job_id>/export')
+def export_validation_job(job_id):
+    """Download a job's results as CSV: ?status=valid|invalid|unknown (default all)"""
+    status = request.args.get('status') or None
+    if status is not None and status not in RESULT_STATUSES:
+        return jsonify({
+            'success': False,
+            'message': f'Unknown status: {status}'
+        })
+    if not validation_job_status(job_id):
+        return jsonify({
+            'success': False,
+            'message': 'Validation job not found'
+        })
+    db.flush()  # include results still waiting in the write queue
+    
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for row in validation_store.iter_results(job_id, status):
+            writer.writerow(row)
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    download_name = f"{job_id}_{status or 'all'}.csv"
+    return Response(
+        generate(),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{download_name}"'}
+    )
+
 if __name__ == '__main__':
+    # With the reloader only its child process serves (and resumes)
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_session_monitor()
+        start_campaign_scheduler()
     app.run(debug=True, host='0.0.0.0', port=8765)
 
@@ -0,0 +1,322 @@
+"""
+Campaign pipeline benchmark — contact streaming -> exclusion filter -> send -> record.
+
+Generates synthetic contact workbooks, runs the real send_messages_thread from
+app.py against a FakeSendDriver (or the local stand-in page with --driver
+standin), and reports per-stage wall time, peak RSS and rows/sec as JSON.
+
+    python benchmarks/bench_campaign.py                      # 1k, 50k, 500k
+    python benchmarks/bench_campaign.py --rows 50000 --output bench.json
+
+Each workbook size runs in its own subprocess so peak RSS is per size, and
+against a throwaway APPDATA so the real tracker database is never touched.
+Generated workbooks are cached in benchmarks/data/ (gitignored) because
+writing a 500k-row xlsx takes longer than reading it.
+
+Stages (names match stage_timer.stage() calls in app.py):
+  read_contacts     pulling raw row batches out of the streaming reader
+  normalize         phone keys, names and serials for each batch
+  exclusion_filter  loading sent/invalid history + filtering each chunk
+  render            message templates for each chunk
+  send_loop         wall time from the first chunk until every worker is done
+                    (the other stages run inside it, in pipeline threads)
+  record            queueing outcome rows for the DB writer + the final flush
+
+The pipeline's queue depths and waits at the end of the run are reported
+under 'pipeline' (see pipeline.py).
+
+first_contact_seconds is the time from opening the file to the first
+contact being handed to a session - flat regardless of workbook size now
+that contacts are streamed.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+
+DEFAULT_SIZES = (1000, 50000, 500000)
+MESSAGE = "Hello {name}, this is a benchmark message."
+
+
+# ---------------------------------------------------------------------------
+# Memory probes
+# ---------------------------------------------------------------------------
+def current_rss_mb():
+    """Resident set size of this process right now, in MB."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is a high-water mark (KB on Linux, bytes on macOS) — the
+        # best we can do without psutil or /proc.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        return 0.0
+
+
+class RssSampler:
+    """Samples RSS in the background and attributes the peak to the stage
+    app.stage_timer says is running at the time."""
+
+    def __init__(self, stage_timer, interval=0.005):
+        self.stage_timer = stage_timer
+        self.interval = interval
+        self.peaks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            stage = self.stage_timer.current or 'setup'
+            rss = current_rss_mb()
+            if rss > self.peaks.get(stage, 0.0):
+                self.peaks[stage] = rss
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+def synthetic_phone(i):
+    """Pakistani-mobile-shaped numbers, unique per row index."""
+    return 923000000000 + i
+
+
+def workbook_path(rows):
+    return os.path.join(DATA_DIR, f"contacts_{rows}.xlsx")
+
+
+def generate_workbook(rows):
+    """Write (or reuse) a contacts workbook with Sr.No / phone / name columns.
+
+    Phones are written as numeric cells, the way most real sheets arrive.
+    """
+    path = workbook_path(rows)
+    if os.path.exists(path):
+        return path
+    from openpyxl import Workbook
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Contacts')
+    ws.append(['Sr.No', 'phone', 'name'])
+    for i in range(rows):
+        ws.append([i + 1, synthetic_phone(i), f"Customer {i + 1}"])
+    tmp_path = path + '.tmp'
+    wb.save(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def seed_history(app, rows, history_ratio):
+    """Pre-populate sent/invalid history so the exclusion filter has work."""
+    import sqlite3
+
+    count = int(rows * history_ratio)
+    conn = sqlite3.connect(app.DB_PATH)
+    conn.executemany(
+        'INSERT OR IGNORE INTO sent_numbers (phone, name, campaign_id, phone_key) VALUES (?, ?, ?, ?)',
+        ((str(synthetic_phone(i)), 'seed', 'bench_seed', str(synthetic_phone(i))) for i in range(0, count * 2, 2)),
+    )
+    conn.commit()
+    conn.close()
+    return count
+
+
+# ---------------------------------------------------------------------------
+# One benchmark run (runs inside a fresh subprocess)
+# ---------------------------------------------------------------------------
+def run_single(rows, send_limit, history_ratio, driver_name, invalid_ratio, latency, validate_first=False,
+               send_mode='reload', sessions=1, indexed=False):
+    os.environ['APPDATA'] = tempfile.mkdtemp(prefix='wbm_bench_')
+    sys.path.insert(0, REPO_ROOT)
+    path = generate_workbook(rows)
+
+    import app
+    from send_drivers import FakeSendDriver
+    from sessions import SessionConfig, SessionPool
+
+    seeded = seed_history(app, rows, history_ratio)
+
+    index_seconds = None
+    if indexed:
+        # What /upload does: parse once into the cached contact index
+        from contacts import build_contact_index
+        started = time.perf_counter()
+        index_name, _, _ = build_contact_index(path, app.UPLOAD_FOLDER)
+        index_seconds = round(time.perf_counter() - started, 4)
+        path = os.path.join(app.UPLOAD_FOLDER, index_name)
+
+    standin = None
+    base_url = app.WHATSAPP_URL
+    if driver_name == 'standin':
+        from whatsapp_standin import StandInServer
+        standin = StandInServer(invalid_ratio=invalid_ratio).start()
+        base_url = standin.url
+    # One throwaway Chrome profile per session, never the user's real ones
+    app.session_pool = SessionPool([
+        SessionConfig(f"bench{i + 1}", os.path.join(os.environ['APPDATA'], f"chrome{i + 1}"),
+                      debug_port=9222 + i)
+        for i in range(sessions)
+    ], base_url)
+    if driver_name == 'standin':
+        app.install_send_driver(None)
+
+        def counters():
+            totals = {}
+            for session in app.session_pool.sessions:
+                send_driver = session.get_send_driver()
+                for key, value in (send_driver.counters() if send_driver else {}).items():
+                    totals[key] = totals.get(key, 0) + value
+            return totals
+    else:
+        fake = FakeSendDriver(invalid_ratio=invalid_ratio, latency=latency)
+        app.install_send_driver(fake)
+        counters = fake.counters
+
+    app.campaign_state.begin()
+    started = time.perf_counter()
+    with RssSampler(app.stage_timer) as sampler, open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull):
+            app.send_messages_thread(path, MESSAGE, send_limit, 'bench', 0, validate_first, send_mode)
+    total = time.perf_counter() - started
+
+    stages = app.stage_timer.snapshot()
+    for name, entry in stages.items():
+        entry['rows_per_sec'] = round(entry['rows'] / entry['seconds'], 1) if entry['seconds'] > 0 else None
+        entry['seconds'] = round(entry['seconds'], 4)
+        entry['peak_rss_mb'] = round(sampler.peaks.get(name, 0.0), 1)
+
+    standin_stats = None
+    if standin is not None:
+        standin_stats = standin.stats()
+        app.session_pool.quit_all()
+        standin.stop()
+
+    status = app.campaign_state.snapshot()
+    return {
+        'rows': rows,
+        'send_limit': send_limit,
+        'history_rows': seeded,
+        'driver': driver_name,
+        'validate_first': validate_first,
+        'send_mode': send_mode,
+        'sessions': sessions,
+        'indexed': indexed,
+        'index_build_seconds': index_seconds,
+        'total_seconds': round(total, 4),
+        'peak_rss_mb': round(max(sampler.peaks.values(), default=0.0), 1),
+        'first_contact_seconds': round(app.stage_timer.marks.get('first_contact', 0.0), 4),
+        'stages': stages,
+        'pipeline': app.campaign_pipeline.snapshot() if app.campaign_pipeline else None,
+        'outcome': {
+            'total_contacts': status['total_contacts'],
+            'sent': status['sent_count'],
+            'no_whatsapp': status['no_whatsapp_count'],
+            'failed': status['failed_count'],
+            'errors': len(status['errors']),
+        },
+        'driver_counters': counters(),
+        'session_counters': app.session_pool.snapshot(),
+        'standin': standin_stats,
+    }
+
+
+def run_isolated(rows, args):
+    """Run one size in a child interpreter and return its parsed result."""
+    generate_workbook(rows)  # outside the measured process
+    cmd = [
+        sys.executable, os.path.abspath(__file__), '--single', str(rows),
+        '--send-limit', str(args.send_limit),
+        '--history-ratio', str(args.history_ratio),
+        '--driver', args.driver,
+        '--invalid-ratio', str(args.invalid_ratio),
+        '--latency', str(args.latency),
+    ]
+    if args.validate_first:
+        cmd.append('--validate-first')
+    cmd += ['--send-mode', args.send_mode, '--sessions', str(args.sessions)]
+    if args.indexed:
+        cmd.append('--indexed')
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {'rows': rows, 'error': proc.stderr.strip().splitlines()[-1:] or ['unknown error']}
+    return json.loads(proc.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the campaign pipeline stages.")
+    parser.add_argument('--rows', type=int, action='append',
+                        help="workbook size to run (repeatable; default 1k, 50k, 500k)")
+    parser.add_argument('--send-limit', type=int, default=10000,
+                        help="target_limit for the send stage (0 = every remaining row)")
+    parser.add_argument('--history-ratio', type=float, default=0.1,
+                        help="fraction of rows pre-seeded as already sent")
+    parser.add_argument('--driver', choices=('fake', 'standin'), default='fake')
+    parser.add_argument('--invalid-ratio', type=float, default=0.05)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="seconds the fake driver sleeps per navigation")
+    parser.add_argument('--validate-first', action='store_true',
+                        help="use the separate pre-flight validation load per contact")
+    parser.add_argument('--send-mode', choices=('reload', 'inpage'), default='reload',
+                        help="how the stand-in driver opens chats (page reload vs in-app search)")
+    parser.add_argument('--sessions', type=int, default=1,
+                        help="parallel browser sessions (each with its own worker thread)")
+    parser.add_argument('--indexed', action='store_true',
+                        help="send from the cached contact index /upload builds, not the workbook")
+    parser.add_argument('--output', help="write JSON here instead of stdout")
+    parser.add_argument('--single', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single is not None:
+        result = run_single(args.single, args.send_limit, args.history_ratio,
+                            args.driver, args.invalid_ratio, args.latency, args.validate_first,
+                            args.send_mode, args.sessions, args.indexed)
+        print(json.dumps(result))
+        return
+
+    report = {
+        'benchmark': 'campaign_pipeline',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': [run_isolated(rows, args) for rows in (args.rows or DEFAULT_SIZES)],
+    }
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+"""
+Durable campaign queue: campaigns and their per-contact work items in SQLite.
+
+A campaign's progress used to live only in CampaignState, so a crash or a
+restart of the app lost it; the only protection against double sends was
+the sent_numbers exclusion, and resuming meant re-reading and re-filtering
+the whole contact file.
+
+Now each contact that passes the exclusion filter becomes a campaign_items
+row (committed before it is queued) and moves through
+
+    pending -> in_flight -> done (outcome sent / no_whatsapp)
+                         -> failed (outcome error)
+
+The campaign row keeps its settings and how far the file has been read
+(`read_row`; `materialized` once the whole file, or the target, is in).
+Resuming a campaign sends its pending items straight from the table and
+only reads the part of the file that was never reached. Campaigns wait
+in the same table (status `queued`) for the scheduler (scheduler.py).
+
+Item updates go through the write-behind queue, so the last batch may be
+lost on a hard exit: items left in_flight (or pending) whose number is in
+sent_numbers are taken as sent when resuming, the rest are sent again.
+Items keep the column values their message template uses (`fields`, as
+JSON), so a resumed campaign renders the same messages without the file.
+"""
+import json
+import time
+
+from send_drivers import OUTCOME_SENT, OUTCOME_NO_WHATSAPP
+
+
+# Waiting for the scheduler (see scheduler.py)
+CAMPAIGN_QUEUED = 'queued'
+CAMPAIGN_RUNNING = 'running'
+CAMPAIGN_STOPPED = 'stopped'
+CAMPAIGN_DONE = 'done'
+CAMPAIGN_ERROR = 'error'
+# Removed from the queue before it started
+CAMPAIGN_CANCELLED = 'cancelled'
+# Was running when the app exited; queued again on the next start
+CAMPAIGN_INTERRUPTED = 'interrupted'
+RESUMABLE_STATUSES = (CAMPAIGN_STOPPED, CAMPAIGN_INTERRUPTED, CAMPAIGN_ERROR)
+
+ITEM_PENDING = 'pending'
+ITEM_IN_FLIGHT = 'in_flight'
+ITEM_DONE = 'done'
+ITEM_FAILED = 'failed'
+
+# Done items carry the send driver's outcome; failed ones this
+OUTCOME_ERROR = 'error'
+
+CAMPAIGN_COLUMNS = (
+    'id', 'file_path', 'message', 'target_limit', 'message_delay', 'validate_first', 'send_mode',
+    'max_sessions', 'status', 'total', 'read_row', 'materialized', 'priority', 'start_at', 'position',
+    'rate_per_hour', 'burst', 'jitter', 'created_at', 'updated_at',
+)
+# Settings of a queued campaign that can still be changed
+QUEUED_SETTINGS = ('priority', 'start_at', 'message_delay', 'rate_per_hour', 'burst', 'jitter')
+# Scheduler order among due campaigns
+QUEUE_ORDER = 'priority DESC, position, rowid'
+
+
+class CampaignStore:
+    """Campaigns and their work items in SQLite."""
+
+    def __init__(self, db):
+        self.db = db
+
+    # -- campaigns ---------------------------------------------------------
+    def create(self, campaign_id, file_path, message, target_limit=0, message_delay=5,
+               validate_first=False, send_mode='reload', max_sessions=0,
+               status=CAMPAIGN_RUNNING, priority=0, start_at=None, rate_per_hour=0, burst=1, jitter=None):
+        """Record a new campaign at the end of the queue (a re-used id starts over)."""
+        conn = self.db.connection()
+        with conn:
+            conn.execute('DELETE FROM campaign_items WHERE campaign_id = ?', (campaign_id,))
+            conn.execute('''
+                INSERT OR REPLACE INTO campaigns (id, file_path, message, target_limit, message_delay,
+                    validate_first, send_mode, max_sessions, status, priority, start_at, rate_per_hour,
+                    burst, jitter, position)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
+                    (SELECT COALESCE(MAX(position), 0) + 1 FROM campaigns))
+            ''', (campaign_id, file_path, message, target_limit or 0, message_delay,
+                  1 if validate_first else 0, send_mode, max_sessions or 0, status, priority or 0, start_at,
+                  rate_per_hour or 0, burst or 1, jitter))
+
+    def get(self, campaign_id):
+        rows = self._campaigns('WHERE id = ?', (campaign_id,))
+        return rows[0] if rows else None
+
+    def recent(self, limit=50):
+        return self._campaigns('ORDER BY created_at DESC, rowid DESC LIMIT ?', (limit,))
+
+    def queued(self):
+        """Queued campaigns in the order they would run (ignoring start_at)."""
+        return self._campaigns(f'WHERE status = ? ORDER BY {QUEUE_ORDER}', (CAMPAIGN_QUEUED,))
+
+    def next_queued(self, now):
+        """The queued campaign to run next, if any is due."""
+        rows = self._campaigns(
+            f'WHERE status = ? AND (start_at IS NULL OR start_at <= ?) ORDER BY {QUEUE_ORDER} LIMIT 1',
+            (CAMPAIGN_QUEUED, now),
+        )
+        return rows[0] if rows else None
+
+    def next_start_at(self, now):
+        """When the next queued campaign that isn't due yet becomes due."""
+        return self.db.query(
+            'SELECT MIN(start_at) FROM campaigns WHERE status = ? AND start_at > ?', (CAMPAIGN_QUEUED, now)
+        )[0][0]
+
+    def _campaigns(self, clause, params):
+        found = self.db.query(f"SELECT {', '.join(CAMPAIGN_COLUMNS)} FROM campaigns {clause}", params)
+        return [dict(zip(CAMPAIGN_COLUMNS, row)) for row in found]
+
+    def set_status(self, campaign_id, status, only_from=None):
+        """Set a campaign's status; with `only_from`, only if that is its
+        current status. True if it changed."""
+        if only_from is None:
+            return self.db.execute(
+                'UPDATE campaigns SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                (status, campaign_id),
+            ) > 0
+        return self.db.execute(
+            'UPDATE campaigns SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ? AND status = ?',
+            (status, campaign_id, only_from),
+        ) > 0
+
+    def enqueue(self, campaign_id):
+        """Put a stopped or interrupted campaign back on the queue (it keeps
+        its place); False unless it was resumable."""
+        placeholders = ', '.join('?' for _ in RESUMABLE_STATUSES)
+        return self.db.execute(
+            f"UPDATE campaigns SET status = ?, updated_at = CURRENT_TIMESTAMP "
+            f"WHERE id = ? AND status IN ({placeholders})",
+            (CAMPAIGN_QUEUED, campaign_id) + RESUMABLE_STATUSES,
+        ) > 0
+
+    def cancel(self, campaign_id):
+        """Take a queued campaign off the queue; False if it wasn't queued."""
+        return self.db.execute(
+            'UPDATE campaigns SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ? AND status = ?',
+            (CAMPAIGN_CANCELLED, campaign_id, CAMPAIGN_QUEUED),
+        ) > 0
+
+    def update_queued(self, campaign_id, **settings):
+        """Change QUEUED_SETTINGS of a queued campaign; False if it wasn't queued."""
+        settings = {key: value for key, value in settings.items() if key in QUEUED_SETTINGS}
+        if not settings:
+            return False
+        assignments = ', '.join(f"{key} = ?" for key in settings)
+        return self.db.execute(
+            f"UPDATE campaigns SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ? AND status = ?",
+            tuple(settings.values()) + (campaign_id, CAMPAIGN_QUEUED),
+        ) > 0
+
+    def reorder(self, campaign_ids):
+        """Give the listed queued campaigns the queue positions they hold
+        between them, in the listed order. Priority still comes first."""
+        conn = self.db.connection()
+        with conn:
+            placeholders = ', '.join('?' for _ in campaign_ids)
+            found = dict(conn.execute(
+                f"SELECT id, position FROM campaigns WHERE status = ? AND id IN ({placeholders})",
+                (CAMPAIGN_QUEUED,) + tuple(campaign_ids),
+            ).fetchall())
+            ordered = [campaign_id for campaign_id in dict.fromkeys(campaign_ids) if campaign_id in found]
+            conn.executemany(
+                'UPDATE campaigns SET position = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                zip(sorted(found[campaign_id] for campaign_id in ordered), ordered),
+            )
+        return ordered
+
+    def mark_interrupted(self):
+        """Campaigns left running by a previous run of the app; call at startup."""
+        return self.db.execute(
+            'UPDATE campaigns SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE status = ?',
+            (CAMPAIGN_INTERRUPTED, CAMPAIGN_RUNNING),
+        )
+
+    def requeue_interrupted(self):
+        """Queue every interrupted campaign again; returns how many."""
+        return self.db.execute(
+            'UPDATE campaigns SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE status = ?',
+            (CAMPAIGN_QUEUED, CAMPAIGN_INTERRUPTED),
+        )
+
+    def unfinished_files(self):
+        """Contact files a campaign may still need to read."""
+        statuses = RESUMABLE_STATUSES + (CAMPAIGN_QUEUED, CAMPAIGN_RUNNING)
+        placeholders = ', '.join('?' for _ in statuses)
+        return set(row[0] for row in self.db.query(
+            f"SELECT DISTINCT file_path FROM campaigns WHERE materialized = 0 AND status IN ({placeholders})",
+            statuses,
+        ))
+
+    # -- items -------------------------------------------------------------
+    def add_items(self, campaign_id, contacts, read_row):
+        """Store a chunk's contacts as pending and note the file was read up
+        to `read_row`, in one transaction, before they are queued."""
+        conn = self.db.connection()
+        now = time.time()
+        with conn:
+            conn.executemany('''
+                INSERT OR IGNORE INTO campaign_items (campaign_id, row, phone, sr_no, name, fields, status, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(campaign_id, contact.row, contact.phone, contact.sr_no, contact.name,
+                   json.dumps(contact.fields) if contact.fields else None, ITEM_PENDING, now)
+                  for contact in contacts])
+            conn.execute('''
+                UPDATE campaigns SET total = total + ?, read_row = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (len(contacts), read_row, campaign_id))
+
+    def mark_materialized(self, campaign_id):
+        """Every contact the campaign will send is in campaign_items."""
+        self.db.execute(
+            'UPDATE campaigns SET materialized = 1, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+            (campaign_id,),
+        )
+
+    def start_item(self, campaign_id, row):
+        self._set_item(campaign_id, row, ITEM_IN_FLIGHT, None)
+
+    def finish_item(self, campaign_id, row, outcome):
+        status = ITEM_FAILED if outcome == OUTCOME_ERROR else ITEM_DONE
+        self._set_item(campaign_id, row, status, outcome)
+
+    def _set_item(self, campaign_id, row, status, outcome):
+        # Committed with the next write batch
+        self.db.write(
+            'UPDATE campaign_items SET status = ?, outcome = ?, updated_at = ? WHERE campaign_id = ? AND row = ?',
+            (status, outcome, time.time(), campaign_id, row),
+        )
+
+    def reconcile(self, campaign_id):
+        """Settle items whose last update may not have reached the disk:
+        pending or in-flight ones already in sent_numbers are done, the
+        remaining in-flight ones go back to pending."""
+        self.db.flush()
+        conn = self.db.connection()
+        with conn:
+            sent = conn.execute('''
+                UPDATE campaign_items SET status = ?, outcome = ?, updated_at = ?
+                WHERE campaign_id = ? AND status IN (?, ?)
+                  AND phone IN (SELECT phone_key FROM sent_numbers WHERE phone_key != '')
+            ''', (ITEM_DONE, OUTCOME_SENT, time.time(), campaign_id, ITEM_PENDING, ITEM_IN_FLIGHT)).rowcount
+            requeued = conn.execute('''
+                UPDATE campaign_items SET status = ?, updated_at = ?
+                WHERE campaign_id = ? AND status = ?
+            ''', (ITEM_PENDING, time.time(), campaign_id, ITEM_IN_FLIGHT)).rowcount
+        return sent, requeued
+
+    def iter_pending(self, campaign_id, batch_size=1000):
+        """Pending items as (row, phone, sr_no, name, fields) lists in file
+        order, read by keyset a batch at a time."""
+        last_row = 0
+        while True:
+            batch = self.db.query('''
+                SELECT row, phone, sr_no, name, fields FROM campaign_items
+                WHERE campaign_id = ? AND status = ? AND row > ?
+                ORDER BY row LIMIT ?
+            ''', (campaign_id, ITEM_PENDING, last_row, batch_size))
+            if batch:
+                yield [item[:4] + (tuple(json.loads(item[4])) if item[4] else None,) for item in batch]
+            if len(batch) < batch_size:
+                return
+            last_row = batch[-1][0]
+
+    def counts(self, campaign_id):
+        """Items per status plus done items per outcome."""
+        counts = {ITEM_PENDING: 0, ITEM_IN_FLIGHT: 0, ITEM_FAILED: 0, OUTCOME_SENT: 0, OUTCOME_NO_WHATSAPP: 0}
+        for status, outcome, rows in self.db.query('''
+            SELECT status, outcome, COUNT(*) FROM campaign_items WHERE campaign_id = ? GROUP BY status, outcome
+        ''', (campaign_id,)):
+            key = outcome if status == ITEM_DONE else status
+            counts[key] = counts.get(key, 0) + rows
+        return counts
@@ -0,0 +1,231 @@
+"""
+Campaign state shared between the sender threads and the Flask handlers.
+
+Replaces the old module-level `sending_status` dict, which worker threads
+mutated (`sent_count += 1`, `errors.append`) while waitress request threads
+reset and serialized it with no synchronization.
+
+Every read and write goes through one lock. Pause/resume/stop use a
+Condition on that lock, so paused workers block until woken instead of
+polling every second. snapshot() copies the fields under the lock and caches
+the copy until the next change, so the UI's /status polling is cheap and
+never sees a half-updated dict.
+"""
+import threading
+from collections import deque
+
+
+# Keep the status payload bounded on very large campaigns; the UI only
+# shows the most recent errors anyway.
+MAX_ERRORS = 500
+
+_COUNTERS = ('sent_count', 'failed_count', 'no_whatsapp_count', 'processed_contacts')
+
+
+class CampaignState:
+    """Lock-protected counters and flags for the campaign being sent."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._version = 0
+        self._snapshot = None
+        self._snapshot_version = -1
+        self._fields = {
+            'is_sending': False,
+            'is_paused': False,
+            # Stopped, but the send thread hasn't wound down yet
+            'is_stopping': False,
+            'current_contact': '',
+            'total_contacts': 0,
+            'sent_count': 0,
+            'failed_count': 0,
+            'no_whatsapp_count': 0,
+            'current_campaign_id': None,
+            'current_excel_file': None,
+            'current_message': None,
+            'current_target_limit': 0,
+            'processed_contacts': 0,
+            'last_wait_seconds': 0.0,
+            'avg_wait_seconds': 0.0,
+            'active_sessions': 0,
+        }
+        self._errors = deque(maxlen=MAX_ERRORS)
+        self._no_whatsapp_numbers = []
+        self._wait_total = 0.0
+        self._wait_contacts = 0
+
+    def _touch(self):
+        # Caller holds the lock
+        self._version += 1
+        self._changed.notify_all()
+
+    # -- reads -------------------------------------------------------------
+    def get(self, key):
+        with self._lock:
+            return self._fields[key]
+
+    @property
+    def is_sending(self):
+        return self._fields['is_sending']
+
+    @property
+    def is_paused(self):
+        return self._fields['is_paused']
+
+    @property
+    def is_busy(self):
+        """A send thread holds the sender (sending, or stopping)."""
+        with self._lock:
+            return self._fields['is_sending'] or self._fields['is_stopping']
+
+    def counters(self):
+        """The scalar fields only - what a progress event carries."""
+        with self._lock:
+            return dict(self._fields)
+
+    def no_whatsapp_numbers(self):
+        with self._lock:
+            return list(self._no_whatsapp_numbers)
+
+    def snapshot(self):
+        """A consistent copy of the whole state (shared until the next change)."""
+        with self._lock:
+            if self._snapshot_version != self._version:
+                snapshot = dict(self._fields)
+                snapshot['errors'] = list(self._errors)
+                snapshot['no_whatsapp_numbers'] = list(self._no_whatsapp_numbers)
+                self._snapshot = snapshot
+                self._snapshot_version = self._version
+            return self._snapshot
+
+    # -- lifecycle ---------------------------------------------------------
+    def begin(self, **details):
+        """Atomically claim the sender and reset the counters.
+
+        Returns False if a campaign is already being sent, or a stopped
+        one's thread is still winding down (its workers would otherwise
+        see is_sending again and carry on alongside the new campaign).
+        """
+        with self._lock:
+            if self._fields['is_sending'] or self._fields['is_stopping']:
+                return False
+            self._reset_counters(total_contacts=0)
+            self._fields.update(details)
+            self._fields['is_sending'] = True
+            self._fields['is_paused'] = False
+            self._touch()
+            return True
+
+    def reset_counters(self, total_contacts):
+        """Zero the per-campaign counters once the contact list is known."""
+        with self._lock:
+            self._reset_counters(total_contacts)
+            self._touch()
+
+    def _reset_counters(self, total_contacts):
+        for key in _COUNTERS:
+            self._fields[key] = 0
+        self._fields['total_contacts'] = total_contacts
+        self._fields['current_contact'] = ''
+        self._fields['last_wait_seconds'] = 0.0
+        self._fields['avg_wait_seconds'] = 0.0
+        self._errors.clear()
+        self._no_whatsapp_numbers = []
+        self._wait_total = 0.0
+        self._wait_contacts = 0
+
+    def finish(self):
+        """Release the sender; only the send thread calls this, on its way out."""
+        with self._lock:
+            self._fields['is_sending'] = False
+            self._fields['is_paused'] = False
+            self._fields['is_stopping'] = False
+            self._touch()
+
+    def stop(self):
+        """Ask the workers to stop; wakes any that are paused or sleeping.
+        The sender stays claimed (is_stopping) until the thread finish()es."""
+        with self._lock:
+            if not self._fields['is_sending']:
+                return
+            self._fields['is_sending'] = False
+            self._fields['is_paused'] = False
+            self._fields['is_stopping'] = True
+            self._touch()
+
+    def pause(self):
+        """Pause a running campaign. False if nothing is running unpaused."""
+        with self._lock:
+            if not self._fields['is_sending'] or self._fields['is_paused']:
+                return False
+            self._fields['is_paused'] = True
+            self._touch()
+            return True
+
+    def resume(self):
+        """Resume a paused campaign. False if nothing is paused."""
+        with self._lock:
+            if not self._fields['is_sending'] or not self._fields['is_paused']:
+                return False
+            self._fields['is_paused'] = False
+            self._touch()
+            return True
+
+    def wait_if_paused(self):
+        """Block while paused; returns False once the campaign is stopped."""
+        with self._lock:
+            while self._fields['is_paused'] and self._fields['is_sending']:
+                self._changed.wait()
+            return self._fields['is_sending']
+
+    def sleep(self, seconds):
+        """Sleep between messages, cut short if the campaign is stopped."""
+        if seconds <= 0:
+            return self.is_sending
+        with self._lock:
+            if self._fields['is_sending']:
+                self._changed.wait_for(lambda: not self._fields['is_sending'], timeout=seconds)
+            return self._fields['is_sending']
+
+    # -- writes ------------------------------------------------------------
+    def set(self, **fields):
+        with self._lock:
+            self._fields.update(fields)
+            self._touch()
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            self._fields[key] += amount
+            self._touch()
+            return self._fields[key]
+
+    def add_error(self, message):
+        with self._lock:
+            self._errors.append(message)
+            self._touch()
+
+    def add_no_whatsapp(self, label, error):
+        """Count a number without WhatsApp and list it (and its status line)."""
+        with self._lock:
+            self._fields['no_whatsapp_count'] += 1
+            self._no_whatsapp_numbers.append(label)
+            self._errors.append(error)
+            self._touch()
+
+    def start_contact(self, label):
+        """Mark `label` as the contact being processed; returns its ordinal."""
+        with self._lock:
+            self._fields['current_contact'] = label
+            self._fields['processed_contacts'] += 1
+            self._touch()
+            return self._fields['processed_contacts']
+
+    def record_wait(self, seconds):
+        """Fold one contact's page-wait time into last/avg_wait_seconds."""
+        with self._lock:
+            self._wait_contacts += 1
+            self._wait_total += seconds
+            self._fields['last_wait_seconds'] = round(seconds, 2)
+            self._fields['avg_wait_seconds'] = round(self._wait_total / self._wait_contacts, 2)
+            self._touch()
@@ -0,0 +1,499 @@
+"""
+Streaming contact ingestion.
+
+Campaigns used to start with `pd.read_excel` of the whole workbook, so a
+500k-row file meant a long stall and hundreds of MB of DataFrame before the
+first message went out. ContactReader reads the file lazily instead:
+
+  * .xlsx - the first sheet's XML is parsed incrementally straight out of
+            the zip (see XlsxRowStream). openpyxl's read-only mode still
+            parses the whole shared-strings table before yielding a row,
+            which alone is ~9s for a 500k-row workbook.
+  * .csv  - pandas read_csv in chunks
+  * .parquet - pyarrow record batches
+  * .xls  - the legacy format has no streaming reader; it is loaded with
+            pd.read_excel and then handed out in chunks like the others
+  * contacts_<hash>_v<N>.parquet - a contact index written by
+            build_contact_index() at upload time: the already-normalized
+            columns, loaded in one go
+
+Column roles (phone, serial number, name) are resolved once from the header
+row. Each chunk is then normalized in one vectorized pass (normalize_frame):
+phone numbers reduced to their canonical key (see phones.py), names and
+serials cleaned with pandas string ops, invalid rows dropped. Chunks come
+out as lists of Contact tuples:
+
+    Contact(row=1-based data row, phone=str, sr_no=str or None, name=str,
+            fields=tuple of str or None)
+
+so the caller can filter and queue them as they arrive without touching a
+DataFrame per contact. iter_chunks() does both steps; a pipeline can run
+them in separate threads with iter_batches() (raw rows) and normalize().
+`fields` holds the cleaned text of the other columns asked for
+(ContactReader(fields=...), e.g. the columns a message template uses), in
+that order; `columns` lists what the file has.
+
+`row` counts from the header row, so row 1 is the line under the header
+and blank lines in between still count (an .xlsx row's number comes from
+the sheet itself, not from how many rows were read before it).
+"""
+import hashlib
+import itertools
+import os
+import posixpath
+import re
+import zipfile
+from collections import namedtuple
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from message_templates import field_key
+from phones import column_text, phone_keys
+
+
+PHONE_COLUMN = 'phone'
+NAME_COLUMN = 'name'
+SERIAL_COLUMNS = ('sr.no', 'sr_no', 'sr no', 'se.no', 'se_no', 'se no', 'serial', 's.no', 's_no', 's no')
+
+DEFAULT_CHUNK_SIZE = 1000
+# Rows normalized per vectorized pass after the first chunk; pandas string
+# ops cost ~2x more per row at 1000-row batches than at 10000
+NORMALIZE_BATCH_ROWS = 10000
+
+CONTACT_FILE_EXTENSIONS = {'xlsx', 'xls', 'csv', 'parquet'}
+
+# Bump when normalization changes so indexes built by older code are rebuilt
+INDEX_VERSION = 5
+INDEX_COLUMNS = ('row', 'phone', 'sr_no', 'name')
+# What build_contact_index() names its files; nothing else is read as an index
+INDEX_NAME = re.compile(r'contacts_[0-9a-f]{24}(?:_cc\d+)?_v\d+\.parquet')
+
+
+def is_contact_index(filename):
+    """True for a bare file name build_contact_index() could have written."""
+    return bool(INDEX_NAME.fullmatch(filename or ''))
+
+
+class ContactFileError(Exception):
+    """The contact file can't be read or has no phone column."""
+
+
+def resolve_columns(header):
+    """Indexes of the phone / serial / name columns in a header row (case-insensitive)."""
+    roles = {'phone': None, 'sr_no': None, 'name': None}
+    for index, cell in enumerate(header):
+        label = str(cell).strip().lower() if cell is not None else ''
+        if label == PHONE_COLUMN and roles['phone'] is None:
+            roles['phone'] = index
+        elif label in SERIAL_COLUMNS and roles['sr_no'] is None:
+            roles['sr_no'] = index
+        elif label == NAME_COLUMN and roles['name'] is None:
+            roles['name'] = index
+    if roles['phone'] is None:
+        raise ContactFileError("Excel file must have a 'phone' column")
+    return roles
+
+
+def extra_columns(header, roles):
+    """{field key: index} of the header's columns other than the roles
+    (first one wins when two headers come out the same)."""
+    taken = set(roles.values())
+    columns = {}
+    for index, cell in enumerate(header):
+        key = field_key(cell) if cell is not None else ''
+        if index in taken or not key or key in INDEX_COLUMNS or key in columns:
+            continue
+        columns[key] = index
+    return columns
+
+
+# phone is the canonical key (phones.phone_key), so it can be matched
+# against the history tables directly
+Contact = namedtuple('Contact', INDEX_COLUMNS + ('fields',), defaults=(None,))
+
+
+def normalize_frame(frame, roles, default_country_code='', fields=()):
+    """Contacts for one chunk of raw rows (columns by position), in one pass.
+
+    The frame's index holds each row's 1-based data row number. Rows
+    without a usable phone number are dropped. `fields` are the positions
+    of other columns to carry as Contact.fields (None: blank).
+    """
+    count = len(frame)
+    rows = frame.index.to_numpy(dtype='int64')
+
+    def role_column(role):
+        return column(roles[role])
+
+    def column(index):
+        # Missing column (or a ragged chunk too short to have it) reads as blanks
+        if index is None or index >= frame.shape[1]:
+            return np.full(count, None, dtype=object)
+        return frame.iloc[:, index].to_numpy(dtype=object)
+
+    phones = phone_keys(role_column('phone'), default_country_code).to_numpy(dtype=object)
+    keep = phones != ''
+    skipped = count - int(keep.sum())
+    if skipped:
+        print(f"Skipping {skipped} rows without a valid phone number (rows {rows[0]}-{rows[-1]})")
+
+    names = column_text(role_column('name')).to_numpy(dtype=object)
+    serials = column_text(role_column('sr_no')).to_numpy(dtype=object)
+    serials[serials == ''] = None
+
+    extras = [column_text(column(index)).to_numpy(dtype=object)[keep] for index in fields]
+    return contacts_from_columns(rows[keep], phones[keep], serials[keep], names[keep], extras)
+
+
+def contacts_from_columns(rows, phones, serials, names, extras=()):
+    """Contact tuples from parallel columns - no per-contact DataFrame work.
+
+    `extras` are further columns, zipped into each contact's fields.
+    """
+    fields = zip(*(extra.tolist() for extra in extras)) if len(extras) else itertools.repeat(None)
+    return list(map(Contact._make, zip(rows.tolist(), phones.tolist(), serials.tolist(), names.tolist(), fields)))
+
+
+_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_CELL_REF = re.compile(r'([A-Z]+)')
+
+
+def _column_index(ref):
+    """0-based column of a cell reference like 'AB12'."""
+    index = 0
+    for char in _CELL_REF.match(ref).group(1):
+        index = index * 26 + (ord(char) - 64)
+    return index - 1
+
+
+def _number(text):
+    if not text:
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+class LazySharedStrings:
+    """The workbook's shared-string table, parsed only as far as needed.
+
+    Writers emit strings in order of first use, so reading row N rarely
+    needs more than the first ~N entries.
+    """
+
+    def __init__(self, archive, path):
+        self._strings = []
+        self._events = ET.iterparse(archive.open(path), events=('end',)) if path else iter(())
+
+    def __getitem__(self, index):
+        while len(self._strings) <= index:
+            for _, element in self._events:
+                if element.tag == _NS + 'si':
+                    # Plain <t> or rich-text runs <r><t>; skip phonetic <rPh>
+                    parts = [t.text or '' for t in element.iter(_NS + 't')]
+                    phonetic = [t.text or '' for rph in element.iter(_NS + 'rPh') for t in rph.iter(_NS + 't')]
+                    self._strings.append(''.join(parts[:len(parts) - len(phonetic)]))
+                    element.clear()
+                    break
+            else:
+                raise IndexError(f"shared string {index} out of range")
+        return self._strings[index]
+
+
+class XlsxRowStream:
+    """(row number, row tuple) pairs of an .xlsx workbook's first sheet,
+    parsed as they are read.
+
+    Row numbers are the sheet's own (<row r="...">): writers leave blank
+    rows out of the XML, so counting the rows read would shift every row
+    after a gap.
+    """
+
+    def __init__(self, path):
+        self.archive = zipfile.ZipFile(path)
+        sheet_path, strings_path = self._locate_parts()
+        self.shared_strings = LazySharedStrings(self.archive, strings_path)
+        self.sheet_path = sheet_path
+        self.row_count = None  # from <dimension>, once the header has been read
+
+    def _locate_parts(self):
+        names = set(self.archive.namelist())
+        workbook = ET.fromstring(self.archive.read('xl/workbook.xml'))
+        rels = ET.fromstring(self.archive.read('xl/_rels/workbook.xml.rels'))
+        targets = {}
+        strings_path = None
+        for rel in rels.iter(_PKG_REL_NS + 'Relationship'):
+            target = rel.get('Target')
+            # Targets are relative to xl/ unless absolute
+            target = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+            targets[rel.get('Id')] = target
+            if rel.get('Type', '').endswith('/sharedStrings'):
+                strings_path = target
+        first_sheet = next(workbook.iter(_NS + 'sheet'))
+        sheet_path = targets[first_sheet.get(_REL_NS + 'id')]
+        if strings_path not in names:
+            strings_path = None
+        return sheet_path, strings_path
+
+    def _cell_value(self, cell):
+        kind = cell.get('t', 'n')
+        if kind == 'inlineStr':
+            return ''.join(t.text or '' for t in cell.iter(_NS + 't'))
+        value = cell.find(_NS + 'v')
+        text = value.text if value is not None else None
+        if text is None:
+            return None
+        if kind == 's':
+            return self.shared_strings[int(text)]
+        if kind == 'n':
+            return _number(text)
+        if kind == 'b':
+            return text == '1'
+        return text  # 'str' formula results, 'e' errors
+
+    def __iter__(self):
+        number = 0
+        for _, element in ET.iterparse(self.archive.open(self.sheet_path), events=('end',)):
+            if element.tag == _NS + 'dimension':
+                last_cell = element.get('ref', '').rpartition(':')[2]
+                digits = ''.join(ch for ch in last_cell if ch.isdigit())
+                self.row_count = int(digits) if digits else None
+                continue
+            if element.tag != _NS + 'row':
+                continue
+            # r is optional; without it a row follows the previous one
+            number = int(element.get('r') or number + 1)
+            values = []
+            for cell in element.iter(_NS + 'c'):
+                ref = cell.get('r')
+                column = _column_index(ref) if ref else len(values)
+                if column > len(values):
+                    values.extend([None] * (column - len(values)))  # sparse row
+                values.append(self._cell_value(cell))
+            element.clear()
+            yield number, tuple(values)
+
+    def close(self):
+        self.archive.close()
+
+
+class ContactReader:
+    """Reads a contact file lazily; use as a context manager.
+
+    `fields` are field keys of other columns to carry on each contact
+    (see Contact.fields); a key the file doesn't have reads as blank.
+    """
+
+    def __init__(self, path, chunk_size=DEFAULT_CHUNK_SIZE, default_country_code='', fields=()):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.default_country_code = default_country_code
+        self.fields = list(fields)
+        self.extension = os.path.splitext(path)[1].lower().lstrip('.')
+        self.roles = None
+        self.extra_columns = {}  # {field key: position} of the non-role columns
+        self.estimated_rows = None  # data rows, when known before reading them
+        self._workbook = None
+        self._rows = None
+        self._index = None
+        self._index_columns = None
+        try:
+            self._open()
+        except ContactFileError:
+            self.close()
+            raise
+        except Exception as e:
+            self.close()
+            raise ContactFileError(f"Error loading contact file: {str(e)}")
+
+    def _open(self):
+        if self.extension == 'xlsx':
+            self._workbook = XlsxRowStream(self.path)
+            rows = iter(self._workbook)
+            header_row, header = next(rows, (0, None))
+            if header is None:
+                raise ContactFileError("Excel file must have a 'phone' column")
+            self.roles = resolve_columns(header)
+            self.extra_columns = extra_columns(header, self.roles)
+            if self._workbook.row_count:
+                self.estimated_rows = max(0, self._workbook.row_count - header_row)
+            self._rows = self._chunked(rows, header_row)
+        elif is_contact_index(os.path.basename(self.path)):
+            frame = pd.read_parquet(self.path)
+            self.roles = {column: position for position, column in enumerate(INDEX_COLUMNS)}
+            self.extra_columns = {column: position for position, column in enumerate(frame.columns)
+                                  if column not in INDEX_COLUMNS}
+            self.estimated_rows = len(frame)
+            self._index = frame
+        elif self.extension == 'parquet':
+            parquet = pq.ParquetFile(self.path)
+            self.roles = resolve_columns(parquet.schema_arrow.names)
+            self.extra_columns = extra_columns(parquet.schema_arrow.names, self.roles)
+            self.estimated_rows = parquet.metadata.num_rows
+            batches = parquet.iter_batches(batch_size=self._batch_rows)
+            self._rows = self._from_frames(batch.to_pandas() for batch in batches)
+        elif self.extension == 'csv':
+            # Blank lines are kept (and dropped as phoneless) so rows keep their numbers
+            chunks = pd.read_csv(self.path, dtype=str, keep_default_na=False, skip_blank_lines=False,
+                                 chunksize=self._batch_rows)
+            first = next(chunks, None)
+            if first is None:
+                raise ContactFileError("Excel file must have a 'phone' column")
+            self.roles = resolve_columns(list(first.columns))
+            self.extra_columns = extra_columns(list(first.columns), self.roles)
+            self._rows = self._from_frames(self._chain(first, chunks))
+        else:
+            frame = pd.read_excel(self.path)
+            self.roles = resolve_columns(list(frame.columns))
+            self.extra_columns = extra_columns(list(frame.columns), self.roles)
+            self.estimated_rows = len(frame)
+            self._rows = self._from_frames([frame])
+
+    @property
+    def columns(self):
+        """Field keys of the file's columns besides phone / serial / name."""
+        return list(self.extra_columns)
+
+    @property
+    def _batch_rows(self):
+        return max(self.chunk_size, NORMALIZE_BATCH_ROWS)
+
+    def _chunked(self, rows, header_row):
+        # Ragged (sheet row, tuple) pairs -> one DataFrame per batch (short
+        # rows padded), indexed by data row. The first batch is one chunk
+        # so the first contact isn't delayed.
+        batch, numbers, size = [], [], self.chunk_size
+        for number, values in rows:
+            batch.append(values)
+            numbers.append(number - header_row)
+            if len(batch) >= size:
+                yield pd.DataFrame(batch, index=numbers)
+                batch, numbers, size = [], [], self._batch_rows
+        if batch:
+            yield pd.DataFrame(batch, index=numbers)
+
+    def _from_frames(self, frames):
+        # Slices re-indexed by data row, counting on from the previous frame
+        size, next_row = self.chunk_size, 1
+        for frame in frames:
+            start = 0
+            while start < len(frame):
+                chunk = frame.iloc[start:start + size]
+                chunk.index = pd.RangeIndex(next_row, next_row + len(chunk))
+                yield chunk
+                next_row += len(chunk)
+                start += size
+                size = self._batch_rows
+
+    @staticmethod
+    def _chain(first, rest):
+        yield first
+        yield from rest
+
+    def iter_batches(self):
+        """Raw batches of rows in file order, for normalize(), as
+        (first row, rows, data).
+
+        Reading and parsing the file happens here and normalizing in
+        normalize(), so the two can run in different threads.
+        """
+        if self._index is not None:
+            # Already normalized at upload time: batches are row ranges
+            start, size = 0, self.chunk_size
+            while start < len(self._index):
+                yield start, min(size, len(self._index) - start), None
+                start += size
+                size = self._batch_rows
+            return
+        for frame in self._rows:
+            yield int(frame.index[0]), len(frame), frame
+
+    def normalize(self, batch):
+        """Contacts for a batch from iter_batches()."""
+        first, rows, frame = batch
+        if self._index is not None:
+            if self._index_columns is None:
+                self._index_columns = (
+                    [self._index[column].to_numpy(dtype=object) for column in INDEX_COLUMNS],
+                    [self._index[field].to_numpy(dtype=object) if field in self.extra_columns
+                     else np.full(len(self._index), '', dtype=object) for field in self.fields],
+                )
+            columns, extras = self._index_columns
+            end = first + rows
+            return contacts_from_columns(*(column[first:end] for column in columns),
+                                         [extra[first:end] for extra in extras])
+        positions = [self.extra_columns.get(field) for field in self.fields]
+        return normalize_frame(frame, self.roles, self.default_country_code, positions)
+
+    def iter_chunks(self):
+        """Lists of normalized contacts, in file order, `chunk_size` rows at a time."""
+        for batch in self.iter_batches():
+            contacts = self.normalize(batch)
+            for start in range(0, len(contacts), self.chunk_size):
+                yield contacts[start:start + self.chunk_size]
+
+    def __iter__(self):
+        for chunk in self.iter_chunks():
+            yield from chunk
+
+    def close(self):
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def file_digest(path):
+    """sha256 of a file's contents, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_contact_index(path, folder, default_country_code=''):
+    """Parse a contact file once into a cached index in `folder`.
+
+    The index is keyed by the file's content hash (and the country code it
+    was normalized with), so re-uploading an identical file is a cache hit.
+    Returns (index_filename, rows, cache_hit).
+    It is a Parquet file of INDEX_COLUMNS, then the file's other columns
+    as text under their field keys (for message placeholders).
+    """
+    key = file_digest(path)[:24]
+    if default_country_code:
+        key = f"{key}_cc{re.sub(r'[^0-9]', '', str(default_country_code))}"
+    index_name = f"contacts_{key}_v{INDEX_VERSION}.parquet"
+    index_path = os.path.join(folder, index_name)
+    if os.path.exists(index_path):
+        os.utime(index_path)  # keep it from being cleaned up as an old upload
+        return index_name, pq.read_metadata(index_path).num_rows, True
+
+    contacts = []
+    with ContactReader(path, default_country_code=default_country_code) as reader:
+        reader.fields = reader.columns
+        for chunk in reader.iter_chunks():
+            contacts.extend(chunk)
+    frame = pd.DataFrame.from_records(contacts, columns=list(Contact._fields))
+    frame['row'] = frame['row'].astype('int64')
+    fields = frame.pop('fields')
+    if reader.fields:
+        extras = pd.DataFrame(fields.tolist(), columns=reader.fields, index=frame.index, dtype=object)
+        frame = pd.concat([frame, extras], axis=1)
+
+    tmp_path = index_path + '.tmp'
+    frame.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, index_path)
+    return index_name, len(frame), False
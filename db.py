@@ -0,0 +1,567 @@
+"""
+SQLite access for the sent/invalid number tracker.
+
+Every contact used to open a fresh connection, run one INSERT OR IGNORE,
+commit (an fsync) and close, and the UI pollers opened another connection
+every few seconds. Here:
+
+  * each thread keeps one long-lived connection (thread-local), opened with
+    journal_mode=WAL and synchronous=NORMAL, so readers never block the
+    writer and commits don't fsync the main database file;
+  * outcome rows go through a write-behind queue: a single writer thread
+    group-commits whatever has queued up every `batch_size` rows or
+    `flush_interval` seconds, whichever comes first.
+
+Call flush() when a reader must see everything written so far (before the
+exclusion filter, before deleting history, at the end of a campaign).
+
+A batch that fails to commit is retried; rows that still can't be written
+are held and retried (with a growing delay) along with the next batch, and
+the failure is reported through `on_write_error` and `write_error` until
+a commit goes through. Only a row that fails on its own for a reason other
+than the database being locked or unwritable (OperationalError) is held
+apart from the rest, so one bad row can't keep the others out.
+
+Both tables carry `phone_key`, the canonical form of `phone` (phones.py),
+which is what the exclusion filter matches on. init_schema() adds the
+column to databases created before it existed and backfills it.
+
+ExclusionFilter does the "already sent / recently found invalid / repeated
+in this file" check inside SQLite, a chunk of contacts at a time, so a
+campaign never loads the whole history into memory.
+
+Campaigns and their work items (campaign_queue.py) and validation jobs
+(validation_jobs.py) live in the same database.
+"""
+import atexit
+import itertools
+import queue
+import sqlite3
+import threading
+import time
+
+from phones import phone_keys
+
+
+SCHEMA = (
+    '''
+        CREATE TABLE IF NOT EXISTS sent_numbers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            phone TEXT UNIQUE,
+            name TEXT,
+            sent_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            campaign_id TEXT,
+            phone_key TEXT
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS invalid_numbers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            phone TEXT UNIQUE,
+            name TEXT,
+            invalid_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            campaign_id TEXT,
+            reason TEXT,
+            phone_key TEXT
+        )
+    ''',
+    # Latest WhatsApp account check per number (see validity.py)
+    '''
+        CREATE TABLE IF NOT EXISTS validity_cache (
+            phone_key TEXT PRIMARY KEY,
+            has_whatsapp INTEGER NOT NULL,
+            checked_at REAL NOT NULL,
+            source TEXT
+        )
+    ''',
+    # Validation-only jobs and their per-row results (see validation_jobs.py)
+    '''
+        CREATE TABLE IF NOT EXISTS validation_jobs (
+            id TEXT PRIMARY KEY,
+            filename TEXT NOT NULL,
+            status TEXT NOT NULL,
+            total INTEGER DEFAULT 0,
+            processed INTEGER DEFAULT 0,
+            valid_count INTEGER DEFAULT 0,
+            invalid_count INTEGER DEFAULT 0,
+            unknown_count INTEGER DEFAULT 0,
+            message TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS validation_results (
+            job_id TEXT NOT NULL,
+            row INTEGER NOT NULL,
+            phone TEXT,
+            sr_no TEXT,
+            name TEXT,
+            status TEXT NOT NULL,
+            checked_at REAL,
+            PRIMARY KEY (job_id, row)
+        )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_validation_results_status ON validation_results (job_id, status, row)',
+    # Campaigns and their per-contact work items (see campaign_queue.py)
+    '''
+        CREATE TABLE IF NOT EXISTS campaigns (
+            id TEXT PRIMARY KEY,
+            file_path TEXT NOT NULL,
+            message TEXT NOT NULL,
+            target_limit INTEGER DEFAULT 0,
+            message_delay REAL DEFAULT 5,
+            validate_first INTEGER DEFAULT 0,
+            send_mode TEXT,
+            max_sessions INTEGER DEFAULT 0,
+            status TEXT NOT NULL,
+            total INTEGER DEFAULT 0,
+            read_row INTEGER DEFAULT 0,
+            materialized INTEGER DEFAULT 0,
+            priority INTEGER DEFAULT 0,
+            start_at REAL,
+            position INTEGER DEFAULT 0,
+            rate_per_hour REAL DEFAULT 0,
+            burst INTEGER DEFAULT 1,
+            jitter REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS campaign_items (
+            campaign_id TEXT NOT NULL,
+            row INTEGER NOT NULL,
+            phone TEXT,
+            sr_no TEXT,
+            name TEXT,
+            fields TEXT,
+            status TEXT NOT NULL,
+            outcome TEXT,
+            updated_at REAL,
+            PRIMARY KEY (campaign_id, row)
+        )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_campaign_items_status ON campaign_items (campaign_id, status, row)',
+    'CREATE INDEX IF NOT EXISTS idx_campaign_items_phone ON campaign_items (campaign_id, phone)',
+    # History endpoints page newest-first by (date, id) and filter by campaign
+    'CREATE INDEX IF NOT EXISTS idx_sent_numbers_date ON sent_numbers (sent_date, id)',
+    'CREATE INDEX IF NOT EXISTS idx_sent_numbers_campaign ON sent_numbers (campaign_id)',
+    'CREATE INDEX IF NOT EXISTS idx_invalid_numbers_date ON invalid_numbers (invalid_date, id)',
+    'CREATE INDEX IF NOT EXISTS idx_invalid_numbers_campaign ON invalid_numbers (campaign_id)',
+)
+
+# Columns added after the first release: (table, column, type)
+ADDED_COLUMNS = (
+    ('sent_numbers', 'phone_key', 'TEXT'),
+    ('invalid_numbers', 'phone_key', 'TEXT'),
+    ('campaigns', 'priority', 'INTEGER DEFAULT 0'),
+    ('campaigns', 'start_at', 'REAL'),
+    ('campaigns', 'position', 'INTEGER DEFAULT 0'),
+    ('campaigns', 'rate_per_hour', 'REAL DEFAULT 0'),
+    ('campaigns', 'burst', 'INTEGER DEFAULT 1'),
+    ('campaigns', 'jitter', 'REAL'),
+    ('campaign_items', 'fields', 'TEXT'),
+)
+
+# Indexes on added columns, created once the columns exist
+MIGRATED_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS idx_sent_numbers_phone_key ON sent_numbers (phone_key)',
+    'CREATE INDEX IF NOT EXISTS idx_invalid_numbers_phone_key ON invalid_numbers (phone_key)',
+    'CREATE INDEX IF NOT EXISTS idx_campaigns_queue ON campaigns (status, priority, position)',
+)
+
+# Per history table: its date column and the columns the endpoints return
+HISTORY_TABLES = {
+    'sent_numbers': ('sent_date', ('phone', 'name', 'sent_date', 'campaign_id')),
+    'invalid_numbers': ('invalid_date', ('phone', 'name', 'invalid_date', 'campaign_id', 'reason')),
+}
+
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(date, row_id):
+    return f"{date}|{row_id}"
+
+
+def decode_cursor(cursor):
+    """(date, id) from a cursor string; raises ValueError if malformed."""
+    date, _, row_id = cursor.rpartition('|')
+    if not date:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return date, int(row_id)
+
+
+# Commit attempts per batch before its rows are held for later
+WRITE_ATTEMPTS = 3
+# Delay before retrying held rows, doubling while they keep failing
+WRITE_RETRY_DELAY = 0.5
+MAX_WRITE_RETRY_DELAY = 30.0
+
+
+class Database:
+    """Per-thread connections plus a group-committing background writer."""
+
+    def __init__(self, path, batch_size=200, flush_interval=0.25):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self.commits = 0
+        self.rows_written = 0
+        self._held = []  # rows whose commit failed, retried with the next batch
+        self._retry_delay = WRITE_RETRY_DELAY
+        self.write_error = None  # why held rows can't be written, until they are
+        # Called with a message when writes start failing (app.py: campaign_error)
+        self.on_write_error = None
+
+    # -- connections -------------------------------------------------------
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def connection(self):
+        """This thread's connection (closed when the thread exits)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def init_schema(self, default_country_code=''):
+        conn = self.connection()
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for statement in SCHEMA:
+            conn.execute(statement)
+        for table, column, column_type in ADDED_COLUMNS:
+            existing = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+        for statement in MIGRATED_INDEXES:
+            conn.execute(statement)
+        conn.commit()
+        for table in HISTORY_TABLES:
+            self.backfill_phone_keys(table, default_country_code)
+        if 'validity_cache' not in tables:
+            self.seed_validity_cache()
+
+    def seed_validity_cache(self):
+        """Start the validity cache from the invalid_numbers history, dated
+        by when each number was found invalid, so old ones get re-checked."""
+        conn = self.connection()
+        with conn:
+            cursor = conn.execute('''
+                INSERT OR IGNORE INTO validity_cache (phone_key, has_whatsapp, checked_at, source)
+                SELECT phone_key, 0, CAST(strftime('%s', MAX(invalid_date)) AS REAL), 'invalid_numbers'
+                FROM invalid_numbers
+                WHERE phone_key != ''
+                GROUP BY phone_key
+            ''')
+        if cursor.rowcount > 0:
+            print(f"[DB] Seeded the validity cache with {cursor.rowcount} invalid numbers")
+
+    def backfill_phone_keys(self, table, default_country_code=''):
+        """Fill phone_key for rows written before it existed.
+
+        Numbers with no usable key get '' so they aren't revisited.
+        """
+        conn = self.connection()
+        rows = conn.execute(f"SELECT id, phone FROM {table} WHERE phone_key IS NULL").fetchall()
+        if not rows:
+            return 0
+        keys = phone_keys([phone for _, phone in rows], default_country_code)
+        with conn:
+            conn.executemany(
+                f"UPDATE {table} SET phone_key = ? WHERE id = ?",
+                zip(keys.tolist(), (row_id for row_id, _ in rows)),
+            )
+        print(f"[DB] Added phone keys to {len(rows)} existing {table} rows")
+        return len(rows)
+
+    def query(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchall()
+
+    def history_page(self, table, limit=100, cursor=None, after_id=None, search=None, campaign=None):
+        """One page of a history table, newest first, by keyset (never OFFSET).
+
+        cursor    continue below the (date, id) of the last row of the previous page
+        after_id  only rows newer than the given id (what the UI polls for)
+        search    substring of the phone number or campaign id
+        campaign  exact campaign id
+
+        Returns (rows, next_cursor, total) where rows are dicts with 'id' plus
+        the table's columns, next_cursor is None on the last page and total
+        counts every row matching search/campaign. The count scans the whole
+        match, so it is only taken for a first page (no cursor or after_id);
+        later pages and polls get None and keep the total they started with.
+        """
+        date_column, columns = HISTORY_TABLES[table]
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+        filters, params = [], []
+        if search:
+            filters.append("(phone LIKE ? OR campaign_id LIKE ?)")
+            pattern = f"%{search}%"
+            params += [pattern, pattern]
+        if campaign:
+            filters.append("campaign_id = ?")
+            params.append(campaign)
+        where = f" WHERE {' AND '.join(filters)}" if filters else ""
+        total = None
+        if not cursor and after_id is None:
+            total = self.query(f"SELECT COUNT(*) FROM {table}{where}", params)[0][0]
+
+        page_filters, page_params = list(filters), list(params)
+        if cursor:
+            page_filters.append(f"({date_column}, id) < (?, ?)")
+            page_params += list(decode_cursor(cursor))
+        if after_id is not None:
+            page_filters.append("id > ?")
+            page_params.append(int(after_id))
+        page_where = f" WHERE {' AND '.join(page_filters)}" if page_filters else ""
+
+        select = ', '.join(('id',) + columns)
+        found = self.query(
+            f"SELECT {select} FROM {table}{page_where} ORDER BY {date_column} DESC, id DESC LIMIT ?",
+            page_params + [limit + 1],
+        )
+        rows = [dict(zip(('id',) + columns, row)) for row in found[:limit]]
+        next_cursor = None
+        if len(found) > limit:
+            last = rows[-1]
+            next_cursor = encode_cursor(last[date_column], last['id'])
+        return rows, next_cursor, total
+
+    def execute(self, sql, params=()):
+        """Run one statement and commit it now (bypasses the write queue)."""
+        conn = self.connection()
+        cursor = conn.execute(sql, params)
+        conn.commit()
+        return cursor.rowcount
+
+    # -- write-behind ------------------------------------------------------
+    @property
+    def pending_writes(self):
+        """Writes queued (or held after a failure) but not yet committed."""
+        return self._queue.qsize() + len(self._held)
+
+    def write(self, sql, params):
+        """Queue a write; it is committed with the next batch."""
+        self._ensure_writer()
+        self._queue.put((sql, params))
+
+    def flush(self, timeout=None):
+        """Block until every write queued before this call has been tried;
+        False if it timed out or rows are held after a failed commit."""
+        if self._writer is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout) and not self._held
+
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run_writer, daemon=True, name="db-writer")
+                self._writer.start()
+                atexit.register(self.flush, 5)
+
+    def _run_writer(self):
+        conn = self._connect()
+        while True:
+            try:
+                item = self._queue.get(timeout=self._retry_delay if self._held else None)
+            except queue.Empty:
+                item = None  # time to retry the held rows
+            batch, waiters = self._held, []
+            self._held = []
+            deadline = time.monotonic() + self.flush_interval
+            while item is not None:
+                if isinstance(item, threading.Event):
+                    # A flush: commit what we have right away
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                self._commit(conn, batch)
+            for waiter in waiters:
+                waiter.set()
+
+    def _execute(self, conn, batch):
+        # Consecutive rows for the same statement go through one executemany
+        with conn:
+            start = 0
+            while start < len(batch):
+                sql = batch[start][0]
+                end = start
+                while end < len(batch) and batch[end][0] == sql:
+                    end += 1
+                conn.executemany(sql, [params for _, params in batch[start:end]])
+                start = end
+        self.commits += 1
+        self.rows_written += len(batch)
+
+    def _commit(self, conn, batch):
+        """Commit a batch, retrying; what can't be written is held."""
+        error = None
+        for attempt in range(WRITE_ATTEMPTS):
+            try:
+                self._execute(conn, batch)
+                self._written()
+                return
+            except Exception as e:
+                error = e
+                if isinstance(e, sqlite3.OperationalError) and attempt < WRITE_ATTEMPTS - 1:
+                    time.sleep(WRITE_RETRY_DELAY * 2 ** attempt)
+                    continue
+                break
+        held = batch
+        if not isinstance(error, sqlite3.OperationalError) and len(batch) > 1:
+            # Not the database itself: write the rows one at a time so only
+            # the ones that fail are held
+            held = []
+            for row in batch:
+                try:
+                    self._execute(conn, [row])
+                except Exception as e:
+                    error = e
+                    held.append(row)
+        self._held = held + self._held
+        if held:
+            self._failed(f"Could not save {len(self._held)} result row(s) yet, will keep retrying: {error}")
+        else:
+            self._written()
+
+    def _written(self):
+        if self.write_error is not None and not self._held:
+            print("[DB] Held rows written, database writes working again")
+            self.write_error = None
+        self._retry_delay = WRITE_RETRY_DELAY
+
+    def _failed(self, message):
+        print(f"[DB] {message}")
+        first = self.write_error is None
+        self.write_error = message
+        self._retry_delay = min(MAX_WRITE_RETRY_DELAY, self._retry_delay * 2)
+        if first and self.on_write_error is not None:
+            try:
+                self.on_write_error(message)
+            except Exception:
+                pass
+
+
+_filter_ids = itertools.count(1)
+
+# Why a contact was excluded, as returned by the per-chunk query
+_ALREADY_SENT, _INVALID, _DUPLICATE = 1, 2, 3
+
+
+class ExclusionFilter:
+    """Drops contacts already sent, found to have no WhatsApp account since
+    `invalid_since` (a timestamp; see validity.py), or seen earlier in the
+    same contact file. Use as a context manager, from one thread.
+
+    When resuming a campaign, pass its id: numbers it has already queued
+    count as seen, so the rest of the file can't queue them again.
+
+    Each chunk's phone keys go into a temp table that is joined against the
+    indexed phone_key columns, and every key that went by is remembered in
+    a second temp table for the in-file dedup. Memory is bounded by the
+    chunk size no matter how large the history grows.
+    """
+
+    def __init__(self, db, invalid_since=0.0, campaign_id=None):
+        self.db = db
+        self.invalid_since = invalid_since
+        self.already_sent = 0
+        self.invalid = 0
+        self.duplicates = 0
+        db.flush()  # include outcomes still waiting in the write queue
+        self._conn = db.connection()
+        suffix = next(_filter_ids)
+        self._incoming = f"exclusion_incoming_{suffix}"
+        self._seen = f"exclusion_seen_{suffix}"
+        with self._conn:
+            self._conn.execute(f"CREATE TEMP TABLE {self._incoming} (pos INTEGER PRIMARY KEY, phone_key TEXT)")
+            self._conn.execute(f"CREATE TEMP TABLE {self._seen} (phone_key TEXT PRIMARY KEY)")
+            if campaign_id is not None:
+                self._conn.execute(
+                    f"INSERT OR IGNORE INTO temp.{self._seen} (phone_key) "
+                    f"SELECT phone FROM campaign_items WHERE campaign_id = ?",
+                    (campaign_id,),
+                )
+
+    @property
+    def skipped(self):
+        return self.already_sent + self.invalid + self.duplicates
+
+    def filter(self, contacts):
+        """The contacts (in order) whose phone key hasn't been excluded."""
+        if not contacts:
+            return []
+        incoming, seen = f"temp.{self._incoming}", f"temp.{self._seen}"
+        with self._conn:
+            self._conn.execute(f"DELETE FROM {incoming}")
+            self._conn.executemany(
+                f"INSERT INTO {incoming} (pos, phone_key) VALUES (?, ?)",
+                enumerate(contact.phone for contact in contacts),
+            )
+            excluded = dict(self._conn.execute(f'''
+                SELECT pos, reason FROM (
+                    SELECT i.pos, CASE
+                        WHEN EXISTS (SELECT 1 FROM sent_numbers s WHERE s.phone_key = i.phone_key) THEN {_ALREADY_SENT}
+                        WHEN EXISTS (
+                            SELECT 1 FROM validity_cache v
+                            WHERE v.phone_key = i.phone_key AND v.has_whatsapp = 0 AND v.checked_at >= ?
+                        ) THEN {_INVALID}
+                        WHEN EXISTS (SELECT 1 FROM {seen} d WHERE d.phone_key = i.phone_key) THEN {_DUPLICATE}
+                        ELSE 0 END AS reason
+                    FROM {incoming} i
+                ) WHERE reason != 0
+            ''', (self.invalid_since,)).fetchall())
+            self._conn.execute(f"INSERT OR IGNORE INTO {seen} (phone_key) SELECT phone_key FROM {incoming}")
+
+        fresh, chunk_keys = [], set()
+        for pos, contact in enumerate(contacts):
+            reason = excluded.get(pos)
+            if reason is None and contact.phone in chunk_keys:
+                reason = _DUPLICATE  # repeated within this chunk
+            if reason == _ALREADY_SENT:
+                self.already_sent += 1
+            elif reason == _INVALID:
+                self.invalid += 1
+            elif reason == _DUPLICATE:
+                self.duplicates += 1
+            else:
+                chunk_keys.add(contact.phone)
+                fresh.append(contact)
+        return fresh
+
+    def close(self):
+        if self._conn is None:
+            return
+        with self._conn:
+            self._conn.execute(f"DROP TABLE IF EXISTS temp.{self._incoming}")
+            self._conn.execute(f"DROP TABLE IF EXISTS temp.{self._seen}")
+        self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
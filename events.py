@@ -0,0 +1,87 @@
+"""
+Server-Sent Events for live campaign progress.
+
+The page used to poll /status every 2 seconds (plus both history lists
+every 3), each time receiving the full, ever-growing error and no-WhatsApp
+lists. Now app.py publishes small events as things happen (contact started,
+sent, invalid, failed, counters) and the page listens on /events with an
+EventSource.
+
+Each subscriber gets a bounded queue. A subscriber that falls too far
+behind is sent a single 'resync' event instead of the backlog and is
+expected to re-fetch /status. Idle streams get a comment line every
+`heartbeat` seconds; that keeps proxies from timing them out and lets
+waitress notice closed connections.
+"""
+import itertools
+import json
+import queue
+import threading
+
+
+def format_event(event, data, event_id=None):
+    """One SSE message: optional id, event name, JSON data, blank line."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+
+class EventBroker:
+    """Fans published events out to every connected stream."""
+
+    def __init__(self, queue_size=500, heartbeat=15.0):
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event, data):
+        """Queue an event for every subscriber; never blocks the caller."""
+        with self._lock:
+            if not self._subscribers:
+                return
+            message = format_event(event, data, next(self._ids))
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # Too far behind: drop the backlog and ask for a full refresh
+                with subscriber.mutex:
+                    subscriber.queue.clear()
+                subscriber.put_nowait(format_event('resync', {}))
+
+    def stream(self, initial=()):
+        """Generator of SSE text for one client: `initial` (event, data)
+        pairs first, then everything published until the client goes away."""
+        subscriber = self.subscribe()
+        try:
+            yield "retry: 3000\n\n"
+            for event, data in initial:
+                yield format_event(event, data)
+            while True:
+                try:
+                    yield subscriber.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(subscriber)
@@ -132,11 +132,17 @@ def _redirect_streams_to_log() -> None:
 def _start_flask() -> None:
     try:
         _log("flask-thread: importing app module")
-        from app import app, DB_PATH, UPLOAD_FOLDER
+        from app import app, DB_PATH, UPLOAD_FOLDER, start_campaign_scheduler, start_session_monitor
         _log(f"flask-thread: app imported. template_folder={app.template_folder}")
         _log(f"flask-thread: DB_PATH={DB_PATH} (exists={os.path.exists(DB_PATH)})")
         _log(f"flask-thread: UPLOAD_FOLDER={UPLOAD_FOLDER} (exists={os.path.exists(UPLOAD_FOLDER)})")
 
+        _log("flask-thread: starting browser session monitor")
+        start_session_monitor()
+
+        _log("flask-thread: starting campaign scheduler")
+        start_campaign_scheduler()
+
         _log("flask-thread: importing waitress")
         from waitress import serve
 
@@ -0,0 +1,37 @@
+"""
+WhatsApp click-to-chat links for sending by hand.
+
+/generate_whatsapp_links used to call message.format() and
+urllib.parse.quote() on every row in a Python loop and return the whole
+list as one JSON document. Now the message is parsed once into a
+MessageTemplate (message_templates.py, shared with the send path), which
+renders a chunk of contacts with their URL-encoded text - the fixed text
+is encoded once, and each distinct value once - and the links are put
+together column-wise with pandas string concatenation.
+
+link_frame() returns a DataFrame with LINK_COLUMNS, which the endpoint
+pages through or streams out as NDJSON / CSV.
+"""
+import pandas as pd
+
+from contacts import INDEX_COLUMNS
+from send_drivers import WHATSAPP_WEB_URL
+
+
+WHATSAPP_SEND_URL = WHATSAPP_WEB_URL + '/send'
+LINK_COLUMNS = ('row', 'phone', 'sr_no', 'message', 'link')
+
+# Contacts per link batch; pandas string ops pay off on large batches
+LINK_BATCH_ROWS = 10000
+
+
+def link_frame(contacts, template):
+    """Links for a list of Contact tuples (carrying template.columns), as a
+    DataFrame with LINK_COLUMNS."""
+    frame = pd.DataFrame.from_records([contact[:len(INDEX_COLUMNS)] for contact in contacts], columns=INDEX_COLUMNS)
+    frame['sr_no'] = frame['sr_no'].fillna('').astype(str)
+    messages, encoded = template.render_columns(contacts)
+    frame['message'] = pd.Series(messages, index=frame.index, dtype=object)
+    encoded = pd.Series(encoded, index=frame.index, dtype=object)
+    frame['link'] = WHATSAPP_SEND_URL + '?phone=' + frame['phone'] + '&text=' + encoded + '&app_absent=0'
+    return frame[list(LINK_COLUMNS)]
@@ -0,0 +1,178 @@
+"""
+Message templates: placeholders filled from the contact file's columns.
+
+The send path used to render each contact on its own - a
+message.replace('{Name}', '{name}').format(name=...) per contact, then
+urllib.parse.quote() of the whole message in the driver - and {name} was
+the only placeholder. A MessageTemplate is parsed once per campaign:
+
+  * any column of the contact file can be a placeholder: {city},
+    {amount}. Placeholders match headers case-insensitively, with spaces,
+    dots and underscores alike ({Due Date} is the 'due_date' column);
+  * {column|text} uses `text` when the cell is blank;
+  * {name} is the name column, or SR#<serial> when that is blank (as
+    before); {phone} and {sr_no} are the contact's number and serial;
+  * {{ and }} are literal braces.
+
+validate() checks the placeholders against a file's columns before the
+campaign is queued, and render() turns a chunk of contacts into their
+messages ahead of the send loop. Messages come out URL-encoded as well:
+the fixed text is encoded once per template, and each distinct cell value
+once (render cache), so the drivers don't quote() every message again.
+"""
+import functools
+import itertools
+import re
+import threading
+import urllib.parse
+
+
+NAME_FIELD = 'name'
+PHONE_FIELD = 'phone'
+SERIAL_FIELD = 'sr_no'
+# Placeholders every contact has, whatever the file's other columns
+CONTACT_FIELDS = (NAME_FIELD, PHONE_FIELD, SERIAL_FIELD)
+NAME_PREFIX = 'SR#'
+
+# Distinct values whose encoding a template remembers
+ENCODE_CACHE_SIZE = 50000
+
+_TOKEN = re.compile(r'\{\{|\}\}|\{([^{}]*)\}|[{}]')
+_SEPARATORS = re.compile(r'[\s._]+')
+
+
+def field_key(label):
+    """The placeholder name a column header answers to."""
+    return _SEPARATORS.sub('_', str(label).strip().lower()).strip('_')
+
+
+class RenderedMessage(str):
+    """A message with its URL-encoded form (`encoded`) already worked out;
+    send_drivers.chat_link() uses it instead of quoting again."""
+
+    encoded = None
+
+
+class MessageTemplate:
+    """A message parsed once into fixed text and placeholder slots."""
+
+    def __init__(self, text):
+        self.text = text
+        self.literals = []  # fixed text around the slots (one more than slots)
+        self.slots = []     # (field key, default or None, placeholder as written)
+        literal, position = [], 0
+        for match in _TOKEN.finditer(text):
+            literal.append(text[position:match.start()])
+            position = match.end()
+            token = match.group(0)
+            if token in ('{{', '}}'):
+                literal.append(token[0])
+                continue
+            if match.group(1) is None:
+                raise ValueError(f"Unmatched '{token}' in the message (write {token}{token} for a literal brace)")
+            field, separator, default = match.group(1).partition('|')
+            key = field_key(field)
+            if not key:
+                raise ValueError(f"Empty placeholder {token} in the message")
+            self.literals.append(''.join(literal))
+            self.slots.append((key, default if separator else None, field.strip()))
+            literal = []
+        literal.append(text[position:])
+        self.literals.append(''.join(literal))
+        self.encoded_literals = [urllib.parse.quote(part) for part in self.literals]
+
+        # File columns the template needs besides the contact's own fields,
+        # in the order contacts carry them (Contact.fields)
+        self.columns = []
+        for key, _default, _label in self.slots:
+            if key not in CONTACT_FIELDS and key not in self.columns:
+                self.columns.append(key)
+        self._getters = [self._getter(key, default) for key, default, _label in self.slots]
+        # Render cache: shared by every thread rendering with this template
+        # (compile_template() hands out one object per message)
+        self._encoded = {}
+        self._encoded_lock = threading.Lock()
+
+    def _getter(self, key, default):
+        default = default or ''
+        if key == NAME_FIELD:
+            if default:
+                return lambda contact: contact.name or default
+            return lambda contact: contact.name or f"{NAME_PREFIX}{contact.sr_no or contact.row}"
+        if key == PHONE_FIELD:
+            return lambda contact: str(contact.phone)
+        if key == SERIAL_FIELD:
+            return lambda contact: contact.sr_no or default
+        position = self.columns.index(key)
+        return lambda contact: (contact.fields[position] if contact.fields else '') or default
+
+    def validate(self, columns):
+        """Raise ValueError for placeholders that aren't among `columns`
+        (field keys of the file's other columns)."""
+        available = set(columns)
+        unknown = [label for key, _default, label in self.slots
+                   if key not in CONTACT_FIELDS and key not in available]
+        if unknown:
+            choices = ', '.join(f"{{{key}}}" for key in CONTACT_FIELDS + tuple(columns))
+            raise ValueError(f"Unknown placeholder {{{unknown[0]}}} in the message "
+                             f"(the file's placeholders are {choices})")
+
+    def _encodings(self, values):
+        """The encoding of every one of `values`, as a dict of this call's
+        own: taken from the render cache where it has them, and the rest
+        worked out (outside the lock) and added to it."""
+        values = set(values)
+        cache = self._encoded
+        with self._encoded_lock:
+            encodings = {value: cache[value] for value in values if value in cache}
+        if len(encodings) < len(values):
+            missing = {value: urllib.parse.quote(value) for value in values if value not in encodings}
+            encodings.update(missing)
+            with self._encoded_lock:
+                if len(cache) + len(missing) > ENCODE_CACHE_SIZE:
+                    cache.clear()
+                cache.update(missing)
+        return encodings
+
+    def render_columns(self, contacts):
+        """(messages, URL-encoded messages) for a chunk of contacts, as two
+        lists; worked out a placeholder at a time."""
+        count = len(contacts)
+        literals, encoded_literals = self.literals, self.encoded_literals
+        if not self.slots:
+            return [literals[0]] * count, [encoded_literals[0]] * count
+        columns = [list(map(getter, contacts)) for getter in self._getters]
+        if len(columns) == 1:
+            # The common case (just {name}): plain concatenation
+            values = columns[0]
+            before, after = literals
+            encoded_before, encoded_after = encoded_literals
+            encodings = self._encodings(values)
+            return ([before + value + after for value in values],
+                    [encoded_before + encodings[value] + encoded_after for value in values])
+        messages, encoded = [], []
+        encodings = self._encodings(itertools.chain.from_iterable(columns))
+        tail = list(zip(literals[1:], encoded_literals[1:]))
+        for row in zip(*columns):
+            text, quoted = [literals[0]], [encoded_literals[0]]
+            for value, (literal, encoded_literal) in zip(row, tail):
+                text += (value, literal)
+                quoted += (encodings[value], encoded_literal)
+            messages.append(''.join(text))
+            encoded.append(''.join(quoted))
+        return messages, encoded
+
+    def render(self, contacts):
+        """RenderedMessages for a chunk of contacts, in order."""
+        rendered = []
+        for text, encoded in zip(*self.render_columns(contacts)):
+            message = RenderedMessage(text)
+            message.encoded = encoded
+            rendered.append(message)
+        return rendered
+
+
+@functools.lru_cache(maxsize=32)
+def compile_template(text):
+    """The parsed template for a message (one parse per distinct message)."""
+    return MessageTemplate(text)
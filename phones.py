@@ -0,0 +1,105 @@
+"""
+Canonical phone keys.
+
+The same person used to arrive as `+923001234567`, `923001234567`,
+`0300 1234567` or the float `923001234567.0` pandas reads from a numeric
+cell, and the exclusion filter compared those strings as-is, so already
+messaged or known-invalid numbers were validated and messaged again.
+
+Every number is reduced to one key: its E.164 digits without the '+'
+(what WhatsApp's /send?phone= takes). Spaces, dashes, brackets, '+' and a
+leading '00' international prefix are dropped; a national number (trunk
+'0' prefix) gets the default country code when one is configured. Values
+that don't come out as 7-15 digits have no key ('').
+
+phone_keys() does a whole column at once (contact files, the history
+migration); phone_key() does one value the same way (recording outcomes).
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# E.164 numbers are at most 15 digits; anything under 7 is not a phone number
+MIN_PHONE_DIGITS = 7
+MAX_PHONE_DIGITS = 15
+
+_BLANKS = ('nan', 'None', 'NaN', '<NA>')
+_NUMBER_TYPES = (int, float, np.int64, np.float64)
+_FORMATTING = re.compile(r'\.0$|\D')
+
+
+def _cells(values):
+    """A column of cells as a Series; all-numeric columns get a numeric dtype."""
+    return pd.Series(values, dtype=object).infer_objects()
+
+
+def _numeric_text(series):
+    # Numeric cells as text, whole floats without their '.0', NaN as ''
+    if series.dtype.kind in 'iu':
+        return series.astype(str)
+    present = series.notna()
+    whole = present & (series % 1 == 0)
+    text = pd.Series('', index=series.index, dtype=object)
+    text[whole] = series[whole].astype('int64').astype(str)
+    fractional = present & ~whole
+    if fractional.any():
+        text[fractional] = series[fractional].astype(str)
+    return text
+
+
+def column_text(values):
+    """Cells as stripped strings; '' for blanks/NaN, and 923001234567.0 -> '923001234567'."""
+    series = _cells(values)
+    if series.dtype.kind in 'iuf':
+        return _numeric_text(series)
+    text = series.astype(str).str.strip()
+    numbers = series.map(type).isin(_NUMBER_TYPES)
+    if numbers.any():
+        text[numbers] = _numeric_text(series[numbers].astype(float))
+    return text.mask(text.isin(_BLANKS), '')
+
+
+def phone_keys(values, default_country_code=''):
+    """Canonical keys for a column of phone cells, vectorized ('' = no key).
+
+    Regex work is limited to the cells that actually carry formatting.
+    """
+    digits = column_text(values)
+    international = digits.str.startswith(('+', '00'))
+    formatted = ~digits.str.isdigit()
+    if formatted.any():
+        digits[formatted] = digits[formatted].str.replace(_FORMATTING, '', regex=True)
+    if international.any():
+        digits[international] = digits[international].str.lstrip('0')
+    if default_country_code:
+        national = ~international & digits.str.startswith('0')
+        if national.any():
+            digits[national] = default_country_code + digits[national].str.lstrip('0')
+    length = digits.str.len()
+    return digits.where((length >= MIN_PHONE_DIGITS) & (length <= MAX_PHONE_DIGITS), '')
+
+
+def phone_key(value, default_country_code=''):
+    """Canonical key for one phone value; same rules as phone_keys()."""
+    if value is None or isinstance(value, bool):
+        return ''
+    if isinstance(value, (float, np.floating)):
+        if value != value:  # NaN
+            return ''
+        text = str(int(value)) if value.is_integer() else str(value)
+    elif isinstance(value, (int, np.integer)):
+        text = str(int(value))
+    else:
+        text = str(value).strip()
+        if text in _BLANKS:
+            return ''
+    international = text.startswith(('+', '00'))
+    if not text.isdigit():
+        text = _FORMATTING.sub('', text)
+    if international:
+        text = text.lstrip('0')
+    elif default_country_code and text.startswith('0'):
+        text = default_country_code + text.lstrip('0')
+    return text if MIN_PHONE_DIGITS <= len(text) <= MAX_PHONE_DIGITS else ''
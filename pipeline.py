@@ -0,0 +1,202 @@
+"""
+Staged campaign pipeline: producer/consumer threads joined by bounded queues.
+
+send_messages_thread used to prepare contacts one step after another in
+a single thread - parse rows out of the file, normalize them, filter,
+render, store - between putting contacts on the send queue, so while it
+parsed the next 10k-row block of an .xlsx the browsers could run dry.
+Now each step is a stage with its own thread:
+
+    read -> normalize -> render -> send (one worker per browser session)
+                                        -> record (db.py's writer thread)
+
+  read       pulls raw rows out of the file (ContactReader.iter_batches)
+  normalize  phone keys / names, exclusion filter, target limit, and
+             storing the contacts as campaign items
+  render     the chunk's messages (MessageTemplate.render)
+
+Queues are bounded, so a stage runs at most a few chunks ahead of the
+next one, and everything upstream of the browsers overlaps with their
+page loads. Each queue counts how long its producer was blocked on a full
+queue (the consumer can't keep up) and how long its consumer waited on
+an empty one (the producer can't keep up): snapshot() turns that into
+the current bottleneck. A stage that fails ends its output with the error,
+which the next stage raises in turn, and closes every stage's input, so
+the stages before it stop instead of blocking on a queue nobody reads.
+"""
+import queue
+import threading
+import time
+
+
+# Upper bound on how long a blocked put() goes without checking for a stop
+POLL_SECONDS = 0.5
+
+
+class StageQueue:
+    """Bounded queue between two stages; None marks the end."""
+
+    def __init__(self, name, maxsize, is_active=lambda: True):
+        self.name = name
+        self.maxsize = maxsize
+        self.is_active = is_active
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self.closed = False  # the consumer stopped reading
+        self.error = None    # why the producer ended early
+        self.items = 0
+        self.high_water = 0
+        self.put_wait = 0.0
+        self.get_wait = 0.0
+
+    def _add_wait(self, field, started):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + time.perf_counter() - started)
+
+    def put(self, item):
+        """Block while the queue is full; False if the consumer stopped
+        reading or the campaign was stopped first."""
+        started = time.perf_counter()
+        try:
+            while self.is_active() and not self.closed:
+                try:
+                    self._queue.put(item, timeout=POLL_SECONDS)
+                except queue.Full:
+                    continue
+                with self._lock:
+                    self.items += 1
+                    self.high_water = max(self.high_water, self._queue.qsize())
+                return True
+            return False
+        finally:
+            self._add_wait('put_wait', started)
+
+    def get(self):
+        """Next item (None at the end, or once the queue is closed)."""
+        started = time.perf_counter()
+        try:
+            while True:
+                try:
+                    return self._queue.get(timeout=POLL_SECONDS)
+                except queue.Empty:
+                    if self.closed:
+                        return None
+        finally:
+            self._add_wait('get_wait', started)
+
+    def __iter__(self):
+        """Items up to the end; raises the producer's error if it failed."""
+        while True:
+            item = self.get()
+            if item is None:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield item
+
+    def finish(self, error=None, consumers=1):
+        """End the queue for `consumers` readers (after any error)."""
+        self.error = error
+        for _ in range(consumers):
+            while not self.closed:
+                try:
+                    self._queue.put(None, timeout=POLL_SECONDS)
+                    break
+                except queue.Full:
+                    continue
+
+    def close(self, error=None):
+        """The consumer is done early: drop what is queued and make further
+        puts return False, so the producer doesn't block on a full queue.
+        A consumer still reading gets the end (raising `error`, if given)."""
+        if error is not None and self.error is None:
+            self.error = error
+        self.closed = True
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'name': self.name,
+                'depth': self._queue.qsize(),
+                'capacity': self.maxsize,
+                'high_water': self.high_water,
+                'items': self.items,
+                'producer_blocked_seconds': round(self.put_wait, 3),
+                'consumer_starved_seconds': round(self.get_wait, 3),
+            }
+
+
+class Pipeline:
+    """The stage threads of one campaign and the queues between them."""
+
+    def __init__(self, is_active=lambda: True):
+        self.is_active = is_active
+        self.queues = []
+        self.error = None  # first stage failure (the root cause)
+        self.failed_stage = None  # name of the stage that raised it
+        self._threads = []
+        self._inputs = []  # queues the stages read from
+        self._external = []  # (name, callable returning a depth) for queues owned elsewhere
+
+    def queue(self, name, maxsize):
+        """A new bounded queue, named after the stage that consumes it."""
+        stage_queue = StageQueue(name, maxsize, self.is_active)
+        self.queues.append(stage_queue)
+        return stage_queue
+
+    def watch(self, name, depth):
+        """Report a queue owned elsewhere (e.g. the DB write queue) by its depth."""
+        self._external.append((name, depth))
+
+    def start(self, name, target, *args, input=None, output=None):
+        """Run `target(*args)` in a thread; `output` is finished when it
+        returns, carrying the error if it raised. `input` is the queue it
+        reads, closed along with the others if any stage fails."""
+        if input is not None:
+            self._inputs.append(input)
+
+        def run():
+            error = None
+            try:
+                target(*args)
+            except Exception as e:
+                error = e
+                if self.error is None:
+                    self.error = e
+                    self.failed_stage = name
+                    print(f"[PIPELINE] Stage {name} failed: {str(e)}")
+                # Upstream stages would block on a full queue for as long as
+                # the campaign runs; downstream ones get the error
+                for stage_queue in self._inputs:
+                    stage_queue.close(self.error)
+            finally:
+                if output is not None:
+                    output.finish(error)
+
+        thread = threading.Thread(target=run, daemon=True, name=f"stage-{name}")
+        self._threads.append(thread)
+        thread.start()
+        return thread
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def snapshot(self):
+        """Queue depths and waits, plus the stage currently holding things up."""
+        queues = [stage_queue.snapshot() for stage_queue in self.queues]
+        for name, depth in self._external:
+            queues.append({'name': name, 'depth': depth()})
+        # The consumer whose producer spent longest blocked on a full queue
+        blocked = [entry for entry in queues if entry.get('producer_blocked_seconds')]
+        bottleneck = max(blocked, key=lambda entry: entry['producer_blocked_seconds'])['name'] if blocked else None
+        return {'queues': queues, 'bottleneck': bottleneck}
@@ -0,0 +1,143 @@
+"""
+Adaptive send pacing: a token bucket per browser session.
+
+Workers used to sleep `message_delay` seconds after every contact, on top
+of however long the send itself took (a page load, readiness waits), and
+kept that pace whether WhatsApp was accepting messages or pushing back.
+
+A RateController hands out one token per contact:
+
+  * tokens refill at the target rate (messages/hour), so time already
+    spent sending counts towards the gap before the next one;
+  * up to `burst` tokens can be saved up (an idle session may send that
+    many back to back);
+  * each wait is stretched or shortened by up to `jitter` (a fraction),
+    so sends don't go out at a machine-regular cadence;
+  * outcomes are fed back with record(): when failures (errors,
+    timeouts) reach `backoff_threshold` of the last `window` contacts the
+    rate is halved, down to `min_factor` of the target, and it climbs back
+    by `recover_step` after each window without trouble.
+
+With no target rate (message delay 0) it never waits and never backs off.
+The target defaults to one message per `message_delay` seconds per
+session, which is the old pause minus the time spent sending.
+"""
+import random
+import threading
+import time
+from collections import deque
+
+
+DEFAULT_JITTER = 0.2
+DEFAULT_WINDOW = 20
+DEFAULT_BACKOFF_THRESHOLD = 0.3
+MIN_FACTOR = 0.125
+RECOVER_STEP = 1.25
+
+RESULT_OK = 'ok'
+RESULT_FAILED = 'failed'
+RESULT_TIMEOUT = 'timeout'
+
+
+class RateController:
+    """Token bucket with jitter and failure backoff, shared by the threads
+    sending through one session."""
+
+    def __init__(self, rate_per_hour, burst=1, jitter=DEFAULT_JITTER, window=DEFAULT_WINDOW,
+                 backoff_threshold=DEFAULT_BACKOFF_THRESHOLD, min_factor=MIN_FACTOR,
+                 recover_step=RECOVER_STEP, clock=time.monotonic, rng=None):
+        self.rate_per_hour = max(0.0, float(rate_per_hour or 0))
+        self.burst = max(1, int(burst or 1))
+        self.jitter = min(1.0, max(0.0, float(jitter or 0)))
+        self.backoff_threshold = backoff_threshold
+        self.min_factor = min_factor
+        self.recover_step = recover_step
+        self.factor = 1.0
+        self.backoffs = 0
+        self.waited = 0.0
+        self._clock = clock
+        self._random = rng or random.Random()
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._recent = deque(maxlen=max(1, window))
+
+    @classmethod
+    def from_delay(cls, message_delay, **options):
+        """The rate that one message per `message_delay` seconds amounts to."""
+        try:
+            delay = float(message_delay or 0)
+        except (TypeError, ValueError):
+            delay = 0.0
+        return cls(3600.0 / delay if delay > 0 else 0, **options)
+
+    @property
+    def limited(self):
+        return self.rate_per_hour > 0
+
+    @property
+    def effective_rate(self):
+        """Messages/hour after backoff."""
+        return self.rate_per_hour * self.factor
+
+    def _refill(self, now):
+        # Caller holds the lock
+        per_second = self.effective_rate / 3600.0
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * per_second)
+        self._updated = now
+
+    def reserve(self):
+        """Take a token; returns how many seconds to wait before using it."""
+        if not self.limited:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._tokens -= 1.0
+            if self._tokens >= 0:
+                return 0.0
+            delay = -self._tokens / (self.effective_rate / 3600.0)
+            if self.jitter:
+                delay *= 1.0 + self._random.uniform(-self.jitter, self.jitter)
+            self.waited += delay
+            return delay
+
+    def acquire(self, sleep=time.sleep):
+        """Wait for a token. `sleep(seconds)` may return False to give up
+        (a stopped campaign); acquire() returns what it returned."""
+        delay = self.reserve()
+        if delay <= 0:
+            return True
+        return sleep(delay) is not False
+
+    def record(self, result):
+        """Feed back one contact's result (RESULT_OK / FAILED / TIMEOUT)."""
+        if not self.limited:
+            return
+        with self._lock:
+            self._recent.append(result != RESULT_OK)
+            failures = sum(self._recent)
+            if failures >= self.backoff_threshold * self._recent.maxlen:
+                if self.factor > self.min_factor:
+                    self._refill(self._clock())
+                    self.factor = max(self.min_factor, self.factor / 2)
+                    self.backoffs += 1
+                    print(f"[RATE] Backing off to {self.effective_rate:.0f} messages/hour "
+                          f"({failures} of the last {len(self._recent)} contacts failed)")
+                self._recent.clear()
+            elif len(self._recent) == self._recent.maxlen:
+                if self.factor < 1.0:
+                    self._refill(self._clock())
+                    self.factor = min(1.0, self.factor * self.recover_step)
+                self._recent.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'rate_per_hour': round(self.rate_per_hour, 1),
+                'effective_per_hour': round(self.effective_rate, 1),
+                'burst': self.burst,
+                'jitter': self.jitter,
+                'backoffs': self.backoffs,
+                'waited_seconds': round(self.waited, 2),
+            }
@@ -0,0 +1,77 @@
+"""
+Campaign scheduler: campaigns are queued instead of rejected.
+
+/send_messages used to refuse a campaign while another was being sent, so
+the next list had to be started by hand once the current one finished.
+Now every submitted campaign is stored as `queued` (campaign_queue.py)
+with a priority, an optional start-at time and its own settings, and one
+dispatcher runs them back to back through the shared browser sessions:
+
+  * the next campaign is the due one (start_at unset or past) with the
+    highest priority, then the lowest queue position (submission order,
+    or as set through /campaigns/reorder);
+  * dispatch() is called on submit, when a campaign or validation job
+    ends, and by a background thread that wakes up for start-at times;
+  * the sender counts as free only once the previous campaign's thread
+    has exited (is_busy() stays true while a stopped one winds down), so
+    two campaigns never share the browser sessions.
+
+Queued campaigns are in SQLite, so they survive a restart along with the
+interrupted one (which goes back to the queue).
+"""
+import threading
+import time
+
+
+# Longest the dispatcher thread sleeps without being woken
+POLL_INTERVAL = 30.0
+
+
+class CampaignScheduler:
+    """Starts queued campaigns one at a time, in priority order."""
+
+    def __init__(self, store, start, is_busy=lambda: False, poll_interval=POLL_INTERVAL):
+        # start(stored_campaign) claims the sender and starts sending in the
+        # background; False if the sender is busy. is_busy() is true from
+        # the start until the send thread has finished
+        self.store = store
+        self._start = start
+        self._is_busy = is_busy
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def dispatch(self):
+        """Start the next due campaign if the sender is free; returns its id."""
+        with self._lock:
+            if self._is_busy():
+                return None  # the ending thread dispatches on its way out
+            stored = self.store.next_queued(time.time())
+            if stored and self._start(stored):
+                return stored['id']
+            return None
+
+    def wake(self):
+        """Re-check the queue now (after a submit, cancel or reorder)."""
+        self._wake.set()
+
+    def start(self):
+        """Run the dispatcher thread (for start-at times); idempotent."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="campaign-scheduler")
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.dispatch()
+                next_start = self.store.next_start_at(time.time())
+            except Exception as e:
+                print(f"[SCHEDULER] Dispatch failed: {e}")
+                next_start = None
+            timeout = self.poll_interval
+            if next_start is not None:
+                timeout = min(timeout, max(0.5, next_start - time.time()))
+            self._wake.wait(timeout)
+            self._wake.clear()
@@ -0,0 +1,645 @@
+"""
+Send drivers — the only layer that knows how a message physically leaves.
+
+The campaign loop in app.py never talks to Selenium directly; it talks to a
+SendDriver. That lets us swap the browser out and drive the whole send loop
+offline:
+
+  SeleniumSendDriver -> a real Chrome session pointed at WhatsApp Web, or at
+                        the local stand-in page (whatsapp_standin.py) when
+                        base_url is overridden.
+  FakeSendDriver     -> in-process, no browser, no network. Thousands of
+                        contacts per minute; used by the benchmarks.
+
+A driver raises on a failed send and returns a bool from check_exists().
+deliver() is the one-navigation path: it classifies the chat page it has just
+opened and sends from it, returning OUTCOME_SENT or OUTCOME_NO_WHATSAPP.
+Counters (navigations, checks, sends, seconds spent waiting on the page) are
+kept on every driver so benchmark runs and /status can report how much
+browser work a campaign actually did.
+"""
+import re
+import threading
+import time
+import urllib.parse
+import zlib
+from collections import deque
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.support.ui import WebDriverWait
+
+
+WHATSAPP_WEB_URL = "https://web.whatsapp.com"
+
+COMPOSE_BOX_XPATH = "//div[@contenteditable='true'][@data-tab='10']"
+SEND_BUTTON_XPATH = "//button[@data-testid='compose-btn-send']"
+
+# Banners WhatsApp Web shows instead of a chat when the number has no account.
+NO_WHATSAPP_PATTERNS = [
+    "not on WhatsApp",
+    "Phone number shared via WhatsApp",
+    "This phone number is not on WhatsApp",
+    "The phone number is not on WhatsApp",
+    "This number is not on WhatsApp",
+    "Phone number shared via",
+    "not available on WhatsApp",
+    "This phone number is not available",
+    "The phone number is not available"
+]
+
+
+# Seconds an in-page chat has to show it belongs to the number searched for
+CHAT_MATCH_TIMEOUT = 2.0
+
+# Results of SendDriver.deliver()
+OUTCOME_SENT = 'sent'
+OUTCOME_NO_WHATSAPP = 'no_whatsapp'
+
+# How a chat is opened: a full /send?phone=... page load per contact, or
+# in-app navigation on the already-loaded WhatsApp Web (search + click).
+SEND_MODE_RELOAD = 'reload'
+SEND_MODE_INPAGE = 'inpage'
+SEND_MODES = (SEND_MODE_RELOAD, SEND_MODE_INPAGE)
+
+
+def chat_link(base_url, phone, text):
+    """The /send deep link WhatsApp Web (and the stand-in) understands."""
+    # Messages rendered by a MessageTemplate come already encoded
+    encoded_message = getattr(text, 'encoded', None) or urllib.parse.quote(text)
+    return f"{base_url}/send?phone={phone}&text={encoded_message}&app_absent=0"
+
+
+def stable_fraction(phone, salt):
+    """Deterministic pseudo-random value in [0, 1) for a phone number.
+
+    Shared by the fake driver and the stand-in page so both agree on which
+    synthetic numbers are "not on WhatsApp".
+    """
+    return (zlib.crc32(f"{salt}:{phone}".encode('utf-8')) % 10000) / 10000.0
+
+
+class SendDriver:
+    """Interface every send backend implements."""
+
+    name = 'base'
+    send_mode = SEND_MODE_RELOAD
+
+    def __init__(self):
+        self._counter_lock = threading.Lock()
+        self.navigations = 0
+        self.in_page_opens = 0
+        self.checks = 0
+        self.sends = 0
+        self.wait_seconds = 0.0
+
+    def _count(self, field):
+        with self._counter_lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _add_wait(self, seconds):
+        with self._counter_lock:
+            self.wait_seconds += seconds
+
+    def counters(self):
+        """Snapshot of the work this driver has done so far."""
+        with self._counter_lock:
+            return {
+                'driver': self.name,
+                'navigations': self.navigations,
+                'in_page_opens': self.in_page_opens,
+                'checks': self.checks,
+                'sends': self.sends,
+                'wait_seconds': round(self.wait_seconds, 3),
+            }
+
+    def is_alive(self):
+        return True
+
+    def set_send_mode(self, mode):
+        """Pick SEND_MODE_RELOAD or SEND_MODE_INPAGE for deliver()."""
+        if mode not in SEND_MODES:
+            raise ValueError(f"Unknown send mode: {mode}")
+        self.send_mode = mode
+
+    def check_exists(self, phone):
+        """True if `phone` has a WhatsApp account."""
+        raise NotImplementedError
+
+    def send(self, phone, text):
+        """Deliver `text` to `phone`. Raises on failure."""
+        raise NotImplementedError
+
+    def deliver(self, phone, text):
+        """Validate and send on a single chat load.
+
+        Returns OUTCOME_SENT or OUTCOME_NO_WHATSAPP; raises if the send
+        itself failed. Drivers that can't classify and send from the same
+        page fall back to check_exists() + send().
+        """
+        if not self.check_exists(phone):
+            return OUTCOME_NO_WHATSAPP
+        self.send(phone, text)
+        return OUTCOME_SENT
+
+    def quit(self):
+        pass
+
+
+class AdaptiveTimeout:
+    """A timeout that learns how long a page condition usually takes.
+
+    Starts at `ceiling`; after each observation the timeout becomes
+    `factor` x the moving average, clamped to [floor, ceiling]. A timeout
+    (observe(..., timed_out=True)) pushes the average back up so one slow
+    page doesn't leave us cutting the next ones short.
+    """
+
+    def __init__(self, floor, ceiling, factor=3.0, alpha=0.2):
+        self.floor = floor
+        self.ceiling = ceiling
+        self.factor = factor
+        self.alpha = alpha
+        self.average = None
+
+    def current(self):
+        if self.average is None:
+            return self.ceiling
+        return min(self.ceiling, max(self.floor, self.average * self.factor))
+
+    def observe(self, seconds, timed_out=False):
+        if timed_out:
+            seconds = max(seconds, self.current()) * 2
+        if self.average is None:
+            self.average = seconds
+        else:
+            self.average += self.alpha * (seconds - self.average)
+
+
+# One round-trip classifies the page: 'invalid' if a "not on WhatsApp" popup is
+# up, 'chat' if the compose box is ready and nothing is still loading,
+# otherwise 'loading'. arguments[0] is NO_WHATSAPP_PATTERNS. Compose boxes
+# marked data-wbm-stale belong to the previous chat (in-page mode).
+CLASSIFY_CHAT_JS = """
+const patterns = arguments[0].map(p => p.toLowerCase());
+const popups = document.querySelectorAll(
+    "[data-testid='popup-contents'], [data-animate-modal-popup='true'], div[role='dialog']");
+for (const popup of popups) {
+    const text = (popup.innerText || '').toLowerCase();
+    if (patterns.some(p => text.includes(p))) return 'invalid';
+}
+const loading = document.querySelector(
+    "[data-testid='startup'], progress, [data-icon='ciphertext'], [data-testid='chat-loading']");
+const box = document.querySelector("div[contenteditable='true'][data-tab='10']:not([data-wbm-stale])");
+if (box && !loading) return 'chat';
+return 'loading';
+"""
+
+# Outgoing bubbles and the delivery icon on the newest one.
+OUTGOING_STATE_JS = """
+const out = document.querySelectorAll('div.message-out');
+const last = out.length ? out[out.length - 1] : null;
+let tick = null;
+if (last) {
+    const icon = last.querySelector(
+        "span[data-icon='msg-time'], span[data-icon='msg-check'], " +
+        "span[data-icon='msg-dblcheck'], span[data-icon='msg-dblcheck-ack']");
+    tick = icon ? icon.getAttribute('data-icon') : null;
+}
+return [out.length, tick];
+"""
+
+# In-page navigation. Everything the previous chat left behind (compose box,
+# chat list rows) is marked stale first, so the waits below only match what
+# WhatsApp renders for the new search / chat.
+MARK_STALE_JS = """
+document.querySelectorAll(
+    "div[contenteditable='true'][data-tab='10'], #pane-side [role='listitem'], " +
+    "#pane-side [data-testid='cell-frame-container'], #main header, #main [data-id]"
+).forEach(el => el.setAttribute('data-wbm-stale', '1'));
+"""
+
+# Types arguments[0] into the side-panel search box the way a user would, so
+# WhatsApp's own input handlers run. Returns false if there is no search box.
+SEARCH_TYPE_JS = """
+const box = document.querySelector("div[contenteditable='true'][data-tab='3']");
+if (!box) return false;
+box.focus();
+document.execCommand('selectAll', false, null);
+document.execCommand('insertText', false, arguments[0]);
+return true;
+"""
+
+SEARCH_STATE_JS = """
+const pane = document.querySelector('#pane-side');
+if (!pane) return 'loading';
+const text = (pane.innerText || '').toLowerCase();
+if (text.includes('no chats, contacts or messages found') || text.includes('no results found')) return 'none';
+const hit = pane.querySelector(
+    "[role='listitem']:not([data-wbm-stale]), [data-testid='cell-frame-container']:not([data-wbm-stale])");
+return hit ? 'result' : 'loading';
+"""
+
+OPEN_FIRST_RESULT_JS = """
+const hit = document.querySelector(
+    "#pane-side [role='listitem']:not([data-wbm-stale]), " +
+    "#pane-side [data-testid='cell-frame-container']:not([data-wbm-stale])");
+if (!hit) return false;
+for (const type of ['mousedown', 'mouseup', 'click']) {
+    hit.dispatchEvent(new MouseEvent(type, {bubbles: true, cancelable: true, view: window}));
+}
+return true;
+"""
+
+# True once the open chat is provably the one with arguments[0] (digits):
+# its header shows the number (an unsaved contact), or its messages carry
+# the number's id (data-id "true_<number>@c.us_..."). Search matches names,
+# numbers and message text, so the first result can be someone else's chat.
+CHAT_MATCHES_PHONE_JS = """
+const digits = arguments[0];
+const header = document.querySelector("#main header:not([data-wbm-stale])");
+if (!header) return false;
+const labels = [header].concat(Array.from(header.querySelectorAll("span[title]")));
+for (const el of labels) {
+    const text = (el.getAttribute('title') || el.textContent || '').replace(/\\D/g, '');
+    if (text === digits) return true;
+}
+for (const row of document.querySelectorAll("#main [data-id]:not([data-wbm-stale])")) {
+    const match = /^(?:true|false)_(\\d+)@c\\.us_/.exec(row.getAttribute('data-id') || '');
+    if (match) return match[1] === digits;
+}
+return false;
+"""
+
+CLEAR_SEARCH_JS = """
+const box = document.querySelector("div[contenteditable='true'][data-tab='3']");
+if (box) { box.focus(); document.execCommand('selectAll', false, null); document.execCommand('delete', false, null); }
+"""
+
+# Puts the rendered message into the compose box (arguments[0]) through the
+# editor's input pipeline rather than by setting innerText.
+INSERT_TEXT_JS = """
+const box = arguments[0];
+box.focus();
+document.execCommand('selectAll', false, null);
+document.execCommand('insertText', false, arguments[1]);
+return box.innerText.length;
+"""
+
+# 'ready' once the chat list is rendered, 'login' while the QR code is shown.
+APP_SHELL_JS = """
+if (document.querySelector("#pane-side, [data-testid='chat-list']")) return 'ready';
+if (document.querySelector("canvas[aria-label], div[data-ref]")) return 'login';
+return 'loading';
+"""
+
+
+def _settled_chat_state(driver):
+    state = driver.execute_script(CLASSIFY_CHAT_JS, NO_WHATSAPP_PATTERNS)
+    return state if state in ('chat', 'invalid') else False
+
+
+def _search_settled(driver):
+    state = driver.execute_script(SEARCH_STATE_JS)
+    return state if state in ('result', 'none') else False
+
+
+def wait_for_whatsapp_ready(driver, timeout=60, login_timeout=180, poll=0.25):
+    """Block until WhatsApp Web has rendered its chat list.
+
+    Replaces the old fixed 15s sleep: returns as soon as the app is usable,
+    waits up to `login_timeout` while a QR code is waiting to be scanned, and
+    gives up after `timeout` otherwise. Returns 'ready', 'login' or 'timeout'.
+    """
+    started = time.monotonic()
+    state = 'loading'
+    announced = False
+    while True:
+        try:
+            state = driver.execute_script(APP_SHELL_JS)
+        except Exception:
+            state = 'loading'
+        if state == 'ready':
+            return state
+        elapsed = time.monotonic() - started
+        if state == 'login' and not announced:
+            print("Please scan the QR code in the Chrome window to log in to WhatsApp Web...")
+            announced = True
+        limit = login_timeout if state == 'login' else timeout
+        if elapsed >= limit:
+            return 'timeout' if state == 'loading' else state
+        time.sleep(poll)
+
+
+class SeleniumSendDriver(SendDriver):
+    """Drives a Selenium WebDriver through the WhatsApp Web /send deep link.
+
+    Every wait is on a DOM condition with an adaptive timeout rather than a
+    fixed sleep, so per-contact latency is what the page actually needs.
+    """
+
+    name = 'selenium'
+    poll_frequency = 0.1
+
+    def __init__(self, driver, base_url=WHATSAPP_WEB_URL):
+        super().__init__()
+        self.driver = driver
+        self.base_url = base_url.rstrip('/')
+        self.host = urllib.parse.urlparse(self.base_url).netloc
+        self.chat_timeout = AdaptiveTimeout(floor=8, ceiling=40)
+        self.bubble_timeout = AdaptiveTimeout(floor=3, ceiling=15)
+        self.tick_timeout = AdaptiveTimeout(floor=1, ceiling=5)
+        self.search_timeout = AdaptiveTimeout(floor=2, ceiling=10)
+
+    def _get(self, link):
+        self._count('navigations')
+        self.driver.get(link)
+
+    def _wait(self, timeout, condition):
+        """WebDriverWait on `condition`; returns (result or None, seconds waited)."""
+        started = time.monotonic()
+        try:
+            result = WebDriverWait(self.driver, timeout, poll_frequency=self.poll_frequency).until(condition)
+        except TimeoutException:
+            result = None
+        elapsed = time.monotonic() - started
+        self._add_wait(elapsed)
+        return result, elapsed
+
+    def wait_for_chat(self):
+        """Wait until the chat is ready or WhatsApp says the number is invalid.
+
+        Returns 'chat', 'invalid', or None if neither happened in time.
+        """
+        timeout = self.chat_timeout.current()
+        state, elapsed = self._wait(timeout, _settled_chat_state)
+        self.chat_timeout.observe(elapsed, timed_out=state is None)
+        return state
+
+    def is_alive(self):
+        try:
+            self.driver.execute_script("return document.readyState")
+            return True
+        except Exception:
+            return False
+
+    def check_exists(self, phone):
+        self._count('checks')
+        driver = self.driver
+        self._get(chat_link(self.base_url, phone, "test"))
+
+        # Check if we're redirected to an error page or if the URL changed
+        current_url = driver.current_url
+        page_title = driver.title.lower()
+
+        print(f"[DEBUG] Current URL: {current_url}")
+        print(f"[DEBUG] Page title: {page_title}")
+
+        # Check for error indicators in URL or title
+        if "error" in current_url or "error" in page_title or "not found" in page_title:
+            print(f"[NO WHATSAPP] Error page detected for {phone}")
+            return False
+
+        # Check if we're still on WhatsApp Web (not redirected away)
+        if self.host not in current_url:
+            print(f"[NO WHATSAPP] Redirected away from WhatsApp Web for {phone}")
+            return False
+
+        print(f"[DEBUG] Waiting for WhatsApp elements for {phone}")
+        state = self.wait_for_chat()
+        if state == 'chat':
+            print(f"[DEBUG] Input box found for {phone} - WhatsApp account exists")
+            return True
+        if state == 'invalid':
+            print(f"[NO WHATSAPP] 'Not on WhatsApp' popup shown for {phone}")
+            return False
+        return self._classify_slow(phone)
+
+    def _classify_slow(self, phone):
+        """Exhaustive fallback when the page never settled into a known state."""
+        driver = self.driver
+        try:
+            # Additional check: Look for clear "not on WhatsApp" messages
+            try:
+                print(f"[DEBUG] Checking for invalid WhatsApp indicators for {phone}")
+
+                for pattern in NO_WHATSAPP_PATTERNS:
+                    try:
+                        no_whatsapp_indicators = driver.find_elements(By.XPATH, f"//div[contains(text(), '{pattern}')]")
+                        if no_whatsapp_indicators:
+                            for indicator in no_whatsapp_indicators:
+                                print(f"[NO WHATSAPP] Found indicator: '{indicator.text}' for {phone}")
+                                return False
+                    except Exception as e:
+                        print(f"[DEBUG] Error checking pattern '{pattern}': {str(e)}")
+                        continue
+
+                # Also check for specific error messages in the page source
+                page_source = driver.page_source.lower()
+                for pattern in NO_WHATSAPP_PATTERNS:
+                    if pattern.lower() in page_source:
+                        print(f"[NO WHATSAPP] Found invalid indicator '{pattern}' in page source for {phone}")
+                        return False
+
+            except Exception as e:
+                print(f"Error checking for invalid WhatsApp indicators: {str(e)}")
+                pass
+
+            # Check if input box exists (means WhatsApp account exists)
+            input_box = driver.find_elements(By.XPATH, COMPOSE_BOX_XPATH)
+            if not input_box:
+                # Try alternative selectors
+                input_box = driver.find_elements(By.XPATH, "//div[@contenteditable='true'][@role='textbox']")
+            if not input_box:
+                input_box = driver.find_elements(By.XPATH, "//div[@contenteditable='true']")
+
+            if input_box:
+                print(f"[DEBUG] Input box found for {phone} - WhatsApp account exists")
+                return True
+            else:
+                print(f"[NO WHATSAPP] No input box found for {phone} - likely no WhatsApp account")
+                return False
+        except Exception as e:
+            print(f"Timeout or error checking WhatsApp for {phone}: {str(e)}")
+            # If we can't determine, assume it's valid to avoid false negatives
+            return True
+
+    def send(self, phone, text):
+        self._get(chat_link(self.base_url, phone, text))
+        try:
+            state = self.wait_for_chat()
+            if state != 'chat':
+                raise Exception(f"Chat did not open for {phone} (state: {state or 'timeout'})")
+            self.submit_compose_box()
+        except Exception as e:
+            if "invalid session id" in str(e).lower():
+                print(f"[SESSION ERROR] Invalid session during message sending for {phone}")
+                raise Exception(f"Session lost during message sending: {str(e)}")
+            else:
+                raise e
+        self._count('sends')
+
+    def deliver(self, phone, text):
+        """Open the chat with the real message pre-filled, classify the page
+        and, if the number is on WhatsApp, send right away — one navigation
+        instead of the check-then-send pair."""
+        if self.send_mode == SEND_MODE_INPAGE:
+            outcome = self.deliver_in_page(phone, text)
+            if outcome is not None:
+                return outcome
+            print(f"[IN-PAGE] Could not open {phone} in-app - falling back to URL navigation")
+        self._count('checks')
+        self._get(chat_link(self.base_url, phone, text))
+        try:
+            state = self.wait_for_chat()
+            if state == 'invalid':
+                print(f"[NO WHATSAPP] 'Not on WhatsApp' popup shown for {phone}")
+                return OUTCOME_NO_WHATSAPP
+            if state is None:
+                # Page never settled - fall back to the exhaustive checks
+                if not self._classify_slow(phone):
+                    return OUTCOME_NO_WHATSAPP
+            self.submit_compose_box()
+        except Exception as e:
+            if "invalid session id" in str(e).lower():
+                print(f"[SESSION ERROR] Invalid session during message sending for {phone}")
+                raise Exception(f"Session lost during message sending: {str(e)}")
+            else:
+                raise e
+        self._count('sends')
+        return OUTCOME_SENT
+
+    def deliver_in_page(self, phone, text):
+        """Open the chat through WhatsApp's own search box and type the
+        message into it - no page reload. Returns None when the number
+        can't be reached this way so the caller can fall back to the /send
+        deep link (which is also what classifies unknown numbers)."""
+        driver = self.driver
+        try:
+            if driver.execute_script(APP_SHELL_JS) != 'ready':
+                # First contact (or the app was navigated away): load it once
+                self._get(self.base_url)
+                if wait_for_whatsapp_ready(driver) != 'ready':
+                    return None
+            self._count('checks')
+            driver.execute_script(MARK_STALE_JS)
+            if not driver.execute_script(SEARCH_TYPE_JS, str(phone)):
+                return None
+            found, elapsed = self._wait(self.search_timeout.current(), _search_settled)
+            self.search_timeout.observe(elapsed, timed_out=found is None)
+            if found != 'result' or not driver.execute_script(OPEN_FIRST_RESULT_JS):
+                driver.execute_script(CLEAR_SEARCH_JS)
+                return None
+            self._count('in_page_opens')
+            state = self.wait_for_chat()
+            if state != 'chat':
+                return None
+            # Only type into the chat if it is this number's; otherwise the
+            # deep link opens the right one
+            digits = re.sub(r'\D', '', str(phone))
+            matched, _ = self._wait(CHAT_MATCH_TIMEOUT,
+                                    lambda d: d.execute_script(CHAT_MATCHES_PHONE_JS, digits))
+            if not matched:
+                print(f"[IN-PAGE] Search opened a different chat for {phone} - using the link instead")
+                return None
+            input_box = driver.find_element(By.XPATH, COMPOSE_BOX_XPATH + "[not(@data-wbm-stale)]")
+            driver.execute_script(INSERT_TEXT_JS, input_box, text)
+        except Exception as e:
+            if "invalid session id" in str(e).lower():
+                raise Exception(f"Session lost during message sending: {str(e)}")
+            print(f"[IN-PAGE] In-app send failed for {phone}: {str(e)}")
+            return None
+        # Past this point a fallback could deliver the message twice, so
+        # errors propagate like any other failed send.
+        self.submit_compose_box()
+        self._count('sends')
+        return OUTCOME_SENT
+
+    def submit_compose_box(self):
+        """Press send on the open chat and wait for the outgoing bubble."""
+        driver = self.driver
+        before, _ = driver.execute_script(OUTGOING_STATE_JS)
+        input_box = driver.find_element(By.XPATH, COMPOSE_BOX_XPATH + "[not(@data-wbm-stale)]")
+        try:
+            driver.execute_script("arguments[0].click();", input_box)
+            input_box.send_keys(Keys.ENTER)
+        except Exception:
+            try:
+                send_button = driver.find_element(By.XPATH, SEND_BUTTON_XPATH)
+                send_button.click()
+            except Exception:
+                input_box.send_keys(Keys.ENTER)
+
+        # The bubble appears with a pending clock as soon as WhatsApp has
+        # queued the message; give it a moment longer to pick up a tick.
+        timeout = self.bubble_timeout.current()
+        bubble, elapsed = self._wait(timeout, lambda d: d.execute_script(OUTGOING_STATE_JS)[0] > before)
+        self.bubble_timeout.observe(elapsed, timed_out=bubble is None)
+        if bubble is None:
+            print("[WARN] Outgoing message bubble not seen - assuming sent")
+            return
+        timeout = self.tick_timeout.current()
+        ticked, elapsed = self._wait(timeout, lambda d: d.execute_script(OUTGOING_STATE_JS)[1] not in (None, 'msg-time'))
+        self.tick_timeout.observe(elapsed, timed_out=ticked is None)
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+
+
+class FakeSendDriver(SendDriver):
+    """In-process stand-in for a browser. No I/O, deterministic outcomes.
+
+    invalid_ratio / failure_ratio pick numbers by a stable hash of the phone,
+    so the same workbook produces the same split on every run. `latency`
+    (seconds) is slept per navigation to model a page load when wanted.
+    """
+
+    name = 'fake'
+
+    def __init__(self, invalid_phones=(), invalid_ratio=0.0, failure_ratio=0.0, latency=0.0):
+        super().__init__()
+        self.invalid_phones = set(str(p) for p in invalid_phones)
+        self.invalid_ratio = invalid_ratio
+        self.failure_ratio = failure_ratio
+        self.latency = latency
+        self.delivered = deque(maxlen=1000)  # most recent sends, for spot checks
+
+    def _navigate(self):
+        self._count('navigations')
+        if self.latency:
+            time.sleep(self.latency)
+            self._add_wait(self.latency)
+
+    def is_invalid(self, phone):
+        phone = str(phone)
+        return phone in self.invalid_phones or stable_fraction(phone, 'invalid') < self.invalid_ratio
+
+    def check_exists(self, phone):
+        self._count('checks')
+        self._navigate()
+        return not self.is_invalid(phone)
+
+    def deliver(self, phone, text):
+        self._count('checks')
+        self._navigate()
+        if self.is_invalid(phone):
+            return OUTCOME_NO_WHATSAPP
+        self._deliver(phone, text)
+        return OUTCOME_SENT
+
+    def send(self, phone, text):
+        self._navigate()
+        self._deliver(phone, text)
+
+    def _deliver(self, phone, text):
+        if self.is_invalid(phone):
+            raise Exception(f"Compose box never appeared for {phone}")
+        if stable_fraction(phone, 'failure') < self.failure_ratio:
+            raise Exception(f"Simulated send failure for {phone}")
+        with self._counter_lock:
+            self.delivered.append((str(phone), text))
+        self._count('sends')
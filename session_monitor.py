@@ -0,0 +1,151 @@
+"""
+Warm browser sessions and their health checks.
+
+Chrome used to be launched when a campaign started (and again by
+recover_driver_session() once a send had already failed), each time
+paying the browser launch plus up to 15s for WhatsApp Web to load, and
+/restart_browser held the request open through all of it.
+
+SessionMonitor runs one background thread that:
+
+  * launches and logs in the first `warm` sessions when the app starts,
+    so a campaign finds them ready and starts right away;
+  * every `interval` seconds pings each idle session with one small
+    script (BrowserSession.ping()) - a session busy sending or validating
+    is left alone, its worker notices failures itself;
+  * measures each live session's memory (BrowserSession.measure_memory());
+  * quits a session that stops answering and, if it is one of the warm
+    ones, relaunches it before anything needs it. A launch that fails is
+    retried with a growing delay (up to MAX_RETRY_DELAY);
+  * relaunches on request (restart()) without blocking the caller.
+
+After suspend() (the Close Browser button) it keeps nothing warm until
+restart().
+"""
+import threading
+import time
+
+
+# Seconds between health checks
+HEALTH_INTERVAL = 30.0
+RETRY_DELAY = 30.0
+MAX_RETRY_DELAY = 600.0
+
+# Sessions in these states belong to a worker right now
+BUSY_STATES = ('starting', 'sending', 'validating')
+
+
+class SessionMonitor:
+    """Keeps `warm` sessions of a SessionPool launched and healthy."""
+
+    def __init__(self, pool, warm=None, interval=HEALTH_INTERVAL):
+        self.pool = pool
+        self.warm = len(pool.sessions) if warm is None else max(0, warm)
+        self.interval = interval
+        self.suspended = False
+        self.checks = 0
+        self.launched = 0
+        self._restart = False
+        self._retry_at = {}  # session name -> (earliest next launch, current delay)
+        self._launching = set()  # names of sessions being launched right now
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Run the monitor thread (warms the sessions first); idempotent."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="session-monitor")
+            self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def suspend(self):
+        """Stop keeping sessions warm (the browsers were closed on purpose)."""
+        self.suspended = True
+
+    def restart(self):
+        """Quit every session and launch them again, in the background
+        (at least the primary one, even with no sessions kept warm)."""
+        self.suspended = False
+        self.warm = max(self.warm, 1)
+        self._restart = True
+        if self._thread is None:
+            threading.Thread(target=self.check, daemon=True, name="session-restart").start()
+        else:
+            self.wake()
+
+    def check(self):
+        """One pass: ping idle sessions, quit dead ones, launch missing warm
+        ones. Launching can take minutes (a QR code waiting to be scanned),
+        so it runs outside the lock."""
+        with self._lock:
+            self.checks += 1
+            if self._restart:
+                self._restart = False
+                self._retry_at.clear()
+                self.pool.quit_all()
+            launch = []
+            for index, session in enumerate(self.pool.sessions):
+                if session.driver is not None:
+                    session.measure_memory()
+                if session.state in BUSY_STATES:
+                    continue
+                if session.driver is not None and not session.ping():
+                    print(f"[{session.name}] Browser stopped answering - closing it")
+                    session.quit()
+                    session.state = 'dead'
+                if (index < self.warm and not self.suspended and not session.is_up
+                        and session.name not in self._launching and self._due(session)):
+                    launch.append(session)
+            if not launch:
+                return
+            self._launching.update(session.name for session in launch)
+        started = []
+        try:
+            for session in launch:
+                print(f"[{session.name}] Launching browser in the background")
+            started = self.pool.start_sessions(launch)
+        finally:
+            with self._lock:
+                self._launching.difference_update(session.name for session in launch)
+                self._record_launches(launch, started)
+
+    def _record_launches(self, launch, started):
+        # Caller holds the lock
+        for session in launch:
+            if session in started:
+                self._retry_at.pop(session.name, None)
+                self.launched += 1
+            else:
+                self._backoff(session)
+
+    def _due(self, session):
+        retry = self._retry_at.get(session.name)
+        return retry is None or time.monotonic() >= retry[0]
+
+    def _backoff(self, session):
+        _, delay = self._retry_at.get(session.name, (0.0, RETRY_DELAY / 2))
+        delay = min(MAX_RETRY_DELAY, delay * 2)
+        self._retry_at[session.name] = (time.monotonic() + delay, delay)
+        print(f"[{session.name}] Browser launch failed - retrying in {delay:.0f}s")
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                print(f"[SESSIONS] Health check failed: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def snapshot(self):
+        return {
+            'running': self._thread is not None,
+            'warm': self.warm,
+            'interval': self.interval,
+            'suspended': self.suspended,
+            'checks': self.checks,
+            'launched': self.launched,
+        }
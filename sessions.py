@@ -0,0 +1,468 @@
+"""
+Browser sessions — one Chrome profile logged in to WhatsApp Web each.
+
+A campaign used to be strictly serial through a single global `driver`.
+Now app.py owns a SessionPool: N configured profiles, each with its own
+user-data dir and remote-debugging port, each driven by its own worker
+thread off a shared work queue. One session (the default) behaves exactly
+like before.
+
+Configuration, first match wins:
+  * %APPDATA%\\WhatsAppBulkMessenger\\sessions.json — a list of
+      {"name": "...", "user_data_dir": "...", "profile": "Default",
+       "debug_port": 9222, "min_interval": 0}
+  * WBM_SESSIONS=N — N profiles next to the default one (BotProfile,
+    BotProfile2, ...) on ports 9222, 9223, ...
+  * otherwise the single default profile.
+
+`min_interval` is a per-session rate limit: the minimum number of seconds
+between the starts of two contacts on that session.
+
+Chrome modes (WBM_CHROME_MODE, or "chrome_mode" per sessions.json entry):
+  * full      maximized, everything loaded (as before)
+  * lean      a fixed 1024x768 window; images, video, fonts and stickers
+              blocked (Network.setBlockedURLs over CDP); background
+              services Chrome runs for a desktop user turned off; disk
+              cache and renderer processes capped
+  * headless  lean, without a window (new headless mode); the profile has
+              to be logged in already - there is no QR code to scan
+Each session's memory (RSS of its chromedriver + Chrome process tree) is
+measured after launch and on every health check, and shows in snapshot().
+"""
+import json
+import os
+import threading
+import time
+
+import psutil
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service as ChromeService
+from webdriver_manager.chrome import ChromeDriverManager
+
+from send_drivers import SeleniumSendDriver, SEND_MODE_RELOAD, wait_for_whatsapp_ready
+
+
+DEFAULT_DEBUG_PORT = 9222
+# Health ping: one small script round trip instead of reading current_url
+PING_JS = "return document.readyState"
+
+CHROME_MODE_FULL = 'full'
+CHROME_MODE_LEAN = 'lean'
+CHROME_MODE_HEADLESS = 'headless'
+CHROME_MODES = (CHROME_MODE_FULL, CHROME_MODE_LEAN, CHROME_MODE_HEADLESS)
+
+LEAN_WINDOW_SIZE = "1024,768"
+LEAN_DISK_CACHE_BYTES = 32 * 1024 * 1024
+LEAN_RENDERER_PROCESS_LIMIT = 2
+LEAN_DISABLED_FEATURES = (
+    "Translate", "MediaRouter", "OptimizationHints", "AutofillServerCommunication",
+    "InterestFeedContentSuggestions", "CalculateNativeWinOcclusion", "BackForwardCache",
+)
+LEAN_ARGUMENTS = (
+    f"--window-size={LEAN_WINDOW_SIZE}",
+    f"--disk-cache-size={LEAN_DISK_CACHE_BYTES}",
+    f"--media-cache-size={LEAN_DISK_CACHE_BYTES}",
+    f"--renderer-process-limit={LEAN_RENDERER_PROCESS_LIMIT}",
+    f"--disable-features={','.join(LEAN_DISABLED_FEATURES)}",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-domain-reliability",
+    "--disable-sync",
+    "--disable-breakpad",
+    "--disable-client-side-phishing-detection",
+    "--no-first-run",
+    "--mute-audio",
+)
+# Requests a lean session never makes: chat media (images, video, voice
+# notes, stickers and profile pictures come from WhatsApp's media hosts),
+# plus image, video and font files from anywhere
+LEAN_BLOCKED_URLS = (
+    "*mmg.whatsapp.net*", "*pps.whatsapp.net*", "*.cdn.whatsapp.net*",
+    "*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.mp4*", "*.webm*",
+    "*.woff*", "*.ttf*", "*.otf*",
+)
+
+
+class SessionConfig:
+    """Where a session's Chrome profile lives and how fast it may send."""
+
+    def __init__(self, name, user_data_dir, profile="Default", debug_port=DEFAULT_DEBUG_PORT, min_interval=0.0,
+                 chrome_mode=None):
+        self.name = name
+        self.user_data_dir = user_data_dir
+        self.profile = profile
+        self.debug_port = int(debug_port)
+        self.min_interval = float(min_interval)
+        # None: the pool's mode (WBM_CHROME_MODE)
+        self.chrome_mode = chrome_mode if chrome_mode in CHROME_MODES else None
+
+    @classmethod
+    def from_dict(cls, data, index=0):
+        return cls(
+            name=data.get('name') or f"session{index + 1}",
+            user_data_dir=data['user_data_dir'],
+            profile=data.get('profile', "Default"),
+            debug_port=data.get('debug_port', DEFAULT_DEBUG_PORT + index),
+            min_interval=data.get('min_interval', 0.0),
+            chrome_mode=data.get('chrome_mode'),
+        )
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'user_data_dir': self.user_data_dir,
+            'profile': self.profile,
+            'debug_port': self.debug_port,
+            'min_interval': self.min_interval,
+            'chrome_mode': self.chrome_mode,
+        }
+
+
+def load_session_configs(config_path, default_user_data_dir, default_profile):
+    """Session configs from sessions.json, WBM_SESSIONS, or the single default."""
+    if os.path.exists(config_path):
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            configs = [SessionConfig.from_dict(entry, i) for i, entry in enumerate(entries)]
+            if configs:
+                return configs
+        except Exception as e:
+            print(f"Ignoring unreadable {config_path}: {e}")
+
+    try:
+        count = max(1, int(os.environ.get('WBM_SESSIONS', '1')))
+    except ValueError:
+        count = 1
+    return [
+        SessionConfig(
+            name="main" if i == 0 else f"session{i + 1}",
+            user_data_dir=default_user_data_dir if i == 0 else f"{default_user_data_dir}{i + 1}",
+            profile=default_profile,
+            debug_port=DEFAULT_DEBUG_PORT + i,
+        )
+        for i in range(count)
+    ]
+
+
+def build_chrome_options(config, mode=CHROME_MODE_FULL):
+    options = webdriver.ChromeOptions()
+    options.add_argument(f"--user-data-dir={config.user_data_dir}")
+    options.add_argument(f"--profile-directory={config.profile}")
+    options.add_argument(f"--remote-debugging-port={config.debug_port}")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    if mode == CHROME_MODE_FULL:
+        options.add_argument("--start-maximized")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--disable-plugins")
+    options.add_argument("--disable-web-security")
+    options.add_argument("--allow-running-insecure-content")
+    options.add_argument("--disable-background-timer-throttling")
+    options.add_argument("--disable-backgrounding-occluded-windows")
+    options.add_argument("--disable-renderer-backgrounding")
+    if mode != CHROME_MODE_FULL:
+        for argument in LEAN_ARGUMENTS:
+            options.add_argument(argument)
+    if mode == CHROME_MODE_HEADLESS:
+        options.add_argument("--headless=new")
+    return options
+
+
+def apply_chrome_mode(driver, mode):
+    """Settings a lean/headless Chrome needs over CDP before WhatsApp Web loads."""
+    if mode == CHROME_MODE_FULL:
+        return
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(LEAN_BLOCKED_URLS)})
+    if mode == CHROME_MODE_HEADLESS:
+        # WhatsApp Web turns away a "HeadlessChrome" user agent
+        user_agent = driver.execute_cdp_cmd('Browser.getVersion', {})['userAgent']
+        driver.execute_cdp_cmd('Network.setUserAgentOverride',
+                               {'userAgent': user_agent.replace('HeadlessChrome', 'Chrome')})
+
+
+def process_tree_rss(pid):
+    """Resident memory in bytes of a process and all its descendants, or
+    None if the process is gone."""
+    try:
+        root = psutil.Process(pid)
+        processes = [root] + root.children(recursive=True)
+    except psutil.Error:
+        return None
+    total = 0
+    for process in processes:
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            pass  # exited while we looked
+    return total
+
+
+class BrowserSession:
+    """One Chrome + WhatsApp Web login, its SendDriver and its counters."""
+
+    def __init__(self, config, pool):
+        self.config = config
+        self.pool = pool
+        self.driver = None
+        self._send_driver = None
+        self._lock = threading.RLock()       # serializes start / quit
+        self._stats_lock = threading.Lock()
+        self._last_start = 0.0
+        # The running campaign's pacing for this session (rate_control.py)
+        self.rate = None
+        self.state = 'stopped'
+        self.last_error = None
+        self.last_ping = None     # time.time() of the last answered ping
+        self.ping_ms = None
+        self.rss_bytes = None     # chromedriver + Chrome, at the last measure_memory()
+        self.reset_counters()
+
+    @property
+    def name(self):
+        return self.config.name
+
+    @property
+    def chrome_mode(self):
+        return self.config.chrome_mode or self.pool.chrome_mode
+
+    # -- browser lifecycle -------------------------------------------------
+    def ping(self):
+        """True if Chrome and the page still answer a trivial script."""
+        if self.pool.send_driver_override is not None:
+            return True
+        driver = self.driver
+        if not driver:
+            return False
+        started = time.perf_counter()
+        try:
+            driver.execute_script(PING_JS)
+        except Exception:
+            return False
+        self.ping_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.last_ping = time.time()
+        return True
+
+    def is_alive(self):
+        return self.ping()
+
+    @property
+    def is_up(self):
+        """Launched and logged in, as far as we know (ping() to be sure)."""
+        if self.pool.send_driver_override is not None:
+            return self.state == 'ready'
+        return self.driver is not None and self.state == 'ready'
+
+    def start(self):
+        """Launch Chrome on this profile and open WhatsApp Web (no-op if up)."""
+        with self._lock:
+            if self.pool.send_driver_override is not None:
+                self.state = 'ready'
+                return True  # Offline driver installed - no browser needed
+            try:
+                # If driver already exists and is working, don't create a new one
+                if self.driver:
+                    if self.is_alive():
+                        if self.state == 'ready':
+                            print(f"[{self.name}] Using existing Chrome driver")
+                            return True
+                        # Launched, but WhatsApp Web wasn't usable (QR code
+                        # not scanned yet, or it didn't load): check again
+                        self.state = 'starting'
+                        return self._await_whatsapp()
+                    print(f"[{self.name}] Existing driver is not working, creating new driver...")
+                    self.quit()
+
+                self.state = 'starting'
+                options = build_chrome_options(self.config, self.chrome_mode)
+                # Try to use system Chrome first
+                try:
+                    self.driver = webdriver.Chrome(options=options)
+                except Exception as e:
+                    print(f"[{self.name}] System Chrome failed: {e}")
+                    # Fallback to ChromeDriverManager
+                    self.driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=options)
+
+                apply_chrome_mode(self.driver, self.chrome_mode)
+                self.driver.get(self.pool.base_url)
+                return self._await_whatsapp()
+            except Exception as e:
+                print(f"[{self.name}] Chrome driver setup failed: {e}")
+                self.state = 'error'
+                self.last_error = str(e)
+                return False
+
+    def _await_whatsapp(self):
+        """Wait for the chat list instead of a fixed sleep (longer if a QR
+        code is waiting to be scanned). Only a logged-in WhatsApp Web makes
+        the session 'ready'; otherwise it is left 'login' or 'error', with
+        Chrome kept open so the QR code can still be scanned."""
+        if self.chrome_mode == CHROME_MODE_HEADLESS:
+            # Nobody can scan a QR code without a window
+            whatsapp_state = wait_for_whatsapp_ready(self.driver, login_timeout=0)
+        else:
+            whatsapp_state = wait_for_whatsapp_ready(self.driver)
+        if whatsapp_state == 'ready':
+            print(f"[{self.name}] Chrome driver setup completed successfully (WhatsApp Web: ready)")
+            self.state = 'ready'
+            self.last_error = None
+            self.measure_memory()
+            return True
+        if whatsapp_state == 'login':
+            self.state = 'login'
+            if self.chrome_mode == CHROME_MODE_HEADLESS:
+                self.last_error = "Not logged in - log in once with WBM_CHROME_MODE=lean before using headless"
+            else:
+                self.last_error = "Not logged in - scan the QR code in the Chrome window"
+        else:
+            self.state = 'error'
+            self.last_error = f"WhatsApp Web did not load (state: {whatsapp_state})"
+        print(f"[{self.name}] {self.last_error}")
+        return False
+
+    def recover(self):
+        """Reuse the session if it still answers, otherwise relaunch it."""
+        try:
+            if self.is_alive():
+                return True
+            if self.driver:
+                print(f"[{self.name}] Driver session invalid, relaunching")
+                self.quit()
+            return self.start()
+        except Exception as e:
+            print(f"[{self.name}] Failed to recover driver session: {str(e)}")
+            return False
+
+    def quit(self):
+        with self._lock:
+            if self.driver:
+                try:
+                    self.driver.quit()
+                except Exception:
+                    pass
+            self.driver = None
+            self._send_driver = None
+            self.rss_bytes = None
+            self.state = 'stopped'
+
+    def measure_memory(self):
+        """Update rss_bytes from this session's process tree (None if unknown)."""
+        process = getattr(getattr(self.driver, 'service', None), 'process', None)
+        self.rss_bytes = process_tree_rss(process.pid) if process is not None else None
+        return self.rss_bytes
+
+    def get_send_driver(self):
+        """The SendDriver for this session, or None if no browser is up."""
+        if self.pool.send_driver_override is not None:
+            return self.pool.send_driver_override
+        driver = self.driver
+        if not driver:
+            return None
+        if self._send_driver is None or self._send_driver.driver is not driver:
+            self._send_driver = SeleniumSendDriver(driver, self.pool.base_url)
+            self._send_driver.set_send_mode(self.pool.send_mode)
+        return self._send_driver
+
+    # -- pacing and counters -----------------------------------------------
+    def throttle(self):
+        """Sleep until this session's min_interval since its last contact."""
+        if self.config.min_interval > 0:
+            remaining = self._last_start + self.config.min_interval - time.monotonic()
+            if remaining > 0:
+                time.sleep(remaining)
+        self._last_start = time.monotonic()
+
+    def reset_counters(self):
+        with self._stats_lock:
+            self.processed = 0
+            self.sent = 0
+            self.failed = 0
+            self.no_whatsapp = 0
+            self.current_contact = ''
+
+    def count(self, field, amount=1):
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def snapshot(self):
+        with self._stats_lock:
+            return {
+                'name': self.name,
+                'state': self.state,
+                'debug_port': self.config.debug_port,
+                'min_interval': self.config.min_interval,
+                'current_contact': self.current_contact,
+                'processed': self.processed,
+                'sent': self.sent,
+                'failed': self.failed,
+                'no_whatsapp': self.no_whatsapp,
+                'last_error': self.last_error,
+                'ping_ms': self.ping_ms,
+                'last_ping': self.last_ping,
+                'chrome_mode': self.chrome_mode,
+                'rss_mb': round(self.rss_bytes / (1024 * 1024), 1) if self.rss_bytes is not None else None,
+                'rate': self.rate.snapshot() if self.rate else None,
+            }
+
+
+class SessionPool:
+    """All configured sessions. sessions[0] is the primary one the
+    close/restart browser buttons and single-session campaigns use."""
+
+    def __init__(self, configs, base_url, chrome_mode=CHROME_MODE_FULL):
+        self.base_url = base_url
+        # Chrome mode of sessions that don't set their own (WBM_CHROME_MODE)
+        self.chrome_mode = chrome_mode if chrome_mode in CHROME_MODES else CHROME_MODE_FULL
+        self.send_mode = SEND_MODE_RELOAD
+        self.send_driver_override = None
+        self.sessions = [BrowserSession(config, self) for config in configs]
+
+    @property
+    def primary(self):
+        return self.sessions[0]
+
+    def install_send_driver(self, send_driver):
+        """Route every session through `send_driver` (None restores Selenium)."""
+        self.send_driver_override = send_driver
+
+    def set_send_mode(self, mode):
+        self.send_mode = mode
+        for session in self.sessions:
+            send_driver = session.get_send_driver()
+            if send_driver:
+                send_driver.set_send_mode(mode)
+
+    def start(self, limit=None):
+        """Start up to `limit` sessions in parallel; returns the ones that came
+        up. Sessions already running (kept warm by the SessionMonitor) only
+        answer a ping."""
+        return self.start_sessions(self.sessions[:limit] if limit else list(self.sessions))
+
+    def start_sessions(self, candidates):
+        """Start the given sessions in parallel; returns the ones that came up."""
+        results = {}
+
+        def _start(session):
+            results[session.name] = session.start()
+
+        threads = [threading.Thread(target=_start, args=(s,), daemon=True, name=f"start-{s.name}") for s in candidates]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return [s for s in candidates if results.get(s.name)]
+
+    def quit_all(self):
+        for session in self.sessions:
+            session.quit()
+
+    def reset_counters(self):
+        for session in self.sessions:
+            session.reset_counters()
+
+    def snapshot(self):
+        return [session.snapshot() for session in self.sessions]
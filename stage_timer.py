@@ -0,0 +1,57 @@
+"""
+Per-stage wall-clock accounting for the campaign pipeline.
+
+app.py wraps each stage of a campaign (reading the workbook, filtering out
+already-handled numbers, the send loop, recording outcomes) in
+`stage_timer.stage(name)`. The benchmarks read the totals back out; the
+numbers are cheap enough (two perf_counter calls per stage) to leave on in
+production.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """Accumulates seconds and row counts per named stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.marks = {}
+        self.current = None
+        self._started = time.perf_counter()
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.marks = {}
+            self.current = None
+            self._started = time.perf_counter()
+
+    def mark(self, name):
+        """Record seconds since reset() under `name` (first call wins)."""
+        with self._lock:
+            self.marks.setdefault(name, time.perf_counter() - self._started)
+
+    @contextmanager
+    def stage(self, name, rows=1):
+        """Time the enclosed block. Set span['rows'] inside to override `rows`."""
+        span = {'rows': rows}
+        previous = self.current
+        self.current = name
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                entry = self.stages.setdefault(name, {'seconds': 0.0, 'rows': 0, 'calls': 0})
+                entry['seconds'] += elapsed
+                entry['rows'] += span['rows']
+                entry['calls'] += 1
+            self.current = previous
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(entry) for name, entry in self.stages.items()}
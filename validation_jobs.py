@@ -0,0 +1,242 @@
+"""
+Validation-only jobs: check which numbers in a contact file have WhatsApp,
+without sending anything.
+
+A job runs the file through the browser session(s) like a campaign does
+(see validate_numbers_thread in app.py) and writes each result to the
+validation_results table as it goes, through the write-behind queue. The
+results double as the checkpoint: a job that was stopped, or cut off by a
+restart, is resumed by skipping every row that already has a result.
+Checks also land in the validity cache, so campaigns that follow skip them.
+
+ValidationJob holds a running job's pause/stop flags and counters;
+ValidationStore is the SQLite side (jobs, results, export).
+"""
+import threading
+import time
+
+
+JOB_RUNNING = 'running'
+JOB_PAUSED = 'paused'
+JOB_STOPPED = 'stopped'
+JOB_DONE = 'done'
+JOB_ERROR = 'error'
+# Was running when the app exited; resumable like a stopped job
+JOB_INTERRUPTED = 'interrupted'
+RESUMABLE_STATUSES = (JOB_STOPPED, JOB_INTERRUPTED, JOB_ERROR)
+
+RESULT_VALID = 'valid'
+RESULT_INVALID = 'invalid'
+RESULT_UNKNOWN = 'unknown'  # the check itself failed
+RESULT_STATUSES = (RESULT_VALID, RESULT_INVALID, RESULT_UNKNOWN)
+
+EXPORT_COLUMNS = ('row', 'sr_no', 'phone', 'name', 'status')
+
+# Persist the job's counters every this many results (they can always be
+# recounted from validation_results)
+PROGRESS_EVERY = 50
+
+
+class ValidationJob:
+    """Pause/stop flags and counters of the job being run."""
+
+    def __init__(self, job_id, filename, counts=None):
+        self.id = job_id
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self.status = JOB_RUNNING
+        self.total = 0
+        self.current_contact = ''
+        self.message = None
+        self.counts = {status: 0 for status in RESULT_STATUSES}
+        self.counts.update(counts or {})
+
+    @property
+    def is_active(self):
+        return self.status in (JOB_RUNNING, JOB_PAUSED)
+
+    @property
+    def processed(self):
+        return sum(self.counts.values())
+
+    def pause(self):
+        with self._lock:
+            if self.status != JOB_RUNNING:
+                return False
+            self.status = JOB_PAUSED
+            self._changed.notify_all()
+            return True
+
+    def resume(self):
+        with self._lock:
+            if self.status != JOB_PAUSED:
+                return False
+            self.status = JOB_RUNNING
+            self._changed.notify_all()
+            return True
+
+    def stop(self):
+        with self._lock:
+            if not self.is_active:
+                return False
+            self.status = JOB_STOPPED
+            self._changed.notify_all()
+            return True
+
+    def finish(self, status, message=None):
+        with self._lock:
+            if self.is_active:
+                self.status = status
+            if message:
+                self.message = message
+            self._changed.notify_all()
+
+    def wait_if_paused(self):
+        """Block while paused; returns False once the job is stopped."""
+        with self._lock:
+            while self.status == JOB_PAUSED:
+                self._changed.wait()
+            return self.status == JOB_RUNNING
+
+    def sleep(self, seconds):
+        """Pause between checks, cut short if the job is stopped."""
+        with self._lock:
+            if seconds > 0 and self.is_active:
+                self._changed.wait_for(lambda: not self.is_active, timeout=seconds)
+            return self.is_active
+
+    def count(self, result):
+        """Count one result; returns the number processed so far."""
+        with self._lock:
+            self.counts[result] += 1
+            return sum(self.counts.values())
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'filename': self.filename,
+                'status': self.status,
+                'total': self.total,
+                'processed': sum(self.counts.values()),
+                'valid_count': self.counts[RESULT_VALID],
+                'invalid_count': self.counts[RESULT_INVALID],
+                'unknown_count': self.counts[RESULT_UNKNOWN],
+                'current_contact': self.current_contact,
+                'message': self.message,
+            }
+
+
+class ValidationStore:
+    """Validation jobs and their per-row results in SQLite."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def create(self, job_id, filename):
+        self.db.execute(
+            'INSERT INTO validation_jobs (id, filename, status) VALUES (?, ?, ?)',
+            (job_id, filename, JOB_RUNNING),
+        )
+
+    def get(self, job_id):
+        rows = self._jobs('WHERE id = ?', (job_id,))
+        return rows[0] if rows else None
+
+    def recent(self, limit=50):
+        return self._jobs('ORDER BY created_at DESC, rowid DESC LIMIT ?', (limit,))
+
+    def _jobs(self, clause, params):
+        columns = ('id', 'filename', 'status', 'total', 'processed', 'valid_count',
+                   'invalid_count', 'unknown_count', 'message', 'created_at', 'updated_at')
+        found = self.db.query(f"SELECT {', '.join(columns)} FROM validation_jobs {clause}", params)
+        return [dict(zip(columns, row)) for row in found]
+
+    def set_status(self, job_id, status, message=None):
+        self.db.execute('''
+            UPDATE validation_jobs SET status = ?, message = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (status, message, job_id))
+
+    def mark_interrupted(self):
+        """Jobs left running by a previous run of the app; call at startup.
+
+        Their counters are recounted from the results that made it to disk.
+        """
+        conn = self.db.connection()
+        with conn:
+            conn.execute('''
+                UPDATE validation_jobs SET
+                    status = ?,
+                    valid_count = (SELECT COUNT(*) FROM validation_results r WHERE r.job_id = id AND r.status = ?),
+                    invalid_count = (SELECT COUNT(*) FROM validation_results r WHERE r.job_id = id AND r.status = ?),
+                    unknown_count = (SELECT COUNT(*) FROM validation_results r WHERE r.job_id = id AND r.status = ?),
+                    processed = (SELECT COUNT(*) FROM validation_results r WHERE r.job_id = id),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE status IN (?, ?)
+            ''', (JOB_INTERRUPTED, RESULT_VALID, RESULT_INVALID, RESULT_UNKNOWN, JOB_RUNNING, JOB_PAUSED))
+
+    def unfinished_files(self):
+        """Contact files a job may still need (not to be cleaned up)."""
+        placeholders = ', '.join('?' for _ in RESUMABLE_STATUSES + (JOB_RUNNING, JOB_PAUSED))
+        return set(row[0] for row in self.db.query(
+            f"SELECT DISTINCT filename FROM validation_jobs WHERE status IN ({placeholders})",
+            RESUMABLE_STATUSES + (JOB_RUNNING, JOB_PAUSED),
+        ))
+
+    def save_progress(self, job):
+        """Queue the job's counters (committed with the next write batch)."""
+        snapshot = job.snapshot()
+        self.db.write('''
+            UPDATE validation_jobs SET total = ?, processed = ?, valid_count = ?,
+                invalid_count = ?, unknown_count = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (snapshot['total'], snapshot['processed'], snapshot['valid_count'],
+              snapshot['invalid_count'], snapshot['unknown_count'], job.id))
+
+    def record_result(self, job_id, contact, result):
+        self.db.write('''
+            INSERT OR REPLACE INTO validation_results (job_id, row, phone, sr_no, name, status, checked_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (job_id, contact.row, contact.phone, contact.sr_no, contact.name, result, time.time()))
+
+    def done_rows(self, job_id, first_row, last_row):
+        """Rows in [first_row, last_row] that already have a result."""
+        return set(row[0] for row in self.db.query(
+            'SELECT row FROM validation_results WHERE job_id = ? AND row BETWEEN ? AND ?',
+            (job_id, first_row, last_row),
+        ))
+
+    def counts(self, job_id):
+        """{result status: rows} recounted from the stored results."""
+        counts = {status: 0 for status in RESULT_STATUSES}
+        for status, rows in self.db.query(
+            'SELECT status, COUNT(*) FROM validation_results WHERE job_id = ? GROUP BY status', (job_id,)
+        ):
+            counts[status] = rows
+        return counts
+
+    def iter_results(self, job_id, status=None, batch_size=1000):
+        """Result rows in file order, read by keyset a batch at a time."""
+        filters, params = ['job_id = ?'], [job_id]
+        if status:
+            filters.append('status = ?')
+            params.append(status)
+        last_row = 0
+        while True:
+            batch = self.db.query(
+                f"SELECT {', '.join(EXPORT_COLUMNS)} FROM validation_results "
+                f"WHERE {' AND '.join(filters)} AND row > ? ORDER BY row LIMIT ?",
+                params + [last_row, batch_size],
+            )
+            yield from batch
+            if len(batch) < batch_size:
+                return
+            last_row = batch[-1][0]
+
+    def delete(self, job_id):
+        conn = self.db.connection()
+        with conn:
+            conn.execute('DELETE FROM validation_results WHERE job_id = ?', (job_id,))
+            conn.execute('DELETE FROM validation_jobs WHERE id = ?', (job_id,))
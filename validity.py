@@ -0,0 +1,86 @@
+"""
+Cache of WhatsApp account checks.
+
+Checking a number costs a full page load and up to 15s of waiting, and
+only negative results used to be kept (invalid_numbers), forever. The
+validity_cache table (see db.py) records both outcomes per phone key with
+the time they were seen:
+
+  * a positive younger than `valid_ttl` skips the pre-flight check;
+  * a negative younger than `invalid_ttl` skips the number entirely (the
+    exclusion filter drops it, and a send never opens the browser);
+  * anything older is checked again, and the fresh result replaces it.
+
+invalid_numbers stays as the history the UI lists; it no longer decides
+exclusion on its own. TTLs come from WBM_VALID_TTL_DAYS and
+WBM_INVALID_TTL_DAYS.
+"""
+import os
+import time
+
+
+DAY = 24 * 60 * 60
+DEFAULT_VALID_TTL_DAYS = 30
+DEFAULT_INVALID_TTL_DAYS = 60
+
+
+def ttl_from_env(name, default_days):
+    """Seconds from a days-valued environment variable."""
+    try:
+        return max(0.0, float(os.environ.get(name, default_days))) * DAY
+    except ValueError:
+        return default_days * DAY
+
+
+class ValidityCache:
+    """Positive and negative account checks with per-outcome TTLs."""
+
+    def __init__(self, db, valid_ttl=DEFAULT_VALID_TTL_DAYS * DAY, invalid_ttl=DEFAULT_INVALID_TTL_DAYS * DAY):
+        self.db = db
+        self.valid_ttl = valid_ttl
+        self.invalid_ttl = invalid_ttl
+
+    def invalid_cutoff(self):
+        """Negatives checked at or after this time still count."""
+        return time.time() - self.invalid_ttl
+
+    def lookup(self, phone_key):
+        """True/False for a fresh cached check, None if unknown or stale."""
+        if not phone_key:
+            return None
+        found = self.db.query(
+            'SELECT has_whatsapp, checked_at FROM validity_cache WHERE phone_key = ?', (phone_key,)
+        )
+        if not found:
+            return None
+        has_whatsapp, checked_at = found[0]
+        ttl = self.valid_ttl if has_whatsapp else self.invalid_ttl
+        if checked_at < time.time() - ttl:
+            return None
+        return bool(has_whatsapp)
+
+    def record(self, phone_key, has_whatsapp, source='campaign'):
+        """Remember a check's outcome (committed with the next write batch)."""
+        if not phone_key:
+            return
+        self.db.write('''
+            INSERT INTO validity_cache (phone_key, has_whatsapp, checked_at, source)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(phone_key) DO UPDATE SET
+                has_whatsapp = excluded.has_whatsapp,
+                checked_at = excluded.checked_at,
+                source = excluded.source
+        ''', (phone_key, 1 if has_whatsapp else 0, time.time(), source))
+
+    def counts(self):
+        """{'valid': n, 'invalid': n, 'stale': n} over the whole cache."""
+        now = time.time()
+        row = self.db.query('''
+            SELECT
+                SUM(has_whatsapp = 1 AND checked_at >= ?),
+                SUM(has_whatsapp = 0 AND checked_at >= ?),
+                COUNT(*)
+            FROM validity_cache
+        ''', (now - self.valid_ttl, now - self.invalid_ttl))[0]
+        valid, invalid, total = (value or 0 for value in row)
+        return {'valid': valid, 'invalid': invalid, 'stale': total - valid - invalid}
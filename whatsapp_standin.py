@@ -0,0 +1,292 @@
+"""
+Local WhatsApp Web stand-in — a tiny HTTP server that looks enough like
+web.whatsapp.com for the Selenium send path to run against it offline.
+
+What it mimics:
+  * GET / and GET /send?phone=...&text=...  -> the app shell (search box
+    div[data-tab='3'] above #pane-side) plus, for /send, a chat with the
+    same compose box (div[contenteditable='true'][data-tab='10']), chat
+    header and send button selectors app.py waits on; or, for numbers
+    without an account, the "Phone number shared via url is invalid." banner.
+  * Typing a number into the search box lists it as a result (or shows
+    "No chats, contacts or messages found"); clicking it opens the chat
+    in-page, without a reload — the path the 'inpage' send mode drives.
+  * Pressing ENTER / clicking send appends an outgoing bubble with a
+    pending clock icon (data-icon='msg-time') that flips to a tick
+    (data-icon='msg-check') once the server has recorded the delivery.
+
+Which numbers are "not on WhatsApp" is decided by the same stable hash the
+FakeSendDriver uses, so a benchmark gets identical splits either way.
+
+Run standalone:
+    python whatsapp_standin.py --port 8799 --invalid-ratio 0.1
+then start the app with WBM_WHATSAPP_URL=http://127.0.0.1:8799
+"""
+import argparse
+import json
+import threading
+import urllib.parse
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from send_drivers import stable_fraction
+
+
+APP_PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>WhatsApp</title>
+<style>
+  body { margin:0; font-family:'Segoe UI',sans-serif; background:#efeae2; display:flex; height:100vh; }
+  #side { width:300px; background:#fff; border-right:1px solid #ddd; }
+  #side div[contenteditable] { margin:8px; padding:6px; background:#f0f2f5; border-radius:6px; }
+  #pane-side div[role='listitem'] { padding:10px 16px; cursor:pointer; border-bottom:1px solid #eee; }
+  #main { flex:1; display:flex; flex-direction:column; }
+  header { background:#f0f2f5; padding:10px 16px; font-weight:600; }
+  .messages { padding:16px; flex:1; }
+  .message-out { background:#d9fdd3; margin:4px 0 4px auto; padding:6px 10px;
+                 border-radius:6px; max-width:60%; }
+  footer { display:flex; gap:8px; padding:10px; background:#f0f2f5; }
+  footer div[contenteditable] { flex:1; background:#fff; padding:8px; border-radius:6px; }
+  .popup { margin:80px auto; max-width:360px; background:#fff; padding:24px; border-radius:6px; }
+</style></head>
+<body>
+<div id="side">
+  <div contenteditable="true" data-tab="3" role="textbox" title="Search input textbox"></div>
+  <div id="pane-side"></div>
+</div>
+<div id="main"><div data-testid="startup">Loading chats&hellip;</div></div>
+<script>
+const PHONE = __PHONE__;
+const TEXT = __TEXT__;
+const BANNER = __BANNER__;
+const RENDER_DELAY_MS = __DELAY__;
+
+const main = document.getElementById('main');
+const pane = document.getElementById('pane-side');
+const search = document.querySelector("#side div[data-tab='3']");
+
+function showPopup(text) {
+  main.innerHTML = '';
+  const popup = document.createElement('div');
+  popup.className = 'popup';
+  popup.setAttribute('data-testid', 'popup-contents');
+  const banner = document.createElement('div');
+  banner.textContent = text;
+  popup.appendChild(banner);
+  main.appendChild(popup);
+}
+
+// Each chat gets brand-new DOM nodes, like WhatsApp remounting the panel.
+function openChat(phone, text) {
+  main.innerHTML = '';
+  const header = document.createElement('header');
+  header.setAttribute('data-testid', 'chat-header');
+  header.textContent = phone;
+  const messages = document.createElement('div');
+  messages.className = 'messages';
+  const footer = document.createElement('footer');
+  const box = document.createElement('div');
+  box.setAttribute('contenteditable', 'true');
+  box.setAttribute('data-tab', '10');
+  box.setAttribute('role', 'textbox');
+  box.textContent = text;
+  const button = document.createElement('button');
+  button.setAttribute('data-testid', 'compose-btn-send');
+  button.textContent = 'Send';
+  footer.appendChild(box);
+  footer.appendChild(button);
+  main.appendChild(header);
+  main.appendChild(messages);
+  main.appendChild(footer);
+
+  function send() {
+    const body = box.innerText;
+    if (!body.trim()) return;
+    const bubble = document.createElement('div');
+    bubble.className = 'message-out';
+    bubble.setAttribute('data-testid', 'msg-container');
+    bubble.textContent = body;
+    const tick = document.createElement('span');
+    tick.setAttribute('data-icon', 'msg-time');
+    bubble.appendChild(tick);
+    messages.appendChild(bubble);
+    box.textContent = '';
+    fetch('/_delivered', {method: 'POST', body: JSON.stringify({phone: phone, text: body})})
+      .then(() => tick.setAttribute('data-icon', 'msg-check'));
+  }
+  box.addEventListener('keydown', (e) => {
+    if (e.key === 'Enter') { e.preventDefault(); send(); }
+  });
+  button.addEventListener('click', send);
+}
+
+// New-chat search: any number on "WhatsApp" shows up as a single result.
+let searchTimer = null;
+search.addEventListener('input', () => {
+  clearTimeout(searchTimer);
+  searchTimer = setTimeout(() => {
+    const query = search.innerText.replace(/[^0-9]/g, '');
+    pane.innerHTML = '';
+    if (!query) return;
+    fetch('/_lookup?phone=' + encodeURIComponent(query))
+      .then(r => r.json())
+      .then(info => {
+        if (!info.valid) {
+          pane.textContent = 'No chats, contacts or messages found';
+          return;
+        }
+        const item = document.createElement('div');
+        item.setAttribute('role', 'listitem');
+        item.textContent = query;
+        item.addEventListener('click', () => {
+          search.textContent = '';
+          pane.innerHTML = '';
+          openChat(query, '');
+        });
+        pane.appendChild(item);
+      });
+  }, 50);
+});
+
+setTimeout(() => {
+  main.innerHTML = '';
+  if (BANNER) showPopup(BANNER);
+  else if (PHONE) openChat(PHONE, TEXT);
+}, RENDER_DELAY_MS);
+</script></body></html>"""
+
+
+# Only ever emitted for invalid numbers — app.py also scans page_source for it.
+INVALID_BANNER = "Phone number shared via url is invalid."
+
+
+def _js_literal(value):
+    # json.dumps gives a valid JS literal; escape "</" so a message can't
+    # close the surrounding <script> tag.
+    return json.dumps(value).replace('</', '<\\/')
+
+
+class StandInServer:
+    """Threaded HTTP server serving the stand-in pages on a local port."""
+
+    def __init__(self, host='127.0.0.1', port=0, invalid_phones=(), invalid_ratio=0.0, render_delay_ms=0):
+        self.invalid_phones = set(str(p) for p in invalid_phones)
+        self.invalid_ratio = invalid_ratio
+        self.render_delay_ms = render_delay_ms
+        self.delivered = deque(maxlen=1000)
+        self.delivered_count = 0
+        self.page_loads = 0
+        self.lookups = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def is_invalid(self, phone):
+        return phone in self.invalid_phones or stable_fraction(phone, 'invalid') < self.invalid_ratio
+
+    def stats(self):
+        with self._lock:
+            return {'page_loads': self.page_loads, 'lookups': self.lookups, 'delivered': self.delivered_count}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass  # keep benchmark output clean
+
+            def _reply(self, status, body, content_type='text/html; charset=utf-8'):
+                payload = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.send_header('Cache-Control', 'no-store')
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                parsed = urllib.parse.urlparse(self.path)
+                query = urllib.parse.parse_qs(parsed.query)
+                if parsed.path in ('/', '/send'):
+                    phone = query.get('phone', [''])[0]
+                    text = query.get('text', [''])[0]
+                    with server._lock:
+                        server.page_loads += 1
+                    banner = INVALID_BANNER if phone and server.is_invalid(phone) else ''
+                    page = (APP_PAGE
+                            .replace('__PHONE__', _js_literal(phone))
+                            .replace('__TEXT__', _js_literal(text))
+                            .replace('__BANNER__', _js_literal(banner))
+                            .replace('__DELAY__', str(int(server.render_delay_ms))))
+                    self._reply(200, page)
+                elif parsed.path == '/_lookup':
+                    phone = query.get('phone', [''])[0]
+                    with server._lock:
+                        server.lookups += 1
+                    self._reply(200, json.dumps({'valid': not server.is_invalid(phone)}), 'application/json')
+                elif parsed.path == '/_stats':
+                    self._reply(200, json.dumps(server.stats()), 'application/json')
+                else:
+                    self._reply(404, '<title>Not found</title>')
+
+            def do_POST(self):
+                if self.path != '/_delivered':
+                    self._reply(404, '')
+                    return
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    record = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    record = {}
+                with server._lock:
+                    server.delivered.append((record.get('phone'), record.get('text')))
+                    server.delivered_count += 1
+                self._reply(200, '{}', 'application/json')
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True, name="standin")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local WhatsApp Web stand-in page.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8799)
+    parser.add_argument('--invalid-ratio', type=float, default=0.0,
+                        help="fraction of numbers reported as not on WhatsApp")
+    parser.add_argument('--render-delay-ms', type=int, default=0,
+                        help="delay before the chat renders, to model a slow page")
+    args = parser.parse_args()
+
+    server = StandInServer(args.host, args.port, invalid_ratio=args.invalid_ratio,
+                           render_delay_ms=args.render_delay_ms)
+    print(f"WhatsApp stand-in serving on {server.url}")
+    print(f"Start the app with WBM_WHATSAPP_URL={server.url} to send against it.")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()